@@ -0,0 +1,18 @@
+"""
+Замеры производительности блога на синтетических данных.
+
+    python -m benchmarks --scale small
+    python -m benchmarks --scale large --articles 200000 --concurrency 8 --workers 4 --output var/benchmarks/large.json
+
+Замеры создают отдельную базу (benchmarks.settings), заполняют её данными выбранного объёма (blog_app.testdata)
+и записывают в JSON файл:
+
+* micro - время функций popular_articles, popular_tags, get_similar_articles, unique_slugify и вывода дерева
+  комментариев (benchmarks.micro);
+* client - запросы к основным страницам blog_app.urls тестовым клиентом Django;
+* gunicorn - те же страницы через запущенный gunicorn при параллельных запросах (None, если gunicorn не установлен).
+
+Для каждого замера записываются количество выполнений в секунду, среднее, p50, p99 и наибольшее время в миллисекундах,
+а в meta - ревизия git, версии, база данных, объём данных и маршруты с кэшированием ответов (по умолчанию
+кэширование ответов отключено, см. benchmarks.settings), чтобы результаты разных запусков можно было сравнивать.
+"""
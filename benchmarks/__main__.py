@@ -0,0 +1,111 @@
+"""
+Запуск замеров: python -m benchmarks --scale medium --output var/benchmarks/medium.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import time
+from pathlib import Path
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'benchmarks.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.db import connection  # noqa: E402
+
+from blog_app import testdata  # noqa: E402
+from blog_app.models import Article  # noqa: E402
+from blog_app.testdata import SCALES  # noqa: E402
+from blog_app.viewcounter import view_buffer  # noqa: E402
+
+from . import micro, pages  # noqa: E402
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__.strip())
+    parser.add_argument('--scale', choices=SCALES, default='small', help='объём данных (по умолчанию small)')
+    for name, value in SCALES['small'].items():
+        parser.add_argument(f'--{name.replace("_", "-")}', type=int, dest=name,
+                            help=f'изменить значение {name} выбранного объёма')
+    parser.add_argument('--seed', type=int, default=0, help='начальное значение генератора случайных чисел')
+    parser.add_argument('--iterations', type=int, default=50, help='запросов к каждой странице и вызовов функции')
+    parser.add_argument('--concurrency', type=int, default=4, help='одновременных запросов к gunicorn')
+    parser.add_argument('--workers', type=int, default=2, help='процессов gunicorn')
+    parser.add_argument('--no-gunicorn', action='store_true', help='не запускать gunicorn')
+    parser.add_argument('--keepdb', action='store_true',
+                        help='не удалять базу замеров и не создавать данные заново, если база уже есть')
+    parser.add_argument('--output', type=Path, help='файл результатов (по умолчанию var/benchmarks/<время>.json)')
+    return parser.parse_args()
+
+
+def git_revision(base_dir):
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=base_dir, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    args = parse_args()
+    scale = {name: value if getattr(args, name) is None else getattr(args, name)
+             for name, value in SCALES[args.scale].items()}
+    database_name = settings.DATABASES['default']['NAME']
+    if connection.vendor == 'sqlite':
+        Path(settings.DATABASES['default']['TEST']['NAME']).parent.mkdir(parents=True, exist_ok=True)
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=args.keepdb, serialize=False)
+    try:
+        start = time.perf_counter()
+        if args.keepdb and Article.objects.exists():
+            data = None
+        else:
+            data = testdata.generate(seed=args.seed, **scale)
+        dataset_seconds = round(time.perf_counter() - start, 2)
+        user = get_user_model().objects.order_by('pk').first()
+        urls = pages.get_urls()
+        results = {
+            'meta': {
+                'created': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'revision': git_revision(settings.BASE_DIR),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'debug': settings.DEBUG,
+                'view_cache_policies': sorted(settings.VIEW_CACHE_POLICIES),
+                'scale': args.scale,
+                'dataset': scale,
+                'seed': args.seed,
+                'counts': data['counts'] if data else None,
+                'dataset_seconds': dataset_seconds if data else None,
+                'iterations': args.iterations,
+                'concurrency': args.concurrency,
+                'workers': args.workers,
+            },
+            'urls': urls,
+            'micro': micro.run(args.iterations, user),
+            'client': pages.run_client(urls, args.iterations, user),
+            'gunicorn': None,
+        }
+        if not args.no_gunicorn:
+            results['gunicorn'] = pages.run_gunicorn(urls, args.iterations, args.concurrency, args.workers, user)
+            if results['gunicorn'] is None:
+                print('gunicorn не установлен, замеры через gunicorn пропущены')
+    finally:
+        # просмотры из буфера записываются в базу замеров, а не при выходе в основную базу
+        view_buffer.flush()
+        if not args.keepdb:
+            connection.creation.destroy_test_db(database_name, verbosity=0)
+
+    output = args.output or settings.BASE_DIR / 'var' / 'benchmarks' / f'{time.strftime("%Y%m%d-%H%M%S")}.json'
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(f'Результаты записаны в {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""
+Замеры отдельных функций: шаблонных тегов popular_articles и popular_tags, похожих статей, подбора уникального slug и
+вывода дерева комментариев.
+
+Функции с кэшем замеряются дважды: cold - кэш очищается перед каждым вызовом, warm - результат берётся из кэша.
+"""
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.db.models import Count
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from blog_app.comment_threads import get_comment_page
+from blog_app.models import Article, Comment
+from blog_app.similarity import get_similar_articles
+from blog_app.tagstats import invalidate_popular_tags
+from blog_app.templatetags.blog_tags import popular_articles, popular_tags
+from blog_app.testdata import TOPICS
+from reqsoft.utils import unique_slugify
+
+from .timing import measure
+
+
+def clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
+
+def render_comment_page(article_id, request):
+    page = get_comment_page(article_id)
+    return render_to_string('blog_app/comment_nodes.html', {'nodes': page.nodes}, request=request)
+
+
+def run(iterations, user=None):
+    """
+    Замеры функций на созданных данных; возвращает словарь {имя замера: сводка measure}
+    """
+    article = Article.objects.filter(similar_links__isnull=False).first() or Article.objects.first()
+    commented = (Comment.objects.filter(level=0).values('article_id').annotate(threads=Count('pk'))
+                 .order_by('-threads').first())
+    request = RequestFactory().get('/')
+    request.user = user or AnonymousUser()
+    title = f'{TOPICS[0]} 0'
+
+    benchmarks = {
+        'popular_articles': {'func': popular_articles},
+        'popular_tags_cold': {'func': popular_tags, 'setup': invalidate_popular_tags},
+        'popular_tags_warm': {'func': popular_tags},
+        'get_similar_articles': {'func': lambda: get_similar_articles(article)},
+        'unique_slugify': {'func': lambda: unique_slugify(Article(), title)},
+    }
+    if commented is not None:
+        benchmarks['comment_tree_render'] = {
+            'func': lambda: render_comment_page(commented['article_id'], request), 'setup': clear_caches,
+        }
+    return {name: measure(iterations=iterations, **options) for name, options in benchmarks.items()}
@@ -0,0 +1,180 @@
+"""
+Замеры страниц blog_app.urls: тестовым клиентом Django в том же процессе и HTTP запросами к запущенному gunicorn.
+
+Тестовый клиент показывает стоимость самого Django (представления, шаблоны, запросы к базе) без сети и WSGI сервера,
+gunicorn - пропускную способность нескольких процессов при параллельных запросах. Запросы выполняются от имени
+вошедшего пользователя: для gunicorn cookie сессии берётся у тестового клиента (сессия сохраняется в базе замеров).
+"""
+import http.client
+import importlib.util
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse
+from taggit.models import Tag
+
+from blog_app.models import Article, Category, Comment, Documents
+from blog_app.testdata import TOPICS
+
+from .timing import measure, summarize
+
+
+def get_urls():
+    """
+    Адреса основных страниц на созданных данных {имя маршрута: адрес}
+    """
+    article = Article.objects.filter(comments__isnull=False).first() or Article.objects.first()
+    comment = Comment.objects.filter(article=article, level=0).first()
+    category = Category.objects.filter(subtree_article_count__gt=0).order_by('tree_id', 'lft').first()
+    tag = Tag.objects.order_by('pk').first()
+    document = Documents.objects.order_by('pk').first()
+    urls = {
+        'article_list': reverse('blog_app:article_list'),
+        'article_detail': article.get_absolute_url(),
+        'articles_by_category': reverse('blog_app:articles_by_category', kwargs={'slug': category.slug}),
+        'articles_by_tags': reverse('blog_app:articles_by_tags', kwargs={'tag': tag.slug}),
+        'comment_threads': reverse('blog_app:comment_threads', kwargs={'pk': article.pk}),
+        'search': f'{reverse("blog_app:search")}?{urlencode({"do": TOPICS[0]})}',
+        'search_suggest': f'{reverse("blog_app:search_suggest")}?{urlencode({"q": TOPICS[0][:4]})}',
+        'files_list': reverse('blog_app:files_list'),
+        'file_detail': reverse('blog_app:file_detail', kwargs={'pk': document.pk}),
+        'files_by_category': reverse('blog_app:files_by_category', kwargs={'slug': category.slug}),
+    }
+    if comment is not None:
+        urls['comment_replies'] = reverse('blog_app:comment_replies', kwargs={'pk': comment.pk})
+    return urls
+
+
+def logged_in_client(user):
+    client = Client()
+    if user is not None:
+        client.force_login(user)
+    return client
+
+
+def run_client(urls, iterations, user=None):
+    """
+    Последовательные запросы тестовым клиентом; возвращает {имя маршрута: сводка measure}
+    """
+    client = logged_in_client(user)
+    results = {}
+    for name, url in urls.items():
+        def get():
+            response = client.get(url)
+            if response.status_code != 200:
+                raise RuntimeError(f'{url}: код ответа {response.status_code}')
+        results[name] = measure(get, iterations)
+    return results
+
+
+def gunicorn_available():
+    return importlib.util.find_spec('gunicorn') is not None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_gunicorn(port, workers, timeout=30):
+    """
+    Запуск gunicorn с настройками замеров на базе с созданными данными; ждёт, пока порт начнёт принимать соединения
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE='benchmarks.settings', BENCHMARK_SERVE='1',
+               BENCHMARK_DATABASE=settings.DATABASES['default']['NAME'])
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'reqsoft.wsgi:application', '--bind', f'127.0.0.1:{port}',
+         '--workers', str(workers), '--log-level', 'warning'],
+        cwd=settings.BASE_DIR, env=env,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn завершился с кодом {process.returncode}')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    stop_gunicorn(process)
+    raise RuntimeError(f'gunicorn не начал принимать соединения за {timeout} с')
+
+
+def stop_gunicorn(process):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def fetch(port, url, headers):
+    """
+    Один запрос к серверу; возвращает время ответа в секундах или None при ошибке
+    """
+    start = time.perf_counter()
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        connection.request('GET', url, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return time.perf_counter() - start if response.status == 200 else None
+    except OSError:
+        return None
+    finally:
+        connection.close()
+
+
+def load(port, url, headers, iterations, concurrency):
+    """
+    iterations запросов url не более чем concurrency одновременно; сводка с пропускной способностью по общему времени
+    """
+    durations, errors = [], 0
+    lock = threading.Lock()
+
+    def request(_):
+        nonlocal errors
+        duration = fetch(port, url, headers)
+        with lock:
+            if duration is None:
+                errors += 1
+            else:
+                durations.append(duration)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as executor:
+        list(executor.map(request, range(iterations)))
+    return summarize(durations, elapsed=time.perf_counter() - start, errors=errors)
+
+
+def run_gunicorn(urls, iterations, concurrency, workers, user=None):
+    """
+    Запросы к gunicorn с workers процессами; возвращает {имя маршрута: сводка} или None, если gunicorn не установлен
+    """
+    if not gunicorn_available():
+        return None
+    headers = {}
+    session = logged_in_client(user).cookies.get(settings.SESSION_COOKIE_NAME)
+    if session is not None:
+        headers['Cookie'] = f'{settings.SESSION_COOKIE_NAME}={session.value}'
+    port = free_port()
+    process = start_gunicorn(port, workers)
+    try:
+        results = {}
+        for name, url in urls.items():
+            # прогрев: каждый процесс заполняет свои кэши и открывает соединение с базой
+            load(port, url, headers, workers * 2, concurrency)
+            results[name] = load(port, url, headers, iterations, concurrency)
+        return results
+    finally:
+        stop_gunicorn(process)
@@ -0,0 +1,27 @@
+"""
+Настройки Django для замеров производительности: настройки сайта с отдельной базой данных.
+
+Синтетические данные создаются в базе DATABASES['default']['TEST']['NAME'] (BENCHMARK_DATABASE): файл
+var/benchmark.sqlite3 для SQLite или база <имя>_benchmark для PostgreSQL. Запускающий замеры процесс создаёт её
+средствами тестовой базы Django, а запущенный им gunicorn (BENCHMARK_SERVE=1) подключается к ней как к основной.
+
+Кэширование ответов представлений (VIEW_CACHE_POLICIES) отключено: при повторных запросах одной страницы замер
+показывал бы время выдачи ответа из кэша, а не работы представления. BENCHMARK_VIEW_CACHE=1 оставляет правила сайта,
+чтобы замерить страницы с кэшем (gunicorn получает тот же параметр через окружение).
+"""
+from reqsoft.settings import *  # noqa: F401,F403
+from reqsoft.settings import BASE_DIR, DATABASES, config
+
+if DATABASES['default']['ENGINE'].endswith('sqlite3'):
+    default_name = str(BASE_DIR / 'var' / 'benchmark.sqlite3')
+else:
+    default_name = f'{DATABASES["default"]["NAME"]}_benchmark'
+DATABASES['default']['TEST'] = {'NAME': config('BENCHMARK_DATABASE', default=default_name)}
+if config('BENCHMARK_SERVE', default=False, cast=bool):
+    DATABASES['default']['NAME'] = DATABASES['default']['TEST']['NAME']
+
+ALLOWED_HOSTS = ['testserver', '127.0.0.1', 'localhost']
+
+BENCHMARK_VIEW_CACHE = config('BENCHMARK_VIEW_CACHE', default=False, cast=bool)
+if not BENCHMARK_VIEW_CACHE:
+    VIEW_CACHE_POLICIES = {}
@@ -0,0 +1,57 @@
+"""
+Замер времени выполнения и сводка результатов замера.
+"""
+import time
+
+
+def percentile(values, fraction):
+    """
+    Перцентиль отсортированного списка values с линейной интерполяцией (fraction от 0 до 1)
+    """
+    if not values:
+        return None
+    position = (len(values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(durations, elapsed=None, errors=0):
+    """
+    Сводка замера: количество выполнений, выполнений в секунду, среднее, p50, p99 и наибольшее время в миллисекундах.
+    elapsed - общее время замера (при параллельных запросах оно меньше суммы durations), errors - количество ошибок.
+    """
+    durations = sorted(durations)
+    elapsed = sum(durations) if elapsed is None else elapsed
+
+    def milliseconds(value):
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        'iterations': len(durations),
+        'errors': errors,
+        'per_second': round(len(durations) / elapsed, 2) if elapsed else None,
+        'mean_ms': milliseconds(sum(durations) / len(durations) if durations else None),
+        'p50_ms': milliseconds(percentile(durations, 0.5)),
+        'p99_ms': milliseconds(percentile(durations, 0.99)),
+        'max_ms': milliseconds(durations[-1] if durations else None),
+    }
+
+
+def measure(func, iterations, warmup=1, setup=None):
+    """
+    Замер iterations последовательных вызовов func после warmup вызовов для прогрева. setup вызывается перед каждым
+    вызовом (например, для очистки кэша) и в замер не входит.
+    """
+    for _ in range(warmup):
+        if setup is not None:
+            setup()
+        func()
+    durations = []
+    for _ in range(iterations):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return summarize(durations)
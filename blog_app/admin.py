@@ -1,7 +1,7 @@
 from django.contrib import admin
 from mptt.admin import DraggableMPTTAdmin
 
-from .models import Article, Category, Comment, ViewCount, Documents
+from .models import Article, Category, Comment, ViewCount, Documents, ArticleViewDaily
 
 
 # Register your models here.
@@ -42,4 +42,21 @@ class CommentAdminPage(DraggableMPTTAdmin):
 
 @admin.register(ViewCount)
 class ViewCountAdmin(admin.ModelAdmin):
-    pass
+    """
+    Админ-панель сырых просмотров. Таблица большая, поэтому общее количество записей не считается, а выгрузка
+    статистики делается потоково через blog_app:view_analytics_export
+    """
+    list_display = ('article', 'ip_address', 'viewed_day', 'viewed_on')
+    list_select_related = ('article',)
+    date_hierarchy = 'viewed_day'
+    show_full_result_count = False
+
+
+@admin.register(ArticleViewDaily)
+class ArticleViewDailyAdmin(admin.ModelAdmin):
+    """
+    Админ-панель дневных агрегатов просмотров
+    """
+    list_display = ('article', 'day', 'views', 'unique_ips')
+    list_select_related = ('article',)
+    date_hierarchy = 'day'
@@ -0,0 +1,125 @@
+"""
+Потоковая выгрузка статистики просмотров.
+
+Строки выгрузки читаются из базы курсором (.iterator(chunk_size)), на PostgreSQL - серверным, и сразу отдаются
+клиенту через StreamingHttpResponse, поэтому выгрузка за любой период не загружается в память целиком. Группировки:
+
+* article - по статье за период: сумма просмотров из дневных агрегатов ArticleViewDaily и количество дней;
+* day - по статье и дню: строки ArticleViewDaily (просмотры и уникальные IP);
+* ip - по статье и IP-адресу: количество дней с просмотрами и первый/последний просмотр из сырых записей ViewCount.
+
+В CSV текстовые ячейки, начинающиеся с символов формулы (=, +, -, @, табуляция, перевод строки), экранируются
+апострофом, чтобы табличный редактор не выполнил заголовок статьи как формулу.
+"""
+import csv
+import json
+from datetime import timedelta
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, F, Max, Min, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import ArticleViewDaily, ViewCount
+
+GROUPS = ('article', 'day', 'ip')
+FORMATS = ('csv', 'ndjson')
+DEFAULT_PERIOD_DAYS = 30
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class AnalyticsRequestError(ValueError):
+    pass
+
+
+class Echo:
+    """
+    Псевдо-файл для csv.writer: write() возвращает строку, а не пишет её
+    """
+
+    def write(self, value):
+        return value
+
+
+def parse_period(date_from, date_to):
+    """
+    Период выгрузки из параметров запроса (YYYY-MM-DD), по умолчанию последние DEFAULT_PERIOD_DAYS дней
+    """
+    today = timezone.localdate()
+    try:
+        end = parse_date(date_to) if date_to else today
+        start = parse_date(date_from) if date_from else end - timedelta(days=DEFAULT_PERIOD_DAYS - 1)
+    except ValueError:
+        start = end = None
+    if start is None or end is None:
+        raise AnalyticsRequestError('Дата должна быть в формате ГГГГ-ММ-ДД')
+    if start > end:
+        raise AnalyticsRequestError('Начало периода позже его конца')
+    return start, end
+
+
+def get_rows(group, start, end, article_id=None):
+    """
+    Строки выгрузки в виде словарей; запрос выполняется только при переборе
+    """
+    if group == 'ip':
+        queryset = ViewCount.objects.filter(viewed_day__range=(start, end))
+    else:
+        queryset = ArticleViewDaily.objects.filter(day__range=(start, end))
+    if article_id is not None:
+        queryset = queryset.filter(article_id=article_id)
+    fields = {'title': F('article__title'), 'slug': F('article__slug')}
+
+    if group == 'article':
+        queryset = (queryset.values('article_id', **fields)
+                    .annotate(views=Sum('views'), days=Count('day'))
+                    .order_by('article_id'))
+    elif group == 'day':
+        queryset = (queryset.values('day', 'article_id', 'views', 'unique_ips', **fields)
+                    .order_by('day', 'article_id'))
+    else:
+        queryset = (queryset.values('article_id', 'ip_address', **fields)
+                    .annotate(days=Count('viewed_day'), first_view=Min('viewed_on'), last_view=Max('viewed_on'))
+                    .order_by('article_id', 'ip_address'))
+    return queryset
+
+
+def get_columns(group):
+    return {
+        'article': ['article_id', 'slug', 'title', 'views', 'days'],
+        'day': ['day', 'article_id', 'slug', 'title', 'views', 'unique_ips'],
+        'ip': ['article_id', 'slug', 'title', 'ip_address', 'days', 'first_view', 'last_view'],
+    }[group]
+
+
+def csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return f"'{value}"
+    return value
+
+
+def stream_csv(rows, columns, chunk_size):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield writer.writerow([csv_cell(row[column]) for column in columns])
+
+
+def stream_ndjson(rows, columns, chunk_size):
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield json.dumps({column: row[column] for column in columns}, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def stream_export(group, output_format, start, end, article_id=None, chunk_size=2000):
+    """
+    Генератор строк выгрузки в формате csv или ndjson
+    """
+    if group not in GROUPS:
+        raise AnalyticsRequestError(f'Неизвестная группировка: {group}')
+    if output_format not in FORMATS:
+        raise AnalyticsRequestError(f'Неизвестный формат: {output_format}')
+    rows = get_rows(group, start, end, article_id)
+    columns = get_columns(group)
+    if output_format == 'csv':
+        return stream_csv(rows, columns, chunk_size)
+    return stream_ndjson(rows, columns, chunk_size)
@@ -6,3 +6,9 @@ class BlogAppConfig(AppConfig):
     name = 'blog_app'
     verbose_name = 'Статьи'
     verbose_name_plural = 'Статья'
+
+    def ready(self):
+        """
+        Подключение обработчиков сигналов приложения
+        """
+        from . import signals  # noqa: F401
@@ -0,0 +1,116 @@
+"""
+Количество статей и файлов по категориям.
+
+У каждой категории хранятся собственные счётчики (article_count, file_count) и счётчики вместе с подкатегориями
+(subtree_article_count, subtree_file_count). Учитываются опубликованные статьи и все файлы. Счётчики меняются
+обработчиками сигналов (blog_app.signals) при создании, удалении, публикации и снятии с публикации записи или переносе
+её в другую категорию: категория и все её предки обновляются одним UPDATE по диапазону lft..rght. Массовые изменения
+в обход сигналов (QuerySet.update, bulk_create, перенос категории в дереве) исправляются полным пересчётом
+rebuild_category_counts() - командой rebuild_category_counts.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Case, Count, F, PositiveIntegerField, When
+from django.db.models.functions import Greatest
+
+# вид записи -> (счётчик категории, счётчик вместе с подкатегориями)
+COUNT_FIELDS = {
+    'article': ('article_count', 'subtree_article_count'),
+    'file': ('file_count', 'subtree_file_count'),
+}
+_suspended = ContextVar('category_counts_suspended', default=False)
+
+
+@contextmanager
+def suspend_count_updates():
+    """
+    Отключение пошагового изменения счётчиков (после блока их нужно пересчитать rebuild_category_counts)
+    """
+    token = _suspended.set(True)
+    try:
+        yield
+    finally:
+        _suspended.reset(token)
+
+
+def counted_category_id(instance):
+    """
+    Категория, в которой учитывается запись: для статьи - только опубликованной, для файла - всегда
+    """
+    from blog_app.models import Article
+
+    if isinstance(instance, Article) and instance.status != 'published':
+        return None
+    return instance.category_id
+
+
+def change_category_count(category_id, kind, delta):
+    """
+    Изменение счётчиков записей вида kind ('article' или 'file') на delta у категории category_id и всех её предков
+    """
+    from blog_app.models import Category
+
+    if category_id is None or not delta or _suspended.get():
+        return
+    node = Category.objects.filter(pk=category_id).values('tree_id', 'lft', 'rght').first()
+    if node is None:
+        return
+    field, subtree_field = COUNT_FIELDS[kind]
+    Category.objects.filter(tree_id=node['tree_id'], lft__lte=node['lft'], rght__gte=node['rght']).update(**{
+        subtree_field: Greatest(F(subtree_field) + delta, 0),
+        field: Case(When(pk=category_id, then=Greatest(F(field) + delta, 0)), default=F(field),
+                    output_field=PositiveIntegerField()),
+    })
+
+
+def move_counted_record(old_category_id, new_category_id, kind):
+    """
+    Учёт перехода записи из категории old_category_id в new_category_id (None - запись не учитывается)
+    """
+    if old_category_id != new_category_id:
+        change_category_count(old_category_id, kind, -1)
+        change_category_count(new_category_id, kind, 1)
+
+
+def rebuild_category_counts():
+    """
+    Пересчёт счётчиков всех категорий: два запроса с группировкой, один проход по дереву снизу вверх и bulk_update
+    категорий, у которых счётчики разошлись. Возвращает количество исправленных категорий.
+    """
+    from blog_app.models import Article, Category, Documents
+
+    direct = {
+        'article': dict(Article.objects.filter(status='published').order_by().values_list('category_id')
+                        .annotate(count=Count('pk'))),
+        'file': dict(Documents.objects.order_by().values_list('category_id').annotate(count=Count('pk'))),
+    }
+    fields = [name for pair in COUNT_FIELDS.values() for name in pair]
+    nodes = list(Category.objects.order_by('tree_id', 'lft').only('tree_id', 'lft', 'rght', *fields))
+    counts = {node.pk: {} for node in nodes}
+    for kind, (field, subtree_field) in COUNT_FIELDS.items():
+        for node in nodes:
+            counts[node.pk][field] = counts[node.pk][subtree_field] = direct[kind].get(node.pk, 0)
+    # родитель определяется по вложенности lft..rght, а не по parent_id: при переносе категории node_moved
+    # отправляется до сохранения нового parent_id
+    parents, path = {}, []
+    for node in nodes:
+        while path and (path[-1].tree_id != node.tree_id or path[-1].rght < node.lft):
+            path.pop()
+        parents[node.pk] = path[-1].pk if path else None
+        path.append(node)
+    # в порядке (tree_id, lft) потомки идут после предков: обратный проход добавляет итог узла родителю,
+    # когда итог самого узла уже полный
+    for node in reversed(nodes):
+        if parents[node.pk] is not None:
+            for _, subtree_field in COUNT_FIELDS.values():
+                counts[parents[node.pk]][subtree_field] += counts[node.pk][subtree_field]
+
+    changed = []
+    for node in nodes:
+        if any(getattr(node, name) != value for name, value in counts[node.pk].items()):
+            for name, value in counts[node.pk].items():
+                setattr(node, name, value)
+            changed.append(node)
+    Category.objects.bulk_update(changed, fields, batch_size=500)
+    return len(changed)
@@ -0,0 +1,79 @@
+"""
+Постраничная загрузка дерева комментариев статьи.
+
+Каждый комментарий верхнего уровня - корень отдельного дерева MPTT, а новые корни получают следующий tree_id, поэтому
+ветки обсуждения листаются по ключу tree_id (от новых к старым) без OFFSET и подсчёта общего количества. Ответы ветки
+занимают в её дереве интервал (lft, rght) корня и читаются одним запросом по lft BETWEEN. Небольшие ветки страницы
+(не больше COMMENT_INLINE_REPLIES ответов) выводятся сразу, ответы остальных загружаются по кнопке.
+"""
+from django.conf import settings
+
+from .models import Comment
+
+
+def get_page_size():
+    return getattr(settings, 'COMMENT_PAGE_SIZE', 20)
+
+
+def get_inline_replies():
+    return getattr(settings, 'COMMENT_INLINE_REPLIES', 10)
+
+
+def parse_cursor(value):
+    """
+    Курсор страницы из параметра запроса: целое положительное число или None для первой страницы
+    """
+    try:
+        cursor = int(value)
+    except (TypeError, ValueError):
+        return None
+    return cursor if cursor > 0 else None
+
+
+def with_authors(queryset):
+    return queryset.select_related('author', 'author__profile')
+
+
+class CommentPage:
+    """
+    Страница веток обсуждения: nodes - корни и выведенные сразу ответы в порядке обхода для recursetree,
+    next_cursor - курсор следующей страницы или None
+    """
+
+    def __init__(self, nodes, next_cursor):
+        self.nodes = nodes
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def get_comment_page(article_id, cursor=None, page_size=None):
+    """
+    Страница комментариев верхнего уровня статьи, начиная с ветки, более старой чем cursor (tree_id). Не больше двух
+    запросов: корни страницы и ответы небольших веток.
+    """
+    page_size = page_size or get_page_size()
+    roots = with_authors(Comment.objects.filter(article_id=article_id, level=0)).order_by('-tree_id')
+    if cursor is not None:
+        roots = roots.filter(tree_id__lt=cursor)
+    roots = list(roots[:page_size + 1])
+    next_cursor = roots[page_size - 1].tree_id if len(roots) > page_size else None
+    roots = roots[:page_size]
+
+    limit = get_inline_replies()
+    inline = [root.tree_id for root in roots if 0 < root.get_descendant_count() <= limit]
+    replies = list(with_authors(Comment.objects.filter(tree_id__in=inline, level__gt=0))) if inline else []
+    nodes = sorted(roots + replies, key=lambda node: (-node.tree_id, node.lft))
+    return CommentPage(nodes, next_cursor)
+
+
+def get_comment_replies(comment):
+    """
+    Все ответы на комментарий (его поддерево без него самого) одним запросом по интервалу lft
+    """
+    return list(
+        with_authors(Comment.objects.filter(tree_id=comment.tree_id, lft__range=(comment.lft + 1, comment.rght - 1)))
+        .order_by('lft')
+    )
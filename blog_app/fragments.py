@@ -0,0 +1,140 @@
+"""
+Кэш готовых фрагментов страницы статьи.
+
+Текст статьи, теги и ветки комментариев на странице статьи меняются редко, поэтому их HTML кэшируется отдельно тегом
+шаблона {% article_fragment %}. Ключ фрагмента составлен из id статьи и версий того, от чего фрагмент зависит
+(ARTICLE_FRAGMENTS):
+
+* article - time_update статьи, меняется при каждом сохранении статьи;
+* tags - счётчик изменений тегов статьи (m2m_changed не трогает time_update);
+* comments - счётчик изменений комментариев статьи и профилей их авторов (имя, аватар, ссылка на профиль);
+* navigation - общий счётчик изменений тегов и категорий (переименование меняет ссылки во всех статьях).
+
+Счётчики увеличиваются обработчиками сигналов (blog_app.signals), старые фрагменты не удаляются, а вытесняются
+по ARTICLE_FRAGMENT_CACHE_TIMEOUT. Личное содержимое страницы (меню пользователя, форма с CSRF) в фрагменты не входит.
+Фрагменты, версии и количество попаданий и промахов (get_fragment_stats()) хранятся в кэше fragments.
+"""
+import time
+
+from django.conf import settings
+from django.utils.safestring import mark_safe
+
+from reqsoft.cache import get_cache
+
+FRAGMENT_KEY = 'blog_app:article_fragment:{name}:{article_id}:{stamp}'
+VERSION_KEY = 'blog_app:article_fragment:version:{kind}:{article_id}'
+STATS_KEY = 'blog_app:article_fragment:stats:{name}:{result}'
+
+# фрагменты страницы статьи и версии, от которых зависит их содержимое
+ARTICLE_FRAGMENTS = {
+    'body': ('article',),
+    'tags': ('article', 'tags', 'navigation'),
+    'sidebar_tags': ('tags', 'navigation'),
+    'comments': ('comments',),
+}
+# общий счётчик, не привязанный к статье
+SHARED_VERSIONS = ('navigation',)
+
+
+def get_fragment_cache():
+    return get_cache('fragments')
+
+
+def get_cache_timeout():
+    return getattr(settings, 'ARTICLE_FRAGMENT_CACHE_TIMEOUT', 3600)
+
+
+def version_key(kind, article_id):
+    return VERSION_KEY.format(kind=kind, article_id=0 if kind in SHARED_VERSIONS else article_id)
+
+
+def new_version():
+    """
+    Начальное значение счётчика. Берётся от времени, а не 1, чтобы после вытеснения счётчика из кэша не совпасть
+    со старой версией и не отдать устаревший фрагмент.
+    """
+    return time.time_ns() // 1000
+
+
+def get_versions(article):
+    """
+    Версии статьи для всех фрагментов, одним обращением к кэшу на страницу (результат запоминается в статье)
+    """
+    cache = get_fragment_cache()
+    versions = getattr(article, '_fragment_versions', None)
+    if versions is None:
+        kinds = ('tags', 'comments') + SHARED_VERSIONS
+        keys = {version_key(kind, article.pk): kind for kind in kinds}
+        found = cache.get_many(keys)
+        missing = {key: new_version() for key in keys if key not in found}
+        if missing:
+            cache.set_many(missing, None)
+            found.update(missing)
+        versions = {keys[key]: value for key, value in found.items()}
+        versions['article'] = article.time_update.timestamp() if article.time_update else 0
+        article._fragment_versions = versions
+    return versions
+
+
+def bump_version(kind, article_id=None):
+    """
+    Сброс фрагментов, зависящих от версии kind статьи article_id (для общих версий article_id не нужен)
+    """
+    cache = get_fragment_cache()
+    key = version_key(kind, article_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, new_version(), None)
+
+
+def count(name, result):
+    cache = get_fragment_cache()
+    key = STATS_KEY.format(name=name, result=result)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_fragment(name, article, render):
+    """
+    HTML фрагмента name статьи из кэша. При промахе фрагмент строится функцией render и сохраняется.
+    """
+    cache = get_fragment_cache()
+    versions = get_versions(article)
+    stamp = ':'.join(str(versions[kind]) for kind in ARTICLE_FRAGMENTS[name])
+    key = FRAGMENT_KEY.format(name=name, article_id=article.pk, stamp=stamp)
+    html = cache.get(key)
+    if html is None:
+        count(name, 'miss')
+        html = render()
+        cache.set(key, html, get_cache_timeout())
+    else:
+        count(name, 'hit')
+    return mark_safe(html)
+
+
+def get_fragment_stats():
+    """
+    Попадания и промахи по фрагментам: {name: {'hit': ..., 'miss': ..., 'ratio': ...}}
+    """
+    cache = get_fragment_cache()
+    keys = {STATS_KEY.format(name=name, result=result): (name, result)
+            for name in ARTICLE_FRAGMENTS for result in ('hit', 'miss')}
+    values = cache.get_many(keys)
+    stats = {name: {'hit': 0, 'miss': 0} for name in ARTICLE_FRAGMENTS}
+    for key, value in values.items():
+        name, result = keys[key]
+        stats[name][result] = value
+    for item in stats.values():
+        total = item['hit'] + item['miss']
+        item['ratio'] = round(item['hit'] / total, 4) if total else None
+    return stats
+
+
+def reset_fragment_stats():
+    cache = get_fragment_cache()
+    cache.delete_many([STATS_KEY.format(name=name, result=result)
+                       for name in ARTICLE_FRAGMENTS for result in ('hit', 'miss')])
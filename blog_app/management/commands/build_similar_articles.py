@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from blog_app.similarity import rebuild_similarities
+
+
+class Command(BaseCommand):
+    """
+    Полная перестройка индекса похожих статей (blog_app.similarity). Нужна после массового импорта статей и
+    перемещения категорий в дереве, которые сигналами не отслеживаются.
+    """
+    help = 'Перестраивает индекс похожих статей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Размер пачки bulk_create')
+
+    def handle(self, *args, **options):
+        total = rebuild_similarities(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Записано пар похожих статей: {total}'))
@@ -0,0 +1,76 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from blog_app.models import ArticleViewDaily, ViewCount
+
+
+class Command(BaseCommand):
+    """
+    Свёртка сырых просмотров ViewCount в дневные агрегаты ArticleViewDaily.
+
+    Для дней, по которым агрегата ещё нет (просмотры до появления агрегатов или записанные в обход буфера), агрегат
+    создаётся со значениями views = unique_ips = количество строк ViewCount. У существующих агрегатов поднимается
+    unique_ips, если сырых строк оказалось больше. Просматриваются только дни начиная с --since, по умолчанию - с
+    последнего дня, за который агрегаты уже есть (он мог быть свёрнут не полностью); если агрегатов ещё нет, все дни.
+    Сырые просмотры за более ранние дни без агрегатов сворачиваются запуском с --since. С параметром --prune-days сырые просмотры старше указанного
+    количества дней после свёртки удаляются: счётчики статей при этом не меняются, но IP из удалённых дней
+    больше не участвуют в подсчёте уникальных посетителей.
+    """
+    help = 'Переносит сырые просмотры статей в дневные агрегаты и при необходимости удаляет старые просмотры'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune-days', type=int, default=None,
+                            help='Удалить сырые просмотры старше указанного количества дней')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Размер пачки bulk_create')
+        parser.add_argument('--since', type=date.fromisoformat, default=None,
+                            help='Первый сворачиваемый день (ГГГГ-ММ-ДД), по умолчанию - последний свёрнутый день')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        since = options['since'] or ArticleViewDaily.objects.aggregate(last=Max('day'))['last']
+        aggregates = ArticleViewDaily.objects.all()
+        raw = ViewCount.objects.order_by()
+        if since is not None:
+            aggregates = aggregates.filter(day__gte=since)
+            raw = raw.filter(viewed_day__gte=since)
+        existing = {
+            (row['article_id'], row['day']): (row['pk'], row['unique_ips'])
+            for row in aggregates.values('pk', 'article_id', 'day', 'unique_ips').iterator()
+        }
+        raw = raw.values('article_id', 'viewed_day').annotate(total=Count('pk')).values_list(
+            'article_id', 'viewed_day', 'total')
+
+        # created - дни без агрегата на момент проверки; часть из них мог параллельно создать сброс буфера
+        created = updated = 0
+        batch = []
+        corrected = []
+        with transaction.atomic():
+            for article_id, day, total in raw.iterator(chunk_size=batch_size):
+                key = (article_id, day)
+                if key not in existing:
+                    batch.append(ArticleViewDaily(article_id=article_id, day=day, views=total, unique_ips=total))
+                    created += 1
+                elif existing[key][1] < total:
+                    corrected.append(ArticleViewDaily(pk=existing[key][0], unique_ips=total))
+                if len(batch) >= batch_size:
+                    ArticleViewDaily.objects.bulk_create(batch, ignore_conflicts=True)
+                    batch = []
+                if len(corrected) >= batch_size:
+                    updated += ArticleViewDaily.objects.bulk_update(corrected, ['unique_ips'])
+                    corrected = []
+            ArticleViewDaily.objects.bulk_create(batch, ignore_conflicts=True)
+            updated += ArticleViewDaily.objects.bulk_update(corrected, ['unique_ips'])
+
+        period = f'с {since.isoformat()}' if since else 'за все дни'
+        self.stdout.write(f'Свёрнуты просмотры {period}: дней без агрегата {created}, обновлено агрегатов {updated}')
+
+        if options['prune_days'] is not None:
+            border = timezone.localdate() - timedelta(days=options['prune_days'])
+            deleted, _ = ViewCount.objects.filter(viewed_day__lt=border).delete()
+            self.stdout.write(f'Удалено сырых просмотров: {deleted}')
+
+        self.stdout.write(self.style.SUCCESS('Свёртка просмотров завершена'))
@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from blog_app.models import Article
+from blog_app.transfer import export_records
+
+
+class Command(BaseCommand):
+    """
+    Экспорт статей в файл JSONL (формат описан в blog_app.transfer), который принимает команда import_articles.
+    Статьи читаются из базы курсором пачками, поэтому память не зависит от количества статей.
+    """
+    help = 'Экспортирует статьи в файл JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default='-', help='Путь к файлу JSONL или - для стандартного вывода')
+        parser.add_argument('--status', choices=[status for status, _ in Article.STATUS_OPTIONS],
+                            help='Экспортировать только статьи с этим статусом')
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Количество статей, читаемых за один раз')
+
+    def handle(self, *args, **options):
+        # Article.objects.all() возвращает только опубликованные статьи
+        queryset = Article.objects.filter()
+        if options['status']:
+            queryset = queryset.filter(status=options['status'])
+
+        to_stdout = options['path'] == '-'
+        stream = self.stdout if to_stdout else open(options['path'], 'w', encoding='utf-8')
+        total = 0
+        try:
+            for record in export_records(queryset, chunk_size=options['chunk_size']):
+                stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+                total += 1
+        finally:
+            if not to_stdout:
+                stream.close()
+        if not to_stdout:
+            self.stdout.write(self.style.SUCCESS(f'Экспортировано статей: {total}'))
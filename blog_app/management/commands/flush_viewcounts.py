@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from blog_app.viewcounter import view_buffer
+
+
+class Command(BaseCommand):
+    """
+    Перенос буферизованных просмотров в базу. Запускается при остановке приложения (после gunicorn),
+    а также периодически, чтобы забрать просмотры, сохранённые в файлы при недоступности базы.
+    """
+    help = 'Записывает в базу просмотры статей из буфера и из файлов VIEWCOUNT_SPOOL_DIR'
+
+    def handle(self, *args, **options):
+        flushed = view_buffer.flush()
+        drained = view_buffer.drain_spool()
+        self.stdout.write(self.style.SUCCESS(f'Записано просмотров: {flushed + drained}'))
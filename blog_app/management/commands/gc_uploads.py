@@ -0,0 +1,56 @@
+import posixpath
+from datetime import timedelta
+
+from ckeditor_uploader.utils import get_thumb_filename, storage
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blog_app.models import Article
+from reqsoft.storage import upload_references
+
+
+class Command(BaseCommand):
+    """
+    Удаление загрузок CKEditor, на которые не ссылается ни одна статья.
+
+    Ссылки ищутся в HTML полного описания всех статей, включая черновики; вместе с файлом сохраняется его миниатюра.
+    Файлы моложе --min-age часов не удаляются: их могли загрузить в статью, которую ещё не сохранили.
+    """
+    help = 'Удаляет загрузки CKEditor, на которые нет ссылок из статей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=float, default=24,
+                            help='Не удалять файлы моложе указанного количества часов')
+        parser.add_argument('--dry-run', action='store_true', help='Только показать файлы, которые будут удалены')
+
+    def walk(self, directory):
+        try:
+            directories, files = storage.listdir(directory)
+        except FileNotFoundError:
+            return
+        for name in files:
+            yield posixpath.join(directory, name)
+        for name in directories:
+            yield from self.walk(posixpath.join(directory, name))
+
+    def handle(self, *args, **options):
+        upload_dir = str(settings.CKEDITOR_UPLOAD_PATH).strip('/')
+        texts = Article._base_manager.values_list('full_description', flat=True).iterator(chunk_size=500)
+        referenced = upload_references(texts, settings.MEDIA_URL, upload_dir)
+        referenced |= {get_thumb_filename(name) for name in referenced}
+        self.stdout.write(f'Файлов со ссылками из статей: {len(referenced)}')
+
+        threshold = timezone.now() - timedelta(hours=options['min_age'])
+        removed = size = 0
+        for name in self.walk(upload_dir):
+            if name in referenced or storage.get_modified_time(name) > threshold:
+                continue
+            removed += 1
+            size += storage.size(name)
+            if options['dry_run']:
+                self.stdout.write(name)
+            else:
+                storage.delete(name)
+        action = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(f'{action} файлов: {removed} ({size / 1024 / 1024:.1f} МБ)'))
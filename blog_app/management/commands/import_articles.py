@@ -0,0 +1,57 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from blog_app.search import get_search_backend
+from blog_app.similarity import rebuild_similarities
+from blog_app.transfer import ArticleImporter, TransferError
+
+
+class Command(BaseCommand):
+    """
+    Массовый импорт статей из файла JSONL (формат описан в blog_app.transfer). Статьи записываются пачками через
+    bulk_create, каждая пачка в своей транзакции: при ошибке в записи уже импортированные пачки остаются в базе.
+    После импорта перестраиваются поисковый индекс (для PostgreSQL) и индекс похожих статей.
+    """
+    help = 'Импортирует статьи из файла JSONL'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу JSONL или - для стандартного ввода')
+        parser.add_argument('--batch-size', type=int, default=500, help='Количество статей в одной пачке')
+        parser.add_argument('--create-categories', action='store_true',
+                            help='Создавать отсутствующие категории вместо ошибки')
+        parser.add_argument('--default-author', help='Автор (username) для статей без автора или с неизвестным')
+        parser.add_argument('--skip-indexes', action='store_true',
+                            help='Не перестраивать поисковый индекс и индекс похожих статей')
+
+    def handle(self, *args, **options):
+        try:
+            importer = ArticleImporter(batch_size=options['batch_size'],
+                                       create_categories=options['create_categories'],
+                                       default_author=options['default_author'])
+        except ValueError as error:
+            raise CommandError(error)
+
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8')
+        try:
+            for imported in importer.run(stream):
+                self.stdout.write(f'Импортировано статей: {imported}')
+        except TransferError as error:
+            raise CommandError(f'{error}. Импортировано статей до ошибки: {importer.imported}')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано статей: {importer.imported}, создано тегов: {importer.tags_created}, '
+            f'создано категорий: {importer.categories.created}'))
+        if options['skip_indexes'] or not importer.imported:
+            return
+        if connection.vendor == 'postgresql':
+            get_search_backend().rebuild()
+            self.stdout.write('Поисковый индекс перестроен')
+        if getattr(settings, 'SIMILAR_ARTICLES_AUTO_UPDATE', True):
+            total = rebuild_similarities()
+            self.stdout.write(f'Индекс похожих статей перестроен, пар: {total}')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from blog_app.categorystats import rebuild_category_counts
+from blog_app.navigation import invalidate_category_tree
+
+
+class Command(BaseCommand):
+    """
+    Пересчёт количества статей и файлов у всех категорий (своих и вместе с подкатегориями) за один проход по дереву
+    снизу вверх. Нужен после массовых изменений в обход сигналов: QuerySet.update, bulk_create, правок в базе.
+    """
+    help = 'Пересчитывает количество статей и файлов в категориях'
+
+    def handle(self, *args, **options):
+        changed = rebuild_category_counts()
+        invalidate_category_tree()
+        self.stdout.write(self.style.SUCCESS(f'Исправлено категорий: {changed}'))
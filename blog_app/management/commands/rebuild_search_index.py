@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from blog_app.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """
+    Полная перестройка поискового индекса статей (blog_app.search), например после массового импорта через
+    bulk_create, при котором обработчики сохранения статей не вызываются.
+    """
+    help = 'Перестраивает поисковый индекс статей'
+
+    def handle(self, *args, **options):
+        get_search_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS('Поисковый индекс перестроен'))
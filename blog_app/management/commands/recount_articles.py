@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+from blog_app.models import Article, ArticleViewDaily, Comment
+
+
+def actual_comment_count():
+    return Coalesce(Subquery(
+        Comment.objects.filter(article_id=OuterRef('pk')).order_by()
+        .values('article_id').annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+def actual_view_count():
+    return Coalesce(Subquery(
+        ArticleViewDaily.objects.filter(article_id=OuterRef('pk')).order_by()
+        .values('article_id').annotate(total=Sum('views')).values('total')
+    ), 0)
+
+
+class Command(BaseCommand):
+    """
+    Сверка денормализованных счётчиков Article.view_count и Article.comment_count с фактическими данными.
+    Расхождения ищутся одним запросом и исправляются одним UPDATE с подзапросами, статьи в Python не загружаются.
+    """
+    help = 'Пересчитывает счётчики просмотров и комментариев статей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Только показать количество расхождений')
+
+    def handle(self, *args, **options):
+        drifted = (Article.objects.order_by()
+                   .annotate(actual_comments=actual_comment_count(), actual_views=actual_view_count())
+                   .exclude(comment_count=F('actual_comments'), view_count=F('actual_views')))
+        total = drifted.count()
+        self.stdout.write(f'Статей с расхождением счётчиков: {total}')
+        if options['dry_run'] or not total:
+            return
+        updated = Article.objects.filter(pk__in=drifted.values('pk')).update(
+            comment_count=actual_comment_count(), view_count=actual_view_count())
+        self.stdout.write(self.style.SUCCESS(f'Исправлено статей: {updated}'))
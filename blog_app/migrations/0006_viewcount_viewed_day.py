@@ -0,0 +1,39 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:23
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Min
+from django.db.models.functions import TruncDate
+
+
+def fill_viewed_day(apps, schema_editor):
+    """
+    Заполнение дня просмотра у существующих записей одним UPDATE (день в текущем часовом поясе, как у
+    timezone.localdate) и удаление дублей (article, ip_address, viewed_day), которые могли появиться из-за гонок
+    get_or_create, перед созданием уникального ограничения: из каждой группы остаётся запись с наименьшим id.
+    """
+    ViewCount = apps.get_model('blog_app', 'ViewCount')
+    ViewCount.objects.update(viewed_day=TruncDate('viewed_on'))
+    first_views = (ViewCount.objects.order_by().values('article_id', 'ip_address', 'viewed_day')
+                   .annotate(first_pk=Min('pk')).values('first_pk'))
+    ViewCount.objects.exclude(pk__in=first_views).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_app', '0005_documents'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='viewcount',
+            name='viewed_day',
+            field=models.DateField(default=django.utils.timezone.localdate, verbose_name='День просмотра'),
+        ),
+        migrations.RunPython(fill_viewed_day, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='viewcount',
+            constraint=models.UniqueConstraint(fields=('article', 'ip_address', 'viewed_day'), name='unique_article_ip_day_view'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fold_view_counts(apps, schema_editor):
+    """
+    Первичное заполнение дневных агрегатов по уже накопленным просмотрам (дальше это делает compact_viewcounts)
+    """
+    ViewCount = apps.get_model('blog_app', 'ViewCount')
+    ArticleViewDaily = apps.get_model('blog_app', 'ArticleViewDaily')
+    rows = (ViewCount.objects.order_by().values('article_id', 'viewed_day')
+            .annotate(total=Count('pk')).values_list('article_id', 'viewed_day', 'total'))
+    ArticleViewDaily.objects.bulk_create(
+        (ArticleViewDaily(article_id=article_id, day=day, views=total, unique_ips=total)
+         for article_id, day, total in rows.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_app', '0006_viewcount_viewed_day'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArticleViewDaily',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('views', models.PositiveIntegerField(default=0, verbose_name='Просмотры')),
+                ('unique_ips', models.PositiveIntegerField(default=0, verbose_name='Уникальные IP')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_views', to='blog_app.article', verbose_name='Статья')),
+            ],
+            options={
+                'verbose_name': 'Просмотры за день',
+                'verbose_name_plural': 'Просмотры по дням',
+                'db_table': 'app_article_views_daily',
+                'ordering': ('-day',),
+                'indexes': [models.Index(fields=['-day', 'article'], name='app_article_day_f64873_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='articleviewdaily',
+            constraint=models.UniqueConstraint(fields=('article', 'day'), name='unique_article_view_day'),
+        ),
+        migrations.RunPython(fold_view_counts, migrations.RunPython.noop),
+    ]
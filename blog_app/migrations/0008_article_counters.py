@@ -0,0 +1,45 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:26
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    """
+    Первичное заполнение счётчиков просмотров и комментариев статей
+    """
+    Article = apps.get_model('blog_app', 'Article')
+    Comment = apps.get_model('blog_app', 'Comment')
+    ArticleViewDaily = apps.get_model('blog_app', 'ArticleViewDaily')
+    Article.objects.update(
+        comment_count=Coalesce(Subquery(
+            Comment.objects.filter(article_id=OuterRef('pk')).order_by()
+            .values('article_id').annotate(total=Count('pk')).values('total')
+        ), 0),
+        view_count=Coalesce(Subquery(
+            ArticleViewDaily.objects.filter(article_id=OuterRef('pk')).order_by()
+            .values('article_id').annotate(total=Sum('views')).values('total')
+        ), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_app', '0007_articleviewdaily'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Комментарии'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Просмотры'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
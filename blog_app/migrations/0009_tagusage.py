@@ -0,0 +1,47 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_tag_usage(apps, schema_editor):
+    """
+    Первичный подсчёт статей по тегам
+    """
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    TaggedItem = apps.get_model('taggit', 'TaggedItem')
+    Article = apps.get_model('blog_app', 'Article')
+    TagUsage = apps.get_model('blog_app', 'TagUsage')
+    content_type = ContentType.objects.filter(app_label='blog_app', model='article').first()
+    if content_type is None:
+        return
+    rows = (TaggedItem.objects.filter(content_type=content_type, object_id__in=Article.objects.values('pk'))
+            .order_by().values('tag_id').annotate(total=Count('pk')).values_list('tag_id', 'total'))
+    TagUsage.objects.bulk_create([TagUsage(tag_id=tag_id, num_times=total) for tag_id, total in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_app', '0008_article_counters'),
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagUsage',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to='taggit.tag', verbose_name='Тег')),
+                ('num_times', models.PositiveIntegerField(default=0, verbose_name='Количество статей')),
+            ],
+            options={
+                'verbose_name': 'Использование тега',
+                'verbose_name_plural': 'Использование тегов',
+                'db_table': 'app_tag_usage',
+                'indexes': [models.Index(fields=['-num_times'], name='app_tag_usa_num_tim_a4d378_idx')],
+            },
+        ),
+        migrations.RunPython(fill_tag_usage, migrations.RunPython.noop),
+    ]
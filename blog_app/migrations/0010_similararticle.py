@@ -0,0 +1,33 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_app', '0009_tagusage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarArticle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Оценка похожести')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_links', to='blog_app.article', verbose_name='Статья')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='blog_app.article', verbose_name='Похожая статья')),
+            ],
+            options={
+                'verbose_name': 'Похожая статья',
+                'verbose_name_plural': 'Похожие статьи',
+                'db_table': 'app_similar_articles',
+                'indexes': [models.Index(fields=['article', '-score'], name='app_similar_article_507c69_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='similararticle',
+            constraint=models.UniqueConstraint(fields=('article', 'similar'), name='unique_similar_article'),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:31
+
+import html
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+from django.utils.html import strip_tags
+
+SEARCH_CONFIG = 'russian'
+
+SQLITE_FORWARD = [
+    """CREATE VIRTUAL TABLE app_articles_fts USING fts5(
+        title, search_text, content='app_articles', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER app_articles_fts_insert AFTER INSERT ON app_articles BEGIN
+        INSERT INTO app_articles_fts(rowid, title, search_text) VALUES (new.id, new.title, new.search_text);
+    END""",
+    """CREATE TRIGGER app_articles_fts_delete AFTER DELETE ON app_articles BEGIN
+        INSERT INTO app_articles_fts(app_articles_fts, rowid, title, search_text)
+        VALUES ('delete', old.id, old.title, old.search_text);
+    END""",
+    """CREATE TRIGGER app_articles_fts_update AFTER UPDATE OF title, search_text ON app_articles BEGIN
+        INSERT INTO app_articles_fts(app_articles_fts, rowid, title, search_text)
+        VALUES ('delete', old.id, old.title, old.search_text);
+        INSERT INTO app_articles_fts(rowid, title, search_text) VALUES (new.id, new.title, new.search_text);
+    END""",
+    "INSERT INTO app_articles_fts(app_articles_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS app_articles_fts_insert',
+    'DROP TRIGGER IF EXISTS app_articles_fts_delete',
+    'DROP TRIGGER IF EXISTS app_articles_fts_update',
+    'DROP TABLE IF EXISTS app_articles_fts',
+]
+
+POSTGRESQL_FORWARD = [
+    'CREATE INDEX app_articles_search_vector_gin ON app_articles USING GIN (search_vector)',
+    f"""UPDATE app_articles SET search_vector =
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(search_text, '')), 'B')""",
+]
+
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS app_articles_search_vector_gin',
+]
+
+
+def fill_search_text(apps, schema_editor):
+    """
+    Текст статей без HTML для поиска (дальше его обновляет Article.save())
+    """
+    Article = apps.get_model('blog_app', 'Article')
+    for article in Article.objects.only('pk', 'full_description').iterator():
+        text = ' '.join(html.unescape(strip_tags(article.full_description or '')).split())
+        Article.objects.filter(pk=article.pk).update(search_text=text)
+
+
+def run_vendor_sql(statements):
+    """
+    Поисковые структуры зависят от базы: FTS5 с триггерами для SQLite, GIN индекс для PostgreSQL
+    """
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_app', '0010_similararticle'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='search_text',
+            field=models.TextField(blank=True, editable=False, verbose_name='Текст для поиска'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(fill_search_text, migrations.RunPython.noop),
+        migrations.RunPython(
+            run_vendor_sql({'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}),
+            run_vendor_sql({'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD}),
+        ),
+    ]
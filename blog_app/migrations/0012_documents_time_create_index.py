@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_app', '0011_article_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='documents',
+            index=models.Index(fields=['-time_create', '-id'], name='blog_app_do_time_cr_745eaa_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:56
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    """
+    Первичное заполнение количества статей и файлов категорий (своих и вместе с подкатегориями)
+    """
+    Article = apps.get_model('blog_app', 'Article')
+    Category = apps.get_model('blog_app', 'Category')
+    Documents = apps.get_model('blog_app', 'Documents')
+    articles = dict(Article.objects.filter(status='published').order_by().values_list('category_id')
+                    .annotate(count=Count('pk')))
+    files = dict(Documents.objects.order_by().values_list('category_id').annotate(count=Count('pk')))
+    nodes = list(Category.objects.order_by('tree_id', 'lft'))
+    by_pk = {node.pk: node for node in nodes}
+    for node in nodes:
+        node.article_count = node.subtree_article_count = articles.get(node.pk, 0)
+        node.file_count = node.subtree_file_count = files.get(node.pk, 0)
+    for node in reversed(nodes):
+        parent = by_pk.get(node.parent_id)
+        if parent is not None:
+            parent.subtree_article_count += node.subtree_article_count
+            parent.subtree_file_count += node.subtree_file_count
+    Category.objects.bulk_update(nodes, ['article_count', 'file_count', 'subtree_article_count',
+                                         'subtree_file_count'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_app', '0012_documents_time_create_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='article_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Статьи'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='file_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Файлы'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='subtree_article_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Статьи с подкатегориями'),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='subtree_file_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Файлы с подкатегориями'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 5.0.2 on 2026-10-18 11:59
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def deduplicate_category_slugs(apps, schema_editor):
+    """
+    Перед добавлением уникальности: повторяющимся и пустым slug категорий добавляется номер, первая по id категория
+    сохраняет свой slug
+    """
+    Category = apps.get_model('blog_app', 'Category')
+    categories = list(Category.objects.order_by('pk').only('slug'))
+    taken = {category.slug for category in categories}
+    seen = set()
+    changed = []
+    for category in categories:
+        if category.slug and category.slug not in seen:
+            seen.add(category.slug)
+            continue
+        base = category.slug or f'category-{category.pk}'
+        number = 2
+        while f'{base}-{number}' in taken:
+            number += 1
+        category.slug = f'{base}-{number}'
+        taken.add(category.slug)
+        seen.add(category.slug)
+        changed.append(category)
+    Category.objects.bulk_update(changed, ['slug'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blog_app', '0013_category_counters'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(deduplicate_category_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='category',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=255, unique=True, verbose_name='URL категории'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['-fixed', '-time_create'], name='article_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(condition=models.Q(('status', 'published')), fields=['category', '-fixed', '-time_create'], name='article_published_cat_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['article', 'level', '-tree_id'], include=('status', 'lft', 'rght'), name='comment_article_roots_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['tree_id', 'lft'], name='comment_tree_lft_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='viewcount',
+            index=models.Index(fields=['article', 'viewed_day'], include=('ip_address', 'viewed_on'), name='viewcount_article_day_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.2 on 2026-10-18 13:05
+
+import blog_app.search
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    GIN индекс поискового вектора уже создан в PostgreSQL миграцией 0011_article_search, здесь он только переносится
+    в состояние модели (Article.Meta.indexes)
+    """
+
+    dependencies = [
+        ('blog_app', '0014_published_indexes'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='article',
+                    index=blog_app.search.SearchVectorIndex(fields=['search_vector'],
+                                                            name='app_articles_search_vector_gin'),
+                ),
+            ],
+        ),
+    ]
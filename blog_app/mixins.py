@@ -1,5 +1,5 @@
 from customeuser_app.utils import get_client_ip
-from .models import ViewCount
+from .viewcounter import view_buffer
 
 
 class ViewCountMixin:
@@ -11,6 +11,6 @@ class ViewCountMixin:
         obj = super().get_object()
         # получаем IP-адрес пользователя
         ip_address = get_client_ip(self.request)
-        # получаем или создаем запись о просмотре статьи для данного пользователя
-        ViewCount.objects.get_or_create(article=obj, ip_address=ip_address)
+        # регистрируем просмотр в буфере, запись в базу выполнит фоновый поток (см. blog_app.viewcounter)
+        view_buffer.add(obj.pk, ip_address)
         return obj
@@ -1,16 +1,18 @@
-from datetime import date
-
 from ckeditor.fields import RichTextField
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import FileExtensionValidator
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
 from mptt.fields import TreeForeignKey
 from mptt.models import MPTTModel
 from taggit.managers import TaggableManager
 from taggit.models import Tag
 
-from reqsoft.utils import unique_slugify
+from reqsoft.utils import save_with_unique_slug, html_to_text
+from .categorystats import COUNT_FIELDS, counted_category_id, rebuild_category_counts, suspend_count_updates
+from .search import SearchVectorIndex
 
 # Create your models here.
 """
@@ -33,6 +35,16 @@ Django.
 User = get_user_model()
 
 
+def update_fields_except(instance, excluded):
+    """
+    Поля для сохранения существующего объекта без полей excluded и отложенных (deferred) полей: счётчики, которые
+    меняются UPDATE с F() в обход объекта, у загруженного ранее объекта могут быть устаревшими
+    """
+    excluded = set(excluded) | instance.get_deferred_fields()
+    return [field.name for field in instance._meta.concrete_fields
+            if not field.primary_key and field.attname not in excluded]
+
+
 class Article(models.Model):
     """
     Модель постов для сайта
@@ -47,8 +59,7 @@ class Article(models.Model):
             """
             Список статей (SQL запрос с фильтрацией для страницы списка статей)
             """
-            return (self.get_queryset().select_related('author', 'category')
-                    .prefetch_related('views').filter(status='published'))
+            return self.get_queryset().select_related('author', 'category').filter(status='published')
 
         def detail(self):
             """
@@ -56,10 +67,11 @@ class Article(models.Model):
             добавляем метод detail(), который можем использовать в представлениях, например в DetailView,
             который оптимизирует SQL запросы.
             А в представлении DetailView добавляем строку: queryset = model.objects.detail()
+            Комментарии сюда не входят: они выводятся постранично (см. blog_app.comment_threads), теги тоже не
+            загружаются заранее - они читаются только при построении закэшированного фрагмента (см. blog_app.fragments)
             """
             return self.get_queryset()\
                 .select_related('author', 'category')\
-                .prefetch_related('comments', 'comments__author', 'comments__author__profile', 'tags')\
                 .filter(status='published')
 
     STATUS_OPTIONS = (
@@ -87,20 +99,36 @@ class Article(models.Model):
     fixed = models.BooleanField(verbose_name='Зафиксировано', default=False)
     category = TreeForeignKey('Category', on_delete=models.PROTECT, related_name='articles', verbose_name='Категория')
     tags = TaggableManager()
+    view_count = models.PositiveIntegerField(verbose_name='Просмотры', default=0, editable=False)
+    comment_count = models.PositiveIntegerField(verbose_name='Комментарии', default=0, editable=False)
+    search_text = models.TextField(verbose_name='Текст для поиска', blank=True, editable=False)
+    search_vector = SearchVectorField(verbose_name='Поисковый вектор', null=True, editable=False)
 
     objects = ArticleManager()
 
+    # счётчики, которые меняются только UPDATE с F() (blog_app.viewcounter, blog_app.signals)
+    COUNTER_FIELDS = ('view_count', 'comment_count')
+
     class Meta:
         """
         ordering - сортировка, ставим -created_at, чтобы выводились статьи в обратном порядке (сначала новые, потом старые).
         verbose_name - название модели в админке в ед.ч
         verbose_name_plural - в мн.числе
         db_table - название таблицы в БД. (можно не добавлять, будет создано автоматически)
-        indexes - индексирование полей, чтобы ускорить результаты сортировки.
+        indexes - индексирование полей, чтобы ускорить результаты сортировки. Частичные индексы содержат только
+        опубликованные статьи в порядке списков (все запросы ArticleManager фильтруют status='published'), в том числе
+        для выборки по категории. GIN индекс поискового вектора создаётся только в PostgreSQL (blog_app.search).
         """
         db_table = 'app_articles'
         ordering = ['-fixed', '-time_create']
-        indexes = [models.Index(fields=['-fixed', '-time_create', 'status'])]
+        indexes = [
+            models.Index(fields=['-fixed', '-time_create', 'status']),
+            models.Index(fields=['-fixed', '-time_create'], condition=models.Q(status='published'),
+                         name='article_published_idx'),
+            models.Index(fields=['category', '-fixed', '-time_create'], condition=models.Q(status='published'),
+                         name='article_published_cat_idx'),
+            SearchVectorIndex(fields=['search_vector'], name='app_articles_search_vector_gin'),
+        ]
         verbose_name = 'Статья'
         verbose_name_plural = 'Статьи'
 
@@ -110,12 +138,27 @@ class Article(models.Model):
     def get_absolute_url(self):
         return reverse('blog_app:article_detail', kwargs={'slug': self.slug})
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """
+        Запоминаем категорию, в которой статья учтена при загрузке (см. blog_app.categorystats), чтобы при
+        сохранении узнать о публикации или переносе статьи без лишнего запроса
+        """
+        instance = super().from_db(db, field_names, values)
+        if 'status' in instance.__dict__ and 'category_id' in instance.__dict__:
+            instance._counted_category_id = counted_category_id(instance)
+        return instance
+
     def save(self, *args, **kwargs):
         """
-        Сохранение полей модели при их отсутствии заполнения
+        Сохранение полей модели при их отсутствии заполнения и обновление текста статьи без HTML для поиска.
+        Счётчики COUNTER_FIELDS существующей статьи не перезаписываются значениями загруженного объекта.
         """
+        self.search_text = html_to_text(self.full_description)
+        if not self._state.adding and not args and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = update_fields_except(self, self.COUNTER_FIELDS)
         if not self.slug:
-            self.slug = unique_slugify(self, self.title)
+            return save_with_unique_slug(self, self.title, lambda: super(Article, self).save(*args, **kwargs))
         super().save(*args, **kwargs)
 
     def get_objects(self):
@@ -124,21 +167,20 @@ class Article(models.Model):
     def get_view_count(self):
         """
         Возвращает количество просмотров для данной статьи
-        количество объектов в связанной модели ViewCount через related_name='views', которые относятся к данной
-        статье через внешний ключ
+        денормализованный счётчик view_count, который увеличивается через F() при сбросе буфера просмотров
+        (blog_app.viewcounter) и сверяется с дневными агрегатами командой recount_articles. Считаются все просмотры,
+        включая повторные с одного IP (сумма ArticleViewDaily.views), а не уникальные IP, как раньше.
         """
-        return self.views.count()
+        return self.view_count
 
     def get_today_view_count(self):
         """
         Возвращает количество просмотров для данной статьи за сегодняшний день
-        возвращает количество просмотров данной статьи за текущий день. Он фильтрует связанные объекты ViewCount, чтобы
-        получить только те, которые были просмотрены сегодня. Это достигается через фильтр viewed_on__date=today,
-        который выбирает только те записи в связанной модели ViewCount, где поле viewed_on равно сегодняшней дате,
-        определенной с помощью date.today(). Затем он возвращает количество отфильтрованных записей.
+        одна строка ArticleViewDaily за текущую дату (timezone.localdate()), выбираемая по уникальному индексу
+        (article, day).
         """
-        today = date.today()
-        return self.views.filter(viewed_on__date=today).count()
+        today = timezone.localdate()
+        return self.daily_views.filter(day=today).values_list('views', flat=True).first() or 0
 
 
 class Category(MPTTModel):
@@ -146,7 +188,7 @@ class Category(MPTTModel):
     Модель категорий с вложенностью
     """
     title = models.CharField(max_length=255, verbose_name='Название категории')
-    slug = models.SlugField(max_length=255, verbose_name='URL категории', blank=True)
+    slug = models.SlugField(max_length=255, verbose_name='URL категории', blank=True, unique=True)
     description = models.TextField(verbose_name='Описание категории', max_length=300)
     parent = TreeForeignKey(
         'self',
@@ -157,6 +199,12 @@ class Category(MPTTModel):
         related_name='children',
         verbose_name='Родительская категория'
     )
+    article_count = models.PositiveIntegerField(verbose_name='Статьи', default=0, editable=False)
+    file_count = models.PositiveIntegerField(verbose_name='Файлы', default=0, editable=False)
+    subtree_article_count = models.PositiveIntegerField(verbose_name='Статьи с подкатегориями', default=0,
+                                                        editable=False)
+    subtree_file_count = models.PositiveIntegerField(verbose_name='Файлы с подкатегориями', default=0,
+                                                     editable=False)
 
     class MPTTMeta:
         """
@@ -187,11 +235,26 @@ class Category(MPTTModel):
     def save(self, *args, **kwargs):
         """
         Сохранение полей модели при их отсутствии заполнения
+        Счётчики статей и файлов существующей категории не перезаписываются: их меняют UPDATE из
+        blog_app.categorystats, и у загруженного ранее объекта они могут быть устаревшими.
         """
+        if not self._state.adding and not args and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = update_fields_except(
+                self, [name for pair in COUNT_FIELDS.values() for name in pair])
         if not self.slug:
-            self.slug = unique_slugify(self, self.title)
+            return save_with_unique_slug(self, self.title, lambda: super(Category, self).save(*args, **kwargs))
         super().save(*args, **kwargs)
 
+    def delete(self, *args, **kwargs):
+        """
+        Удаление категории с подкатегориями и файлами. MPTT сдвигает границы узлов дерева до каскадного удаления
+        файлов, поэтому счётчики предков не уменьшаются по одному файлу, а пересчитываются после удаления
+        """
+        with suspend_count_updates():
+            result = super().delete(*args, **kwargs)
+        rebuild_category_counts()
+        return result
+
 
 class Comment(MPTTModel):
     """
@@ -221,7 +284,14 @@ class Comment(MPTTModel):
 
     class Meta:
         db_table = 'app_comments'
-        indexes = [models.Index(fields=['-time_create', 'time_update', 'status', 'parent'])]
+        indexes = [
+            models.Index(fields=['-time_create', 'time_update', 'status', 'parent']),
+            # страницы веток статьи: корни (level=0) по убыванию tree_id (blog_app.comment_threads)
+            models.Index(fields=['article', 'level', '-tree_id'], include=['status', 'lft', 'rght'],
+                         name='comment_article_roots_idx'),
+            # ответы ветки по интервалу lft в порядке дерева (django-mptt не добавляет этот индекс в Django 5)
+            models.Index(fields=['tree_id', 'lft'], name='comment_tree_lft_idx'),
+        ]
         ordering = ['-time_create']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
@@ -238,16 +308,26 @@ class ViewCount(models.Model):
     viewed_on - это поле для хранения даты и времени просмотра статьи.
     Мы также определяем два дополнительных параметра для нашей модели: Meta и str(). Параметр Meta содержит информацию
     о сортировке и индексировании модели, а также о ее имени и множественном числе для отображения в административном
-    интерфейсе. Параметр str() определяет строковое представление объекта модели, которое будет отображаться в
+    интерфейсе. viewed_day - день просмотра: один IP засчитывается статье не чаще раза в сутки, что гарантирует
+    уникальное ограничение (article, ip_address, viewed_day). Параметр str() определяет строковое представление объекта модели, которое будет отображаться в
     административном интерфейсе.
     """
     article = models.ForeignKey('Article', on_delete=models.CASCADE, related_name='views')
     ip_address = models.GenericIPAddressField(verbose_name='IP адрес')
     viewed_on = models.DateTimeField(auto_now_add=True, verbose_name='Дата просмотра')
+    viewed_day = models.DateField(default=timezone.localdate, verbose_name='День просмотра')
 
     class Meta:
         ordering = ('-viewed_on',)
-        indexes = [models.Index(fields=['-viewed_on'])]
+        indexes = [
+            models.Index(fields=['-viewed_on']),
+            # уникальные IP статьи за день (blog_app.viewcounter) и свёртка просмотров по дням
+            models.Index(fields=['article', 'viewed_day'], include=['ip_address', 'viewed_on'],
+                         name='viewcount_article_day_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['article', 'ip_address', 'viewed_day'], name='unique_article_ip_day_view')
+        ]
         verbose_name = 'Просмотр'
         verbose_name_plural = 'Просмотры'
 
@@ -255,12 +335,81 @@ class ViewCount(models.Model):
         return self.article.title
 
 
+class ArticleViewDaily(models.Model):
+    """
+    Дневной агрегат просмотров статьи
+    views - количество просмотров статьи за день (включая повторные с того же IP).
+    unique_ips - количество уникальных IP за день, то есть строк ViewCount за этот день.
+    Обновляется при сбросе буфера просмотров (blog_app.viewcounter), исторические данные переносятся командой
+    compact_viewcounts, которая при необходимости удаляет старые сырые просмотры.
+    """
+    article = models.ForeignKey('Article', on_delete=models.CASCADE, related_name='daily_views',
+                                verbose_name='Статья')
+    day = models.DateField(verbose_name='День')
+    views = models.PositiveIntegerField(verbose_name='Просмотры', default=0)
+    unique_ips = models.PositiveIntegerField(verbose_name='Уникальные IP', default=0)
+
+    class Meta:
+        db_table = 'app_article_views_daily'
+        ordering = ('-day',)
+        indexes = [models.Index(fields=['-day', 'article'])]
+        constraints = [models.UniqueConstraint(fields=['article', 'day'], name='unique_article_view_day')]
+        verbose_name = 'Просмотры за день'
+        verbose_name_plural = 'Просмотры по дням'
+
+    def __str__(self):
+        return f'{self.article_id}: {self.day}'
+
+
+class TagUsage(models.Model):
+    """
+    Материализованное количество статей с тегом
+    Поддерживается обработчиками m2m_changed для Article.tags и удаления статей (blog_app.signals), что позволяет
+    выбирать популярные теги по индексу num_times вместо подсчёта по всей таблице taggit.TaggedItem.
+    """
+    tag = models.OneToOneField(Tag, on_delete=models.CASCADE, primary_key=True, related_name='usage',
+                               verbose_name='Тег')
+    num_times = models.PositiveIntegerField(verbose_name='Количество статей', default=0)
+
+    class Meta:
+        db_table = 'app_tag_usage'
+        indexes = [models.Index(fields=['-num_times'])]
+        verbose_name = 'Использование тега'
+        verbose_name_plural = 'Использование тегов'
+
+    def __str__(self):
+        return f'{self.tag_id}: {self.num_times}'
+
+
+class SimilarArticle(models.Model):
+    """
+    Индекс похожих статей
+    Для каждой опубликованной статьи хранится до SIMILAR_ARTICLES_INDEX_SIZE похожих статей с оценкой score
+    (коэффициент Жаккара по тегам плюс близость категорий в дереве), см. blog_app.similarity.
+    """
+    article = models.ForeignKey('Article', on_delete=models.CASCADE, related_name='similar_links',
+                                verbose_name='Статья')
+    similar = models.ForeignKey('Article', on_delete=models.CASCADE, related_name='+', verbose_name='Похожая статья')
+    score = models.FloatField(verbose_name='Оценка похожести')
+
+    class Meta:
+        db_table = 'app_similar_articles'
+        indexes = [models.Index(fields=['article', '-score'])]
+        constraints = [models.UniqueConstraint(fields=['article', 'similar'], name='unique_similar_article')]
+        verbose_name = 'Похожая статья'
+        verbose_name_plural = 'Похожие статьи'
+
+    def __str__(self):
+        return f'{self.article_id} -> {self.similar_id}: {self.score:.3f}'
+
+
 class Documents(models.Model):
 
     class Meta:
         verbose_name = 'Файл'
         verbose_name_plural = 'Файлы'
         ordering = ['-time_create']
+        indexes = [models.Index(fields=['-time_create', '-id'])]
 
     file = models.URLField(verbose_name='Ссылка на файл', max_length=255)
     description = models.CharField(verbose_name='Описание', max_length=255, blank=True)
@@ -277,6 +426,13 @@ class Documents(models.Model):
     def __str__(self):
         return self.file
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if 'category_id' in instance.__dict__:
+            instance._counted_category_id = counted_category_id(instance)
+        return instance
+
     def get_absolute_url(self):
         return reverse('blog_app:file_detail', kwargs={'pk': self.pk})
 
@@ -0,0 +1,85 @@
+"""
+Кэш дерева категорий для меню навигации.
+
+Меню статей и файлов в шапке и боковые панели строятся из одного и того же дерева Category. Дерево читается из базы
+один раз, а готовый HTML каждого вида меню хранится в кэше Django, поэтому на "тёплой" странице запросов к категориям
+нет совсем. Кэш сбрасывается обработчиками сигналов Category (blog_app.signals).
+
+Списки статей и файлов категории включают её подкатегории: категория находится по slug в том же закэшированном
+дереве, а записи поддерева выбираются одним условием на диапазон lft..rght категории (subtree_filter). Количество
+статей и файлов вместе с подкатегориями выводится в меню из счётчиков, хранящихся в самих категориях
+(blog_app.categorystats); при их изменении кэш дерева сбрасывается.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.template.loader import render_to_string
+
+CATEGORY_NODES_KEY = 'blog_app:category_tree:nodes'
+CATEGORY_MENU_KEY = 'blog_app:category_tree:menu:{kind}'
+CATEGORY_SLUGS_KEY = 'blog_app:category_tree:slugs'
+# меню статей ведёт на get_absolute_url категории, меню файлов - на get_absolute_url_files
+CATEGORY_MENU_KINDS = ('articles', 'files')
+
+
+def get_cache_timeout():
+    return getattr(settings, 'CATEGORY_TREE_CACHE_TIMEOUT', 300)
+
+
+def get_category_nodes():
+    """
+    Все категории в порядке обхода дерева (tree_id, lft), пригодном для recursetree
+    """
+    from blog_app.models import Category
+
+    nodes = cache.get(CATEGORY_NODES_KEY)
+    if nodes is None:
+        nodes = list(Category.objects.order_by('tree_id', 'lft'))
+        cache.set(CATEGORY_NODES_KEY, nodes, get_cache_timeout())
+    return nodes
+
+
+def get_category_by_slug(slug):
+    """
+    Категория из закэшированного дерева по slug (уникальному) или None
+    """
+    categories = cache.get(CATEGORY_SLUGS_KEY)
+    if categories is None:
+        categories = {node.slug: node for node in get_category_nodes()}
+        cache.set(CATEGORY_SLUGS_KEY, categories, get_cache_timeout())
+    return categories.get(slug)
+
+
+def subtree_filter(category, field='category'):
+    """
+    Условие "запись относится к категории category или её подкатегориям" для поля field, ссылающегося на Category
+    """
+    return Q(**{f'{field}__tree_id': category.tree_id, f'{field}__lft__range': (category.lft, category.rght)})
+
+
+def render_category_menu(kind='articles'):
+    """
+    HTML пунктов меню категорий (элементы <li> без внешнего <ul>) для меню статей или файлов
+    """
+    if kind not in CATEGORY_MENU_KINDS:
+        raise ValueError(f'Неизвестный вид меню категорий: {kind}')
+    key = CATEGORY_MENU_KEY.format(kind=kind)
+    html = cache.get(key)
+    if html is None:
+        nodes = get_category_nodes()
+        for node in nodes:
+            node.item_count = node.subtree_file_count if kind == 'files' else node.subtree_article_count
+        html = render_to_string('blog_app/category_menu.html', {
+            'nodes': nodes,
+            'kind': kind,
+        })
+        cache.set(key, html, get_cache_timeout())
+    return html
+
+
+def invalidate_category_tree():
+    """
+    Сброс закэшированного дерева категорий и всех видов меню
+    """
+    cache.delete_many([CATEGORY_NODES_KEY, CATEGORY_SLUGS_KEY]
+                      + [CATEGORY_MENU_KEY.format(kind=kind) for kind in CATEGORY_MENU_KINDS])
@@ -0,0 +1,255 @@
+"""
+Полнотекстовый поиск статей.
+
+Поиск идёт по заголовку (вес A) и тексту статьи без HTML-разметки Article.search_text (вес B), который обновляется
+в Article.save(). Реализация зависит от базы данных:
+
+* PostgreSQL - хранимый Article.search_vector с GIN индексом и конфигурацией ARTICLE_SEARCH_CONFIG (russian),
+  вектор пересчитывается обработчиком post_save статьи;
+* SQLite - виртуальная таблица FTS5 app_articles_fts, которую синхронизируют триггеры базы;
+* остальные базы - поиск подстрок (icontains) по тем же полям без индекса и ранжирования.
+
+Обе структуры создаёт миграция 0011_article_search (GIN индекс объявлен в Article.Meta.indexes как SearchVectorIndex),
+полностью перестраивает команда rebuild_search_index.
+Результаты возвращаются постранично без подсчёта общего количества найденного: запрашивается на одну статью больше
+размера страницы, чтобы узнать, есть ли следующая.
+"""
+import re
+
+from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connection
+from django.db.models import Case, F, Q, Value, When
+from django.http import Http404
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+FTS_TABLE = 'app_articles_fts'
+# маркеры подсветки, которые не встречаются в тексте статьи и переживают экранирование HTML
+MARK_START = '\x02'
+MARK_STOP = '\x03'
+# длина фрагмента текста в результатах поиска без полнотекстового индекса
+SNIPPET_LENGTH = 200
+
+
+def get_search_config():
+    return getattr(settings, 'ARTICLE_SEARCH_CONFIG', 'russian')
+
+
+def highlight(snippet):
+    """
+    Безопасный HTML фрагмента: текст экранируется, маркеры заменяются на <mark>
+    """
+    html = escape(snippet or '').replace(MARK_START, '<mark>').replace(MARK_STOP, '</mark>')
+    return mark_safe(html)
+
+
+class SearchVectorIndex(GinIndex):
+    """
+    GIN индекс Article.search_vector. Создаётся только в PostgreSQL: в остальных базах поле не заполняется, а поиск
+    идёт без него, поэтому вместо CREATE INDEX ... USING gin, которого они не понимают, выполняется пустой запрос.
+    """
+
+    def create_sql(self, model, schema_editor, using='', **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return ''
+        return super().create_sql(model, schema_editor, using=using, **kwargs)
+
+    def remove_sql(self, model, schema_editor, **kwargs):
+        if schema_editor.connection.vendor != 'postgresql':
+            return ''
+        return super().remove_sql(model, schema_editor, **kwargs)
+
+
+class SearchBackend:
+    """
+    Базовый класс поискового движка: поиск подстрок без индекса для баз без полнотекстового поиска. Статья
+    находится, если каждое слово запроса есть в заголовке или тексте; найденные в заголовке идут первыми.
+    """
+
+    def search(self, query, offset, limit):
+        """
+        Опубликованные статьи по запросу, отсортированные по релевантности, с атрибутами rank и snippet
+        """
+        from .models import Article
+
+        words = query.split()
+        if not words:
+            return []
+        condition = Q()
+        in_title = Q()
+        for word in words:
+            condition &= Q(title__icontains=word) | Q(search_text__icontains=word)
+            in_title &= Q(title__icontains=word)
+        articles = list(
+            Article.objects.all()
+            .filter(condition)
+            .alias(in_title=Case(When(in_title, then=Value(1)), default=Value(0)))
+            .order_by('-in_title', '-time_create', '-pk')[offset:offset + limit]
+        )
+        for article in articles:
+            article.rank = None
+            article.snippet = highlight(self.get_snippet(article.search_text, words))
+        return articles
+
+    def get_snippet(self, text, words):
+        """
+        Фрагмент текста вокруг первого найденного слова с маркерами подсветки
+        """
+        pattern = re.compile('|'.join(re.escape(word) for word in words), re.IGNORECASE)
+        match = pattern.search(text)
+        start = max(0, match.start() - SNIPPET_LENGTH // 4) if match else 0
+        snippet = text[start:start + SNIPPET_LENGTH]
+        snippet = pattern.sub(lambda found: f'{MARK_START}{found.group()}{MARK_STOP}', snippet)
+        return f'{"…" if start else ""}{snippet}{"…" if start + SNIPPET_LENGTH < len(text) else ""}'
+
+    def index_article(self, article):
+        """
+        Обновление поискового индекса после сохранения статьи
+        """
+
+    def rebuild(self):
+        """
+        Полная перестройка поискового индекса
+        """
+
+
+class PostgresSearchBackend(SearchBackend):
+
+    def get_vector(self):
+        config = get_search_config()
+        return SearchVector('title', weight='A', config=config) + SearchVector('search_text', weight='B', config=config)
+
+    def search(self, query, offset, limit):
+        from .models import Article
+
+        config = get_search_config()
+        search_query = SearchQuery(query, config=config, search_type='websearch')
+        articles = list(
+            Article.objects.all()
+            .filter(search_vector=search_query)
+            .annotate(rank=SearchRank(F('search_vector'), search_query),
+                      snippet=SearchHeadline('search_text', search_query, config=config, start_sel=MARK_START,
+                                             stop_sel=MARK_STOP, max_words=35, min_words=15))
+            .order_by('-rank', '-pk')[offset:offset + limit]
+        )
+        for article in articles:
+            article.snippet = highlight(article.snippet)
+        return articles
+
+    def index_article(self, article):
+        from .models import Article
+
+        Article.objects.filter(pk=article.pk).update(search_vector=self.get_vector())
+
+    def rebuild(self):
+        from .models import Article
+
+        Article.objects.update(search_vector=self.get_vector())
+
+
+class SqliteSearchBackend(SearchBackend):
+
+    def get_match(self, query):
+        """
+        Запрос FTS5 из пользовательской строки: каждое слово берётся в кавычки, слова объединяются через AND
+        """
+        return ' '.join('"{}"'.format(word.replace('"', '""')) for word in query.split())
+
+    def search(self, query, offset, limit):
+        from .models import Article
+
+        match = self.get_match(query)
+        if not match:
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT {FTS_TABLE}.rowid, bm25({FTS_TABLE}, 10.0, 1.0) AS rank, '
+                f'snippet({FTS_TABLE}, 1, %s, %s, %s, 24) '
+                f'FROM {FTS_TABLE} JOIN app_articles ON app_articles.id = {FTS_TABLE}.rowid '
+                f'WHERE {FTS_TABLE} MATCH %s AND app_articles.status = %s '
+                f'ORDER BY rank, {FTS_TABLE}.rowid DESC LIMIT %s OFFSET %s',
+                [MARK_START, MARK_STOP, '…', match, 'published', limit, offset],
+            )
+            rows = cursor.fetchall()
+        articles = Article.objects.all().in_bulk([row[0] for row in rows])
+        results = []
+        for pk, rank, snippet in rows:
+            article = articles.get(pk)
+            if article is not None:
+                # bm25 в FTS5 тем меньше, чем выше релевантность
+                article.rank = -rank
+                article.snippet = highlight(snippet)
+                results.append(article)
+        return results
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+def get_search_backend():
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    if connection.vendor == 'sqlite':
+        return SqliteSearchBackend()
+    return SearchBackend()
+
+
+class SearchPage:
+    """
+    Страница результатов поиска, совместимая с шаблоном main_app/paginator.html. Общее количество страниц неизвестно,
+    поэтому в page_range входят страницы до текущей и следующая, если она есть.
+    """
+
+    def __init__(self, object_list, number, has_next):
+        self.object_list = object_list
+        self.number = number
+        self._has_next = has_next
+
+    @property
+    def paginator(self):
+        return self
+
+    @property
+    def page_range(self):
+        return range(1, self.number + (2 if self._has_next else 1))
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def search_articles(query, page_number, per_page):
+    """
+    Страница результатов поиска по запросу query
+    """
+    try:
+        number = int(page_number or 1)
+    except (TypeError, ValueError):
+        raise Http404('Неверный номер страницы')
+    if number < 1:
+        raise Http404('Неверный номер страницы')
+    query = (query or '').strip()
+    if not query:
+        return SearchPage([], number, False)
+    articles = get_search_backend().search(query, (number - 1) * per_page, per_page + 1)
+    return SearchPage(articles[:per_page], number, len(articles) > per_page)
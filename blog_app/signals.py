@@ -0,0 +1,304 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.signals import request_started
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import post_save, post_delete, m2m_changed, pre_delete, pre_save
+from django.dispatch import receiver
+from django.urls import reverse
+from mptt.signals import node_moved
+from taggit.models import Tag
+
+from customeuser_app.models import Profile
+from reqsoft.cache import bump_namespace
+from .categorystats import counted_category_id, move_counted_record, rebuild_category_counts
+from .models import Article, Category, Comment, Documents
+from .fragments import bump_version
+from .navigation import invalidate_category_tree
+from .search import get_search_backend
+from .similarity import schedule_similarity_update
+from .suggest import suggest_index
+from .tagstats import change_tag_usage, invalidate_popular_tags
+
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, **kwargs):
+    """
+    Увеличение счётчика комментариев статьи одним UPDATE без чтения статьи
+    """
+    if created:
+        Article.objects.filter(pk=instance.article_id).update(comment_count=F('comment_count') + 1)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, **kwargs):
+    """
+    Уменьшение счётчика комментариев статьи, в том числе для дочерних комментариев, удаляемых каскадом
+    """
+    Article.objects.filter(pk=instance.article_id).update(comment_count=Greatest(F('comment_count') - 1, 0))
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(node_moved, sender=Category)
+def reset_category_tree(sender, **kwargs):
+    """
+    Сброс кэша меню категорий при добавлении, изменении, удалении и перемещении категории в дереве
+    """
+    invalidate_category_tree()
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def update_tag_usage(sender, instance, action, pk_set, **kwargs):
+    """
+    Учёт добавления и удаления тегов статьи в TagUsage. При clear() taggit не передаёт pk_set, поэтому теги статьи
+    запоминаются на pre_clear
+    """
+    if not isinstance(instance, Article):
+        return
+    if action == 'post_add':
+        change_tag_usage(pk_set, 1)
+    elif action == 'post_remove':
+        change_tag_usage(pk_set, -1)
+    elif action == 'pre_clear':
+        instance._cleared_tag_ids = list(instance.tags.values_list('pk', flat=True))
+    elif action == 'post_clear':
+        change_tag_usage(getattr(instance, '_cleared_tag_ids', ()), -1)
+
+
+@receiver(pre_delete, sender=Article)
+def remember_article_tags(sender, instance, **kwargs):
+    instance._deleted_tag_ids = list(instance.tags.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Article)
+def release_article_tags(sender, instance, **kwargs):
+    """
+    Уменьшение количества статей у тегов удалённой статьи (taggit не удаляет связи каскадом и не шлёт m2m_changed)
+    """
+    change_tag_usage(getattr(instance, '_deleted_tag_ids', ()), -1)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def reset_popular_tags(sender, **kwargs):
+    """
+    Сброс кэша популярных тегов при переименовании и удалении тега: в кэше хранятся его имя и slug
+    """
+    invalidate_popular_tags()
+
+
+@receiver(post_save, sender=Article)
+def update_similar_articles_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Пересчёт индекса похожих статей при изменении статьи (категории, статуса) и её тегов - один раз после фиксации
+    транзакции, в которой сохраняются статья и её теги
+    """
+    if raw or not getattr(settings, 'SIMILAR_ARTICLES_AUTO_UPDATE', True):
+        return
+    schedule_similarity_update(instance.pk)
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def update_similar_articles_on_tags(sender, instance, action, **kwargs):
+    if not isinstance(instance, Article) or action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if getattr(settings, 'SIMILAR_ARTICLES_AUTO_UPDATE', True):
+        schedule_similarity_update(instance.pk)
+
+
+@receiver(post_save, sender=Article)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    """
+    Обновление поискового индекса статьи (для SQLite индекс обновляют триггеры базы)
+    """
+    if not raw:
+        get_search_backend().index_article(instance)
+
+
+@receiver(request_started)
+def warm_suggest_index(sender, **kwargs):
+    """
+    Загрузка индекса подсказок в фоне при первом запросе к процессу: во время ready() база может быть ещё
+    не создана (migrate), а первый запрос подсказок не должен ждать загрузки
+    """
+    request_started.disconnect(warm_suggest_index)
+    if getattr(settings, 'SUGGEST_INDEX_WARMUP', True):
+        suggest_index.warm_async()
+
+
+@receiver(post_save, sender=Article)
+def update_article_suggestion(sender, instance, raw=False, **kwargs):
+    """
+    Подсказки поиска содержат только опубликованные статьи
+    """
+    if raw:
+        return
+    if instance.status == 'published':
+        suggest_index.add('article', instance.pk, instance.title, instance.get_absolute_url())
+    else:
+        suggest_index.remove('article', instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+def update_tag_suggestion(sender, instance, raw=False, **kwargs):
+    if not raw:
+        suggest_index.add('tag', instance.pk, instance.name,
+                          reverse('blog_app:articles_by_tags', kwargs={'tag': instance.slug}))
+
+
+@receiver(post_save, sender=Category)
+def update_category_suggestion(sender, instance, raw=False, **kwargs):
+    if not raw:
+        suggest_index.add('category', instance.pk, instance.title, instance.get_absolute_url())
+
+
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Category)
+def remove_suggestion(sender, instance, **kwargs):
+    suggest_index.remove(sender._meta.model_name, instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def reset_comment_fragments(sender, instance, **kwargs):
+    """
+    Сброс закэшированных веток комментариев статьи (текст статьи и теги сбрасываются сменой time_update)
+    """
+    bump_version('comments', instance.article_id)
+
+
+def reset_author_comments(user_id):
+    """
+    Сброс веток комментариев всех статей, где писал пользователь user_id: в них выводятся его имя, аватар и ссылка
+    на профиль
+    """
+    article_ids = (Comment.objects.filter(author_id=user_id).order_by().values_list('article_id', flat=True)
+                   .distinct())
+    for article_id in article_ids:
+        bump_version('comments', article_id)
+    bump_namespace('comments')
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def reset_profile_comments(sender, instance, created=False, **kwargs):
+    if not created:
+        reset_author_comments(instance.user_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def reset_user_comments(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Имя пользователя выводится в его комментариях; сохранение при входе (только last_login) их не меняет
+    """
+    if not created and (update_fields is None or not set(update_fields) <= {'last_login'}):
+        reset_author_comments(instance.pk)
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def reset_tag_fragments(sender, instance, action, **kwargs):
+    if isinstance(instance, Article) and action in ('post_add', 'post_remove', 'post_clear'):
+        bump_version('tags', instance.pk)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(node_moved, sender=Category)
+def reset_navigation_fragments(sender, **kwargs):
+    """
+    Переименование тега или категории меняет ссылки во фрагментах всех статей
+    """
+    bump_version('navigation')
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_delete, sender=Article)
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def reset_article_pages(sender, **kwargs):
+    """
+    Сброс закэшированных списков статей и подсказок (VIEW_CACHE_POLICIES); комментарии меняют их счётчики в списках
+    """
+    bump_namespace('articles')
+    if sender is Comment:
+        bump_namespace('comments')
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def reset_article_pages_on_tags(sender, instance, action, **kwargs):
+    if isinstance(instance, Article) and action in ('post_add', 'post_remove', 'post_clear'):
+        bump_namespace('articles')
+
+
+@receiver(post_save, sender=Documents)
+@receiver(post_delete, sender=Documents)
+def reset_file_pages(sender, **kwargs):
+    bump_namespace('files')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(node_moved, sender=Category)
+def reset_category_pages(sender, **kwargs):
+    """
+    Категории входят в меню и заголовки всех списков статей и файлов
+    """
+    bump_namespace('articles')
+    bump_namespace('files')
+
+
+COUNTED_KINDS = {Article: 'article', Documents: 'file'}
+
+
+@receiver(pre_save, sender=Article)
+@receiver(pre_save, sender=Documents)
+def remember_counted_category(sender, instance, raw=False, **kwargs):
+    """
+    Категория, в которой запись учтена до сохранения. Обычно она запомнена при загрузке объекта (from_db), запрос
+    нужен только для объектов, созданных в коде с существующим pk или загруженных без полей status/category.
+    """
+    if raw or hasattr(instance, '_counted_category_id'):
+        return
+    if instance._state.adding:
+        instance._counted_category_id = None
+        return
+    saved = sender._base_manager.filter(pk=instance.pk).first()
+    instance._counted_category_id = counted_category_id(saved) if saved is not None else None
+
+
+@receiver(post_save, sender=Article)
+@receiver(post_save, sender=Documents)
+def update_category_counts_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Учёт создания, публикации, снятия с публикации и переноса записи в счётчиках категорий
+    """
+    if raw:
+        return
+    category_id = counted_category_id(instance)
+    if category_id != instance._counted_category_id:
+        move_counted_record(instance._counted_category_id, category_id, COUNTED_KINDS[sender])
+        invalidate_category_tree()
+    instance._counted_category_id = category_id
+
+
+@receiver(post_delete, sender=Article)
+@receiver(post_delete, sender=Documents)
+def update_category_counts_on_delete(sender, instance, **kwargs):
+    category_id = getattr(instance, '_counted_category_id', counted_category_id(instance))
+    if category_id is not None:
+        move_counted_record(category_id, None, COUNTED_KINDS[sender])
+        invalidate_category_tree()
+
+
+@receiver(node_moved, sender=Category)
+def rebuild_counts_on_move(sender, **kwargs):
+    """
+    Перенос категории меняет итоги с подкатегориями у старых и новых предков: пересчитывается всё дерево
+    """
+    rebuild_category_counts()
@@ -0,0 +1,246 @@
+"""
+Индекс похожих статей.
+
+Похожесть двух опубликованных статей - взвешенная сумма коэффициента Жаккара по множествам тегов и близости их
+категорий в дереве MPTT (1 для одной категории, 1 / (1 + длина пути через общего предка) для категорий одного дерева,
+0 для разных деревьев). Для каждой статьи в SimilarArticle хранятся SIMILAR_ARTICLES_INDEX_SIZE лучших статей.
+
+Кандидатами считаются статьи с общими тегами и статьи той же категории. Теги и категории, у которых больше
+SIMILAR_ARTICLES_MAX_TAG_ARTICLES статей, кандидатов не порождают (иначе построение индекса становится квадратичным),
+но по-прежнему учитываются в коэффициенте Жаккара.
+
+Индекс полностью строится командой build_similar_articles и поддерживается обработчиками сигналов при изменении
+статьи и её тегов: пересчёт статьи выполняется после фиксации транзакции и один раз на транзакцию, даже если в ней
+статья сохранялась несколько раз и менялись её теги (schedule_similarity_update). Перемещение категорий в дереве индекс не обновляет - для этого нужна полная перестройка.
+"""
+import heapq
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Power, Random
+from taggit.models import TaggedItem
+
+from .navigation import get_category_nodes
+
+TAG_WEIGHT = 0.8
+CATEGORY_WEIGHT = 0.2
+
+
+def get_index_size():
+    return getattr(settings, 'SIMILAR_ARTICLES_INDEX_SIZE', 20)
+
+
+def get_max_tag_articles():
+    return getattr(settings, 'SIMILAR_ARTICLES_MAX_TAG_ARTICLES', 1000)
+
+
+class CategoryTree:
+    """
+    Расстояния между категориями по закэшированному дереву категорий, без запросов к базе
+    """
+
+    def __init__(self, nodes):
+        self.parents = {node.pk: node.parent_id for node in nodes}
+        self._paths = {}
+
+    def path(self, category_id):
+        """
+        Путь от категории до корня её дерева
+        """
+        if category_id not in self._paths:
+            path = []
+            node = category_id
+            while node is not None and node not in path:
+                path.append(node)
+                node = self.parents.get(node)
+            self._paths[category_id] = path
+        return self._paths[category_id]
+
+    def proximity(self, first, second):
+        if first == second:
+            return 1.0
+        depth = {node: index for index, node in enumerate(self.path(first))}
+        for index, node in enumerate(self.path(second)):
+            if node in depth:
+                return 1.0 / (1 + depth[node] + index)
+        return 0.0
+
+
+def similarity(tags, other_tags, proximity):
+    union = len(tags | other_tags)
+    jaccard = len(tags & other_tags) / union if union else 0.0
+    return TAG_WEIGHT * jaccard + CATEGORY_WEIGHT * proximity
+
+
+def get_article_tags(article_ids=None):
+    """
+    Множества идентификаторов тегов статей: {article_id: {tag_id, ...}}
+    """
+    from .models import Article
+
+    items = TaggedItem.objects.filter(content_type=ContentType.objects.get_for_model(Article))
+    if article_ids is not None:
+        items = items.filter(object_id__in=article_ids)
+    tags = defaultdict(set)
+    for object_id, tag_id in items.values_list('object_id', 'tag_id').iterator():
+        tags[object_id].add(tag_id)
+    return tags
+
+
+def rank_candidates(article_id, category_id, candidates, tags, tree):
+    """
+    Оценки похожести кандидатов candidates ({article_id: category_id}) на статью: список (score, article_id)
+    """
+    own_tags = tags.get(article_id, set())
+    scored = []
+    for candidate_id, candidate_category_id in candidates.items():
+        if candidate_id == article_id:
+            continue
+        score = similarity(own_tags, tags.get(candidate_id, set()),
+                           tree.proximity(category_id, candidate_category_id))
+        if score > 0:
+            scored.append((score, candidate_id))
+    return scored
+
+
+def rebuild_similarities(batch_size=1000):
+    """
+    Полная перестройка индекса похожих статей. Возвращает количество записанных пар.
+    """
+    from .models import Article, SimilarArticle
+
+    articles = dict(Article.objects.filter(status='published').values_list('pk', 'category_id'))
+    tags = get_article_tags()
+    tree = CategoryTree(get_category_nodes())
+    limit, size = get_max_tag_articles(), get_index_size()
+
+    by_tag = defaultdict(list)
+    by_category = defaultdict(list)
+    for article_id, category_id in articles.items():
+        by_category[category_id].append(article_id)
+        for tag_id in tags.get(article_id, ()):
+            by_tag[tag_id].append(article_id)
+
+    total = 0
+    batch = []
+    with transaction.atomic():
+        SimilarArticle.objects.all().delete()
+        for article_id, category_id in articles.items():
+            groups = [by_tag[tag_id] for tag_id in tags.get(article_id, ())] + [by_category[category_id]]
+            candidates = {candidate_id: articles[candidate_id]
+                          for group in groups if len(group) <= limit for candidate_id in group}
+            for score, similar_id in heapq.nlargest(size, rank_candidates(article_id, category_id, candidates,
+                                                                          tags, tree)):
+                batch.append(SimilarArticle(article_id=article_id, similar_id=similar_id, score=score))
+            if len(batch) >= batch_size:
+                total += len(SimilarArticle.objects.bulk_create(batch))
+                batch = []
+        total += len(SimilarArticle.objects.bulk_create(batch))
+    return total
+
+
+def update_article_similarities(article_id):
+    """
+    Пересчёт индекса для одной статьи: её собственный список похожих и её место в списках соседей. Списки соседей
+    после этого обрезаются до SIMILAR_ARTICLES_INDEX_SIZE, но вытесненные ранее записи не восстанавливаются -
+    точный индекс даёт только полная перестройка.
+    """
+    from .models import Article, SimilarArticle, TagUsage
+
+    limit, size = get_max_tag_articles(), get_index_size()
+    with transaction.atomic():
+        SimilarArticle.objects.filter(Q(article_id=article_id) | Q(similar_id=article_id)).delete()
+        category_id = (Article.objects.filter(pk=article_id, status='published')
+                       .values_list('category_id', flat=True).first())
+        if category_id is None:
+            return
+
+        own_tags = get_article_tags([article_id]).get(article_id, set())
+        frequent = set(TagUsage.objects.filter(tag_id__in=own_tags, num_times__gt=limit)
+                       .values_list('tag_id', flat=True))
+        candidate_ids = set(TaggedItem.objects.filter(content_type=ContentType.objects.get_for_model(Article),
+                                                      tag_id__in=own_tags - frequent)
+                            .values_list('object_id', flat=True))
+        candidate_ids.update(Article.objects.filter(category_id=category_id, status='published')
+                             .values_list('pk', flat=True)[:limit])
+        candidates = dict(Article.objects.filter(pk__in=candidate_ids, status='published')
+                          .exclude(pk=article_id).values_list('pk', 'category_id'))
+
+        tags = get_article_tags(list(candidates))
+        tags[article_id] = own_tags
+        scored = rank_candidates(article_id, category_id, candidates, tags, CategoryTree(get_category_nodes()))
+        SimilarArticle.objects.bulk_create(
+            [SimilarArticle(article_id=article_id, similar_id=similar_id, score=score)
+             for score, similar_id in heapq.nlargest(size, scored)]
+            + [SimilarArticle(article_id=similar_id, similar_id=article_id, score=score) for score, similar_id in scored]
+        )
+
+        # обрезка списков соседей, в которые статья могла добавиться сверх размера индекса
+        neighbours = defaultdict(list)
+        for pk, neighbour_id, score in (SimilarArticle.objects.filter(article_id__in=[pk for _, pk in scored])
+                                        .values_list('pk', 'article_id', 'score')):
+            neighbours[neighbour_id].append((score, pk))
+        overflow = [pk for links in neighbours.values() for _, pk in sorted(links, reverse=True)[size:]]
+        if overflow:
+            SimilarArticle.objects.filter(pk__in=overflow).delete()
+
+
+class SimilarityUpdate:
+    """
+    Отложенный пересчёт индекса для статей, изменённых в текущей транзакции: одна очередь на соединение с базой
+    (поток и псевдоним базы), при вызове пересчитывается каждая статья очереди один раз
+    """
+
+    def __init__(self):
+        self.article_ids = set()
+
+    def __call__(self):
+        article_ids, self.article_ids = self.article_ids, set()
+        for article_id in sorted(article_ids):
+            update_article_similarities(article_id)
+
+
+_pending = threading.local()
+
+
+def get_pending_update(using=None):
+    updates = _pending.__dict__.setdefault('updates', {})
+    alias = using or DEFAULT_DB_ALIAS
+    if alias not in updates:
+        updates[alias] = SimilarityUpdate()
+    return updates[alias]
+
+
+def schedule_similarity_update(article_id, using=None):
+    """
+    Пересчёт индекса для статьи после фиксации текущей транзакции, один раз на транзакцию. Вне транзакции пересчёт
+    выполняется сразу. Очередь регистрируется в on_commit при каждом вызове, так как об откате транзакции (и вместе
+    с ним об отмене регистрации) Django не сообщает: первый вызов после фиксации пересчитывает все статьи очереди,
+    остальные ничего не делают. Статьи из отменённой транзакции пересчитываются вместе со следующей, что безопасно.
+    """
+    update = get_pending_update(using)
+    update.article_ids.add(article_id)
+    transaction.on_commit(update, using=using)
+
+
+def get_similar_articles(article, count=6, weighted_random=None):
+    """
+    Похожие статьи из индекса одним запросом. При weighted_random (по умолчанию SIMILAR_ARTICLES_RANDOM) статьи
+    выбираются случайно с вероятностью, пропорциональной оценке: ключ сортировки random() ^ (1 / score) вычисляется
+    в базе (метод Efraimidis-Spirakis), иначе возвращаются count лучших.
+    """
+    from .models import SimilarArticle
+
+    if weighted_random is None:
+        weighted_random = getattr(settings, 'SIMILAR_ARTICLES_RANDOM', True)
+    links = (SimilarArticle.objects.filter(article=article, similar__status='published')
+             .select_related('similar'))
+    if weighted_random:
+        links = links.annotate(sample_key=Power(Random(), Value(1.0) / F('score'))).order_by('-sample_key')
+    else:
+        links = links.order_by('-score')
+    return [link.similar for link in links[:count]]
@@ -0,0 +1,222 @@
+"""
+Подсказки поиска по мере ввода.
+
+Заголовки опубликованных статей, имена тегов и названия категорий хранятся в памяти процесса в отсортированном
+списке ключей: ключ - нормализованный текст, начиная с каждого слова, поэтому "урок" находит и "Django урок 1".
+Поиск по префиксу - двоичный поиск по списку, без запросов к базе. При fuzzy дополнительно ищутся похожие записи
+по триграммам, что прощает опечатки.
+
+Индекс загружается при первом запросе процесса (в фоне) или при первом обращении к подсказкам, изменения моделей
+вносятся обработчиками сигналов (blog_app.signals). Другие процессы узнают об изменениях при полной перезагрузке
+индекса раз в SUGGEST_INDEX_TTL секунд. Перезагрузка идёт в фоновом потоке, а подсказки до её окончания берутся из
+прежнего индекса; ждут загрузки только запросы, пришедшие до первой загрузки. Изменения, внесённые во время загрузки,
+запоминаются и повторно применяются к новому индексу при замене, чтобы он не потерял их, если прочитал базу раньше.
+"""
+import bisect
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.urls import reverse
+
+logger = logging.getLogger(__name__)
+
+def normalize(text):
+    return ' '.join(str(text).lower().replace('ё', 'е').split())
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+class SuggestIndex:
+    """
+    Потокобезопасный префиксный индекс подсказок
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys = []
+        self._items = {}
+        self._trigrams = defaultdict(set)
+        self._loaded_at = None
+        self._reloading = False
+        # изменения (вид, pk, (подпись, адрес) или None при удалении), пришедшие во время загрузки
+        self._changes = None
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'SUGGEST_INDEX_TTL', 600)
+
+    def load(self):
+        """
+        Полная загрузка индекса из базы с заменой прежнего
+        """
+        with self._lock:
+            self._changes = []
+        try:
+            items = self.read_items()
+            keys = []
+            grams = defaultdict(set)
+            for item_id, (label, url) in items.items():
+                keys.extend((key,) + item_id for key in self._item_keys(label))
+                for gram in trigrams(normalize(label)):
+                    grams[gram].add(item_id)
+            keys.sort()
+            with self._lock:
+                self._keys, self._items, self._trigrams = keys, items, grams
+                for kind, pk, item in self._changes:
+                    self._discard(kind, pk)
+                    if item is not None:
+                        self._insert(kind, pk, *item)
+                self._loaded_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._changes = None
+
+    def read_items(self):
+        """
+        Записи индекса из базы {(вид, pk): (подпись, адрес)}: три запроса, по одному на вид записей
+        """
+        from taggit.models import Tag
+
+        from .models import Article, Category
+
+        items = {}
+        articles = Article.objects.filter(status='published').values_list('pk', 'slug', 'title')
+        for pk, slug, title in articles.iterator():
+            items['article', pk] = (title, reverse('blog_app:article_detail', kwargs={'slug': slug}))
+        for pk, slug, name in Tag.objects.values_list('pk', 'slug', 'name').iterator():
+            items['tag', pk] = (name, reverse('blog_app:articles_by_tags', kwargs={'tag': slug}))
+        for pk, slug, title in Category.objects.values_list('pk', 'slug', 'title').iterator():
+            items['category', pk] = (title, reverse('blog_app:articles_by_category', kwargs={'slug': slug}))
+        return items
+
+    def ensure_loaded(self):
+        """
+        Загрузка ещё не загруженного индекса (запрос ждёт её окончания) и фоновая перезагрузка устаревшего
+        """
+        with self._lock:
+            if self._loaded_at is None:
+                self.load()
+                return
+            expired = time.monotonic() - self._loaded_at > self.ttl
+        if expired:
+            self.warm_async()
+
+    def warm_async(self):
+        """
+        Загрузка или перезагрузка индекса в фоновом потоке, чтобы запрос подсказок не ждал базу. Одновременно
+        выполняется не больше одной фоновой загрузки.
+        """
+        with self._lock:
+            if self._reloading:
+                return
+            self._reloading = True
+
+        def warm():
+            from django.db import connections
+
+            try:
+                # первую загрузку запросы ждут, а не выполняют её повторно; перезагрузка блокирует их только
+                # на время замены списков
+                with self._lock if self._loaded_at is None else nullcontext():
+                    self.load()
+            except Exception:
+                logger.exception('Не удалось загрузить индекс подсказок')
+            finally:
+                with self._lock:
+                    self._reloading = False
+                connections.close_all()
+
+        threading.Thread(target=warm, name='suggest-index-warmup', daemon=True).start()
+
+    def refresh(self):
+        """
+        Перезагрузка уже загруженного индекса после изменений в обход сигналов (массовый импорт)
+        """
+        if self._loaded_at is not None:
+            self.load()
+
+    def add(self, kind, pk, label, url):
+        with self._lock:
+            if self._changes is not None:
+                self._changes.append((kind, pk, (label, url)))
+            if self._loaded_at is not None:
+                self._discard(kind, pk)
+                self._insert(kind, pk, label, url)
+
+    def remove(self, kind, pk):
+        with self._lock:
+            if self._changes is not None:
+                self._changes.append((kind, pk, None))
+            if self._loaded_at is not None:
+                self._discard(kind, pk)
+
+    def suggest(self, prefix, limit=10, fuzzy=False):
+        """
+        До limit подсказок для префикса: список словарей type, label, url
+        """
+        self.ensure_loaded()
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        found = []
+        seen = set()
+        with self._lock:
+            position = bisect.bisect_left(self._keys, (prefix,))
+            while position < len(self._keys) and len(found) < limit:
+                key, kind, pk = self._keys[position]
+                if not key.startswith(prefix):
+                    break
+                if (kind, pk) not in seen:
+                    seen.add((kind, pk))
+                    found.append((kind, pk))
+                position += 1
+            if fuzzy and len(found) < limit:
+                found.extend(self._fuzzy(prefix, limit - len(found), seen))
+            return [{'type': kind, 'label': self._items[kind, pk][0], 'url': self._items[kind, pk][1]}
+                    for kind, pk in found]
+
+    def _fuzzy(self, prefix, limit, exclude):
+        query = trigrams(prefix)
+        scores = defaultdict(int)
+        for gram in query:
+            for item_id in self._trigrams.get(gram, ()):
+                scores[item_id] += 1
+        threshold = getattr(settings, 'SUGGEST_FUZZY_THRESHOLD', 0.4) * len(query)
+        ranked = sorted((-score, item_id) for item_id, score in scores.items()
+                        if score >= threshold and item_id not in exclude)
+        return [item_id for _, item_id in ranked[:limit]]
+
+    def _item_keys(self, label):
+        words = normalize(label).split(' ')
+        return {' '.join(words[index:]) for index in range(len(words)) if words[index]}
+
+    def _insert(self, kind, pk, label, url):
+        item_id = (kind, pk)
+        self._items[item_id] = (label, url)
+        for key in self._item_keys(label):
+            bisect.insort(self._keys, (key,) + item_id)
+        for gram in trigrams(normalize(label)):
+            self._trigrams[gram].add(item_id)
+
+    def _discard(self, kind, pk):
+        item_id = (kind, pk)
+        label, url = self._items.pop(item_id, (None, None))
+        if label is None:
+            return
+        for key in self._item_keys(label):
+            entry = (key,) + item_id
+            position = bisect.bisect_left(self._keys, entry)
+            if position < len(self._keys) and self._keys[position] == entry:
+                del self._keys[position]
+        for gram in trigrams(normalize(label)):
+            self._trigrams[gram].discard(item_id)
+
+
+suggest_index = SuggestIndex()
@@ -0,0 +1,52 @@
+"""
+Популярность тегов статей.
+
+Количество статей с тегом хранится в TagUsage и меняется при добавлении/удалении тегов у статей, а список популярных
+тегов для боковой панели кэшируется на POPULAR_TAGS_CACHE_TIMEOUT секунд. Все закэшированные списки (с разным
+ограничением count) лежат в пространстве ключей popular_tags и сбрасываются разом увеличением его версии
+(reqsoft.cache).
+"""
+from django.conf import settings
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from reqsoft.cache import bump_namespace, get_cache, namespace_key
+
+POPULAR_TAGS_NAMESPACE = 'blog_app:popular_tags'
+
+
+def get_popular_tags(count):
+    """
+    Список из count самых популярных тегов в виде словарей name, num_times, slug
+    """
+    from blog_app.models import TagUsage
+
+    cache = get_cache()
+    key = namespace_key(POPULAR_TAGS_NAMESPACE, count, cache)
+    tag_list = cache.get(key)
+    if tag_list is None:
+        tag_list = list(
+            TagUsage.objects.filter(num_times__gt=0)
+            .order_by('-num_times', 'tag__name')
+            .values('num_times', name=F('tag__name'), slug=F('tag__slug'))[:count]
+        )
+        cache.set(key, tag_list, getattr(settings, 'POPULAR_TAGS_CACHE_TIMEOUT', 300))
+    return tag_list
+
+
+def invalidate_popular_tags():
+    bump_namespace(POPULAR_TAGS_NAMESPACE, 'default')
+
+
+def change_tag_usage(tag_ids, delta):
+    """
+    Изменение количества статей у тегов tag_ids на delta (+1 при добавлении тега статье, -1 при удалении)
+    """
+    from blog_app.models import TagUsage
+
+    tag_ids = list(tag_ids)
+    if not tag_ids:
+        return
+    TagUsage.objects.bulk_create([TagUsage(tag_id=tag_id) for tag_id in tag_ids], ignore_conflicts=True)
+    TagUsage.objects.filter(tag_id__in=tag_ids).update(num_times=Greatest(F('num_times') + delta, 0))
+    invalidate_popular_tags()
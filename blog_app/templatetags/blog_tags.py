@@ -1,35 +1,80 @@
-from datetime import timedelta, datetime, date, time
+from datetime import timedelta
 
 from django import template
-from django.db.models import Count, Q
+from django.db.models import Q, Sum
 from django.utils import timezone
-from taggit.models import Tag
+from django.utils.safestring import mark_safe
 
-from blog_app.models import Comment, Article
+from blog_app.fragments import ARTICLE_FRAGMENTS, get_fragment
+from blog_app.models import Comment, Article, ArticleViewDaily
+from blog_app.navigation import render_category_menu
+from blog_app.tagstats import get_popular_tags
+from reqsoft.querybudget import query_budget
 
 register = template.Library()
 
 @register.simple_tag
-def popular_tags():
+@query_budget('blog_tags.category_menu')
+def category_menu(kind='articles'):
     """
-    Данный код создает пользовательский тег для шаблонов Django с именем popular_tags, который получает список
-    популярных тегов, отсортированных по количеству статей, содержащих эти теги. Для этого используется модуль
-    django.db.models для выполнения запросов к базе данных Django и модель Tag из стороннего пакета django-taggit для
-    работы с тегами.
+    Пункты меню категорий из кэша (см. blog_app.navigation). kind - 'articles' для ссылок на статьи категории,
+    'files' для ссылок на файлы категории. Возвращает элементы <li>, внешний <ul> остаётся в шаблоне.
+    """
+    return mark_safe(render_category_menu(kind))
+
+
+class ArticleFragmentNode(template.Node):
+
+    def __init__(self, nodelist, name, article):
+        self.nodelist = nodelist
+        self.name = name
+        self.article = article
+
+    def render(self, context):
+        article = self.article.resolve(context)
+        return get_fragment(self.name, article, lambda: self.nodelist.render(context))
+
+
+@register.tag
+def article_fragment(parser, token):
+    """
+    Кэширование части страницы статьи (см. blog_app.fragments):
+
+        {% article_fragment 'body' object %} ... {% endarticle_fragment %}
+
+    Первый аргумент - имя фрагмента из ARTICLE_FRAGMENTS, от него зависит, при каких изменениях фрагмент
+    перестраивается. Внутри фрагмента не должно быть ничего, что зависит от пользователя или запроса.
+    """
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(f'{bits[0]} принимает имя фрагмента и статью')
+    name = bits[1].strip('\'"')
+    if name not in ARTICLE_FRAGMENTS:
+        raise template.TemplateSyntaxError(f'Неизвестный фрагмент статьи: {name}')
+    nodelist = parser.parse((f'end{bits[0]}',))
+    parser.delete_first_token()
+    return ArticleFragmentNode(nodelist, name, parser.compile_filter(bits[2]))
 
-    После выполнения запроса, полученный список тегов сохраняется в переменной tag_list. Каждый элемент списка
-    представлен в виде словаря, содержащего три ключа - name (имя тега), num_times (количество статей с этим тегом) и
-    slug (уникальный идентификатор тега).
 
-    Этот список затем возвращается из функции popular_tags в виде контекста, который можно использовать в шаблоне для
-    вывода списка популярных тегов.
+@register.simple_tag
+@query_budget('blog_tags.popular_tags')
+def popular_tags(count=20):
     """
-    tags = Tag.objects.annotate(num_times=Count('article')).order_by('-num_times')
-    tag_list = list(tags.values('name', 'num_times', 'slug'))
-    return tag_list
+    Данный код создает пользовательский тег для шаблонов Django с именем popular_tags, который получает список из count
+    самых популярных тегов, отсортированных по количеству статей, содержащих эти теги.
+
+    Количество статей берётся из материализованных счётчиков TagUsage (поле num_times с индексом), а готовый список
+    кэшируется, поэтому стоимость тега зависит от числа выводимых тегов, а не от общего количества привязок тегов к
+    статьям. Подробнее - в модуле blog_app.tagstats.
+
+    Каждый элемент списка представлен в виде словаря, содержащего три ключа - name (имя тега), num_times (количество
+    статей с этим тегом) и slug (уникальный идентификатор тега).
+    """
+    return get_popular_tags(count)
 
 
 @register.inclusion_tag('blog_app/latest_comments.html')
+@query_budget('blog_tags.show_latest_comments')
 def show_latest_comments(count=5):
     """
     Этот код реализует inclusion tag под названием show_latest_comments, который позволяет вывести последние
@@ -44,48 +89,50 @@ def show_latest_comments(count=5):
     Комментарии сортируются по дате создания в обратном порядке с помощью order_by('-time_create').
 
     Наконец, тег возвращает словарь comments, который содержит последние комментарии для использования в шаблоне
-    latest_comments.html.
+    latest_comments.html. Список читается в теге, а не при выводе шаблона, чтобы запрос вошёл в бюджет тега
+    (reqsoft.querybudget).
     """
-    comments = Comment.objects.select_related('author').filter(status='published').order_by('-time_create')[:count]
+    comments = list(
+        Comment.objects.select_related('author').filter(status='published').order_by('-time_create')[:count]
+    )
     return {'comments': comments}
 
 @register.simple_tag()
 def get_count_comments(article):
-    return article.comments.count()
+    """
+    Количество комментариев статьи из денормализованного счётчика Article.comment_count, без запроса к базе
+    """
+    return article.comment_count
 
 @register.simple_tag
+@query_budget('blog_tags.popular_articles')
 def popular_articles():
     """
     Данный код является Django-шаблон тегом. Он выводит список 10 самых популярных статей за последние 7 дней,
-    отсортированных по количеству просмотров за сегодняшний день и за все время.
-
-    Объяснение кода:
-
-    Строки 1-5: импорт необходимых модулей и модели Article.
-    Строка 7: регистрация шаблонного тега в Django.
-    Строки 9-10: получение текущей даты и вычисление даты начала дня 7 дней назад.
-    Строка 12: вычисление даты начала текущего дня.
-    Строка 14: получение всех статей и количества их просмотров за последние 7 дней. Аннотации total_view_count и
-    today_view_count вычисляют общее количество просмотров за 7 дней и количество просмотров за сегодняшний день,
-    соответственно.
-    Строка 15: запрос к связанным объектам - для улучшения производительности используется метод prefetch_related().
-    Строки 17-20: сортировка статей по количеству просмотров, сначала по просмотрам за все время (total_view_count),
-    затем по просмотрам за сегодня (today_view_count). Отбираются первые 10 статей.
-    Строка 22: возвращение списка популярных статей.
-    :return:
+    отсортированных по количеству просмотров за 7 дней и за сегодняшний день.
+
+    Просмотры берутся из дневных агрегатов ArticleViewDaily, поэтому стоимость запроса зависит от числа статей и дней
+    (не более 8 строк на статью), а не от количества сырых просмотров в ViewCount. Первый запрос выбирает
+    идентификаторы 10 популярных статей, второй - сами статьи.
     """
 
-    # получаем текущую дату и время в формате datetime
-    now = timezone.now()
-    # вычисляем дату начала дня (00:00) 7 дней назад
-    start_date = now - timedelta(days=7)
-    # вычисляем дату начала текущего дня (00:00)
-    today_start = timezone.make_aware(datetime.combine(date.today(), time.min))
-    # получаем все статьи и количество их просмотров за последние 7 дней
-    articles = Article.objects.annotate(
-        total_view_count=Count('views', filter=Q(views__viewed_on__gte=start_date)),
-        today_view_count=Count('views', filter=Q(views__viewed_on__gte=today_start))
-    ).prefetch_related('views')
-    # сортируем статьи по количеству просмотров в порядке убывания, сначала по просмотрам за сегодня, затем за все время
-    popular_articles = articles.order_by('-total_view_count', '-today_view_count')[:10]
+    # вычисляем дату начала периода 7 дней назад и текущую дату
+    today = timezone.localdate()
+    start_date = today - timedelta(days=7)
+    # суммируем дневные просмотры за 7 дней и за сегодняшний день по каждой статье
+    ranking = list(
+        ArticleViewDaily.objects.filter(day__gte=start_date)
+        .values('article_id')
+        .annotate(total_view_count=Sum('views'), today_view_count=Sum('views', filter=Q(day=today)))
+        .order_by('-total_view_count', '-today_view_count')[:10]
+    )
+    articles = Article.objects.select_related('author', 'category').in_bulk([row['article_id'] for row in ranking])
+    popular_articles = []
+    for row in ranking:
+        article = articles.get(row['article_id'])
+        if article is None:
+            continue
+        article.total_view_count = row['total_view_count']
+        article.today_view_count = row['today_view_count'] or 0
+        popular_articles.append(article)
     return popular_articles
@@ -0,0 +1,188 @@
+"""
+Синтетические данные блога заданного объёма.
+
+Пользователи и категории создаются обычным сохранением (сигналы создают профили, MPTT строит дерево), остальное -
+bulk_create пачками: статьи с повторяющимися заголовками (slug с номерами, как у настоящих статей), теги, ветки
+комментариев с вложенными ответами, сырые просмотры и дневные агрегаты, файлы. Денормализованные счётчики и индекс
+похожих статей пересчитываются после вставки теми же функциями, что и после импорта статей.
+
+Генератор используют тесты бюджетов запросов (blog_app.tests, объём small) и замеры производительности (benchmarks).
+"""
+import random
+from datetime import timedelta
+from itertools import accumulate, cycle
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count
+from django.utils import timezone
+from taggit.models import Tag, TaggedItem
+
+from blog_app.categorystats import rebuild_category_counts
+from blog_app.models import Article, ArticleViewDaily, Category, Comment, Documents, TagUsage, ViewCount
+from blog_app.similarity import rebuild_similarities
+from reqsoft.utils import bulk_unique_slugs
+
+User = get_user_model()
+
+# объёмы данных: количество пользователей, статей, тегов и тегов у статьи, форма дерева категорий (ветвление и
+# глубина), статьи с комментариями, ветки у статьи, ответы в ветке и их вложенность, дни просмотров, файлы
+SCALES = {
+    'small': {
+        'users': 20, 'articles': 2000, 'tags': 60, 'tags_per_article': 3, 'category_branching': 3,
+        'category_depth': 3, 'commented_articles': 100, 'threads': 5, 'replies': 2, 'reply_depth': 2,
+        'viewed_articles': 500, 'views_per_article': 10, 'view_days': 7, 'documents': 500,
+    },
+    'medium': {
+        'users': 200, 'articles': 20000, 'tags': 300, 'tags_per_article': 4, 'category_branching': 4,
+        'category_depth': 3, 'commented_articles': 2000, 'threads': 10, 'replies': 3, 'reply_depth': 3,
+        'viewed_articles': 5000, 'views_per_article': 20, 'view_days': 30, 'documents': 5000,
+    },
+    'large': {
+        'users': 1000, 'articles': 100000, 'tags': 1000, 'tags_per_article': 5, 'category_branching': 5,
+        'category_depth': 4, 'commented_articles': 10000, 'threads': 20, 'replies': 3, 'reply_depth': 4,
+        'viewed_articles': 20000, 'views_per_article': 50, 'view_days': 90, 'documents': 20000,
+    },
+}
+TOPICS = ('Обзор', 'Инструкция', 'Заметки', 'Разбор ошибки', 'Настройка', 'Сравнение')
+BATCH_SIZE = 2000
+
+
+def create_categories(branching, depth):
+    """
+    Полное дерево категорий: branching корней, у каждой категории до уровня depth - branching подкатегорий
+    """
+    categories = []
+
+    def create(parent, path, level):
+        for number in range(branching):
+            title = f'Категория {".".join(map(str, path + (number,)))}'
+            category = Category.objects.create(title=title, description=title, parent=parent)
+            categories.append(category)
+            if level + 1 < depth:
+                create(category, path + (number,), level + 1)
+
+    create(None, (), 0)
+    return categories
+
+
+def thread_shape(replies, depth):
+    """
+    Форма ветки комментариев: [level, lft, rght, parent] в порядке обхода, parent - индекс родителя в списке или
+    None. У корня replies ответов, у каждого ответа - по одному вложенному ответу до уровня depth.
+    """
+    nodes = []
+    position = 0
+
+    def visit(level, parent):
+        nonlocal position
+        position += 1
+        index = len(nodes)
+        nodes.append([level, position, None, parent])
+        for _ in range(replies if level == 0 else int(level < depth)):
+            visit(level + 1, index)
+        position += 1
+        nodes[index][2] = position
+
+    visit(0, None)
+    return nodes
+
+
+def create_comments(article_ids, authors, threads, replies, depth):
+    """
+    Ветки комментариев с полями MPTT, вычисленными заранее. Уровни вставляются по очереди, чтобы у ответов были
+    id родителей. Возвращает количество комментариев.
+    """
+    shape = thread_shape(replies, depth)
+    authors = cycle(authors)
+    trees = [
+        [Comment(article_id=article_id, author=next(authors), content=f'Комментарий {lft}', tree_id=tree_id,
+                 lft=lft, rght=rght, level=level) for level, lft, rght, _ in shape]
+        for tree_id, article_id in enumerate((article_id for article_id in article_ids for _ in range(threads)), 1)
+    ]
+    for level in range(depth + 1):
+        batch = []
+        for tree in trees:
+            for comment, (node_level, _, _, parent) in zip(tree, shape):
+                if node_level == level:
+                    comment.parent_id = tree[parent].pk if parent is not None else None
+                    batch.append(comment)
+        Comment.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+    return len(trees) * len(shape)
+
+
+def generate(users, articles, tags, tags_per_article, category_branching, category_depth, commented_articles,
+             threads, replies, reply_depth, viewed_articles, views_per_article, view_days, documents, seed=0):
+    """
+    Создание набора данных (при одинаковом seed - одинакового). Возвращает словарь с пользователями (users),
+    категориями (categories) и количеством созданных записей по видам (counts).
+    """
+    rng = random.Random(seed)
+    authors = [User.objects.create_user(f'bench{number}') for number in range(users)]
+    categories = create_categories(category_branching, category_depth)
+
+    titles = [f'{TOPICS[number % len(TOPICS)]} {number % 97}' for number in range(articles)]
+    slugs = bulk_unique_slugs(Article, titles)
+    Article.objects.bulk_create(
+        (Article(title=title, slug=slug, short_description=f'Краткое описание: {title}',
+                 full_description=f'<p>{title}. Текст статьи номер {number}.</p>',
+                 search_text=f'{title}. Текст статьи номер {number}.',
+                 status='draft' if number % 10 == 0 else 'published', author=author, category=category)
+         for number, title, slug, author, category in zip(range(articles), titles, slugs, cycle(authors),
+                                                          cycle(categories))),
+        batch_size=BATCH_SIZE,
+    )
+    article_ids = list(Article.objects.order_by('pk').values_list('pk', flat=True))
+
+    Tag.objects.bulk_create((Tag(name=f'тег {number}', slug=f'tag-{number}') for number in range(tags)),
+                            batch_size=BATCH_SIZE)
+    tag_ids = list(Tag.objects.order_by('pk').values_list('pk', flat=True))
+    content_type = ContentType.objects.get_for_model(Article)
+    # популярность тегов убывает как 1/n (закон Ципфа); повторно выпавший статье тег пропускается
+    weights = list(accumulate(1 / rank for rank in range(1, len(tag_ids) + 1)))
+    TaggedItem.objects.bulk_create(
+        (TaggedItem(content_type=content_type, object_id=article_id, tag_id=tag_id)
+         for article_id in article_ids
+         for tag_id in set(rng.choices(tag_ids, cum_weights=weights, k=tags_per_article))),
+        batch_size=BATCH_SIZE,
+    )
+    TagUsage.objects.bulk_create(
+        TagUsage(tag_id=tag_id, num_times=num_times)
+        for tag_id, num_times in TaggedItem.objects.order_by().values_list('tag_id').annotate(Count('pk'))
+    )
+
+    commented = article_ids[:commented_articles]
+    comment_total = create_comments(commented, authors, threads, replies, reply_depth)
+    per_article = comment_total // len(commented) if commented else 0
+    Article.objects.filter(pk__in=commented).update(comment_count=per_article)
+
+    today = timezone.localdate()
+    viewed = article_ids[:viewed_articles]
+    ViewCount.objects.bulk_create(
+        (ViewCount(article_id=article_id, ip_address=f'10.{number // 65536 % 256}.{number // 256 % 256}.{number % 256}',
+                   viewed_day=today - timedelta(days=number % view_days))
+         for article_id in viewed for number in range(views_per_article)),
+        batch_size=BATCH_SIZE,
+    )
+    ArticleViewDaily.objects.bulk_create(
+        (ArticleViewDaily(article_id=article_id, day=today - timedelta(days=days),
+                          views=views_per_article // view_days + index % 50, unique_ips=1)
+         for index, article_id in enumerate(viewed) for days in range(view_days)),
+        batch_size=BATCH_SIZE,
+    )
+    Documents.objects.bulk_create(
+        (Documents(file=f'https://example.com/files/{number}.pdf', description=f'Файл {number}', category=category)
+         for number, category in zip(range(documents), cycle(categories))),
+        batch_size=BATCH_SIZE,
+    )
+    rebuild_category_counts()
+    rebuild_similarities()
+    return {
+        'users': authors,
+        'categories': categories,
+        'counts': {
+            'users': len(authors), 'categories': len(categories), 'articles': len(article_ids),
+            'tags': len(tag_ids), 'comments': comment_total, 'views': len(viewed) * views_per_article,
+            'documents': documents,
+        },
+    }
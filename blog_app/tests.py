@@ -1,3 +1,570 @@
-from django.test import TestCase
+import csv
+import json
+import logging
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from taggit.models import Tag
+
+from reqsoft.cache import get_namespace_version
+from reqsoft.querybudget import query_budget, track_queries
+from reqsoft.utils import bulk_unique_slugs, save_with_unique_slug
+from . import similarity
+from .fragments import get_versions
+from .models import Article, ArticleViewDaily, Category, Comment, Documents, SimilarArticle, ViewCount
+from .navigation import subtree_filter
+from .search import SearchBackend, get_search_backend
+from .suggest import SuggestIndex
+from .tagstats import get_popular_tags
+from .testdata import SCALES, generate
+from .transfer import ArticleImporter, export_records
+from .viewcounter import ViewCountBuffer
+
+User = get_user_model()
+
+
+class QueryPlanTests(TestCase):
+    """
+    Частые запросы списков, страницы статьи, комментариев и счётчика просмотров выполняются по индексам (миграция
+    0014_published_indexes). Проверяется план запроса для SQLite и PostgreSQL; на PostgreSQL последовательное
+    чтение отключается, чтобы на маленьких тестовых таблицах планировщик не предпочёл его индексу.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('author', password='password')
+        cls.root = Category.objects.create(title='Программирование', description='Программирование')
+        cls.child = Category.objects.create(title='Python', description='Python', parent=cls.root)
+        cls.articles = [
+            Article.objects.create(title=f'Статья {number}', short_description='Кратко', full_description='Текст',
+                                   status='published' if number % 3 else 'draft', author=cls.user,
+                                   category=cls.child if number % 2 else cls.root)
+            for number in range(6)
+        ]
+        cls.article = cls.articles[1]
+        cls.comment = Comment.objects.create(article=cls.article, author=cls.user, content='Комментарий')
+        Comment.objects.create(article=cls.article, author=cls.user, content='Ответ', parent=cls.comment)
+        ViewCount.objects.create(article=cls.article, ip_address='127.0.0.1')
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+
+    def assertUsesIndex(self, queryset, index_name=None):
+        """
+        Таблица запроса читается по индексу index_name (или по любому индексу, если имя не задано), а не целиком
+        """
+        plan = queryset.explain()
+        table = queryset.model._meta.db_table
+        if index_name is not None:
+            self.assertIn(index_name, plan)
+        if connection.vendor == 'postgresql':
+            self.assertNotIn(f'Seq Scan on {table}', plan)
+        else:
+            full_scans = [line for line in plan.splitlines() if f'SCAN {table}' in line and 'USING' not in line]
+            self.assertEqual(full_scans, [], plan)
+
+    def test_article_list(self):
+        self.assertUsesIndex(Article.objects.all()[:10], 'article_published_idx')
+
+    def test_category_article_list(self):
+        self.assertUsesIndex(Article.objects.all().filter(subtree_filter(self.root))[:10],
+                             'article_published_cat_idx')
+
+    def test_article_detail(self):
+        self.assertUsesIndex(Article.objects.detail().filter(slug=self.article.slug))
+
+    def test_category_by_slug(self):
+        self.assertUsesIndex(Category.objects.filter(slug=self.child.slug))
+
+    def test_comment_roots(self):
+        self.assertUsesIndex(Comment.objects.filter(article_id=self.article.pk, level=0).order_by('-tree_id')[:11],
+                             'comment_article_roots_idx')
+
+    def test_comment_replies(self):
+        comment = self.comment
+        queryset = Comment.objects.filter(tree_id=comment.tree_id, lft__range=(comment.lft + 1, comment.rght - 1))
+        self.assertUsesIndex(queryset.order_by('lft'), 'comment_tree_lft_idx')
+
+    def test_unique_ips_by_day(self):
+        queryset = ViewCount.objects.filter(article_id=self.article.pk, viewed_day=timezone.localdate())
+        queryset = queryset.values('article_id').annotate(total=Count('pk')).values('total')
+        self.assertUsesIndex(queryset, 'viewcount_article_day_idx')
+
+    def test_category_slug_is_unique(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Category.objects.create(title='Другой Python', slug=self.child.slug, description='Python')
+
+
+@override_settings(VIEWCOUNT_FLUSH_INTERVAL=0, SUGGEST_INDEX_WARMUP=False, IMAGE_DERIVATIVES_ASYNC=False,
+                   VIEW_CACHE_POLICIES={})
+class ViewQueryBudgetTests(TestCase):
+    """
+    Количество запросов основных страниц не превышает бюджетов QUERY_BUDGETS на данных реалистичного объёма.
+    Страницы открываются с пустым кэшем (кэширование ответов отключено), поэтому N+1 запросы в списках и шаблонных
+    тегах не скрываются кэшем.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        # данные объёма small генератора замеров производительности
+        data = generate(**SCALES['small'])
+        cls.user, cls.categories = data['users'][0], data['categories']
+        cls.article = Article.objects.filter(status='published', comments__isnull=False).first()
+        cls.comment = cls.article.comments.filter(level=0).first()
+        cls.tag = Tag.objects.first()
+        cls.document = Documents.objects.first()
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def assertWithinBudget(self, url, status_code=200):
+        for cache in caches.all():
+            cache.clear()
+        view_name = resolve(url.split('?')[0]).view_name
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status_code)
+        budget = settings.QUERY_BUDGETS[view_name]
+        self.assertLessEqual(len(queries), budget, f'{view_name}: {len(queries)} запросов при бюджете {budget}\n'
+                             + '\n'.join(query['sql'] for query in queries))
+        return response
+
+    def test_article_list(self):
+        self.assertWithinBudget(reverse('blog_app:article_list'))
+
+    def test_article_list_next_page(self):
+        response = self.assertWithinBudget(reverse('blog_app:article_list'))
+        self.assertWithinBudget(f'{reverse("blog_app:article_list")}?cursor={response.context["page_obj"].next_cursor}')
+
+    def test_article_detail(self):
+        self.assertWithinBudget(self.article.get_absolute_url())
+
+    def test_articles_by_category(self):
+        self.assertWithinBudget(self.categories[0].get_absolute_url())
+
+    def test_articles_by_tag(self):
+        self.assertWithinBudget(reverse('blog_app:articles_by_tags', kwargs={'tag': self.tag.slug}))
+
+    def test_comment_threads(self):
+        self.assertWithinBudget(reverse('blog_app:comment_threads', kwargs={'pk': self.article.pk}))
+
+    def test_comment_replies(self):
+        self.assertWithinBudget(reverse('blog_app:comment_replies', kwargs={'pk': self.comment.pk}))
+
+    def test_search(self):
+        self.assertWithinBudget(f'{reverse("blog_app:search")}?do=статьи')
+
+    def test_search_suggest(self):
+        self.assertWithinBudget(f'{reverse("blog_app:search_suggest")}?q=стат')
+
+    def test_files_list(self):
+        self.assertWithinBudget(reverse('blog_app:files_list'))
+
+    def test_file_detail(self):
+        self.assertWithinBudget(self.document.get_absolute_url())
+
+    def test_files_by_category(self):
+        self.assertWithinBudget(self.categories[0].get_absolute_url_files())
+
+    def test_profile_detail(self):
+        self.assertWithinBudget(self.user.profile.get_absolute_url())
+
+
+class QueryBudgetTests(TestCase):
+    """
+    Учёт запросов областями reqsoft.querybudget и запись о превышении бюджета
+    """
+
+    def test_nested_scopes(self):
+        @query_budget('tests.nested')
+        def nested():
+            return list(Category.objects.all())
+
+        with track_queries('outer') as stats:
+            Category.objects.count()
+            nested()
+        self.assertEqual(stats.count, 2)
+        self.assertEqual(stats.nested['tests.nested'].count, 1)
+
+    @override_settings(QUERY_BUDGETS={'tests.nested': 0})
+    def test_decorator_logs_exceeded_budget(self):
+        @query_budget('tests.nested')
+        def nested():
+            return Category.objects.count()
+
+        with self.assertLogs('reqsoft.querybudget', logging.WARNING) as logs:
+            nested()
+        self.assertIn('tests.nested', logs.output[0])
+
+    @override_settings(QUERY_BUDGETS={'main_app:index': 0}, QUERY_BUDGET_HEADERS=True)
+    def test_middleware_logs_exceeded_budget(self):
+        user = User.objects.create_user('reader')
+        self.client.force_login(user)
+        with self.assertLogs('reqsoft.querybudget', logging.WARNING) as logs:
+            response = self.client.get(reverse('main_app:index'))
+        self.assertIn('main_app:index', logs.output[0])
+        self.assertIn('queries', response['Server-Timing'])
+
+
+class ArticleCounterTests(TestCase):
+    """
+    Сохранение загруженной ранее статьи не перезаписывает счётчики, изменённые UPDATE с F()
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('author')
+        cls.category = Category.objects.create(title='Python', description='Python')
+
+    def test_save_keeps_counters(self):
+        article = Article.objects.create(title='Статья', short_description='Кратко', full_description='Текст',
+                                         status='published', author=self.user, category=self.category)
+        Article.objects.filter(pk=article.pk).update(view_count=F('view_count') + 5,
+                                                     comment_count=F('comment_count') + 2)
+        article.title = 'Изменённая статья'
+        article.save()
+        article.refresh_from_db()
+        self.assertEqual(article.title, 'Изменённая статья')
+        self.assertEqual((article.view_count, article.comment_count), (5, 2))
+
+
+class SearchTests(TestCase):
+    """
+    Поиск находит опубликованную статью по заголовку и не находит черновик - и в движке текущей базы, и в поиске
+    подстрок для баз без полнотекстового индекса
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('author')
+        category = Category.objects.create(title='Python', description='Python')
+        cls.published = Article.objects.create(title='Оптимизация запросов', short_description='Кратко',
+                                               full_description='<p>Индексы и планы</p>', status='published',
+                                               author=user, category=category)
+        Article.objects.create(title='Оптимизация шаблонов', short_description='Кратко', full_description='Текст',
+                               status='draft', author=user, category=category)
+
+    def assertFinds(self, backend):
+        # icontains в SQLite не различает регистр только для латиницы
+        self.assertEqual([article.pk for article in backend.search('Оптимизация', 0, 10)], [self.published.pk])
+        self.assertEqual(backend.search('шаблонов', 0, 10), [])
+
+    def test_database_backend(self):
+        self.assertFinds(get_search_backend())
+
+    def test_fallback_backend(self):
+        self.assertFinds(SearchBackend())
+        article, = SearchBackend().search('планы', 0, 10)
+        self.assertIn('<mark>планы</mark>', article.snippet)
+
+
+class PopularTagsTests(TestCase):
+    """
+    Закэшированный список популярных тегов сбрасывается при переименовании и удалении тега
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('author')
+        category = Category.objects.create(title='Python', description='Python')
+        article = Article.objects.create(title='Статья', short_description='Кратко', full_description='Текст',
+                                         status='published', author=user, category=category)
+        article.tags.set(['django', 'python'])
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def names(self):
+        return sorted(tag['name'] for tag in get_popular_tags(10))
+
+    def test_rename_and_delete(self):
+        self.assertEqual(self.names(), ['django', 'python'])
+        tag = Tag.objects.get(name='django')
+        tag.name = 'Django'
+        tag.save()
+        self.assertEqual(self.names(), ['Django', 'python'])
+        tag.delete()
+        self.assertEqual(self.names(), ['python'])
+
+
+@override_settings(SUGGEST_INDEX_WARMUP=False)
+class SuggestIndexTests(TestCase):
+    """
+    Изменения, пришедшие во время перезагрузки индекса подсказок, не теряются при замене индекса
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        Category.objects.create(title='Python', description='Python')
+
+    def test_changes_during_reload(self):
+        index = SuggestIndex()
+        index.load()
+        read_items = index.read_items
+
+        def read_then_change():
+            items = read_items()
+            # изменения после чтения базы, но до замены индекса
+            index.add('tag', 1, 'Django', '/tags/django/')
+            index.remove('category', Category.objects.get().pk)
+            return items
+
+        with mock.patch.object(index, 'read_items', side_effect=read_then_change):
+            index.load()
+        self.assertEqual([item['label'] for item in index.suggest('dj')], ['Django'])
+        self.assertEqual(index.suggest('pyth'), [])
+
+
+@override_settings(VIEWCOUNT_FLUSH_INTERVAL=0)
+class ViewCountBufferTests(TestCase):
+    """
+    Буфер просмотров: повторные просмотры с одного IP, ограничение памяти процесса и перенос сохранённых в файлы
+    просмотров в базу
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('author')
+        category = Category.objects.create(title='Python', description='Python')
+        cls.article = Article.objects.create(title='Статья', short_description='Кратко', full_description='Текст',
+                                             status='published', author=user, category=category)
+
+    def assertCounts(self, rows, views):
+        daily = ArticleViewDaily.objects.get(article=self.article)
+        self.assertEqual(ViewCount.objects.filter(article=self.article).count(), rows)
+        self.assertEqual((daily.views, daily.unique_ips), (views, rows))
+        self.assertEqual(Article.objects.get(pk=self.article.pk).view_count, views)
+
+    def test_repeat_views(self):
+        buffer = ViewCountBuffer()
+        for ip_address in ('10.0.0.1', '10.0.0.1', '10.0.0.2'):
+            buffer.add(self.article.pk, ip_address)
+        self.assertCounts(rows=2, views=3)
+
+    @override_settings(VIEWCOUNT_SEEN_SIZE=1)
+    def test_seen_size(self):
+        buffer = ViewCountBuffer()
+        for ip_address in ('10.0.0.1', '10.0.0.2', '10.0.0.1'):
+            buffer.add(self.article.pk, ip_address)
+        self.assertEqual(len(buffer._seen), 1)
+        # вытесненная пара записывается повторно, и повтор отсекает уникальное ограничение
+        self.assertCounts(rows=2, views=3)
+
+    def test_drain_spool(self):
+        with tempfile.TemporaryDirectory() as spool_dir, self.settings(VIEWCOUNT_SPOOL_DIR=spool_dir):
+            buffer = ViewCountBuffer()
+            with mock.patch.object(buffer, '_write', side_effect=OperationalError), \
+                    self.assertLogs('blog_app.viewcounter', logging.ERROR):
+                buffer.add(self.article.pk, '10.0.0.1')
+                buffer.add(self.article.pk, '10.0.0.1')
+            self.assertFalse(ViewCount.objects.exists())
+            self.assertEqual(len(list(buffer.spool_dir.glob('*.json'))), 2)
+            self.assertEqual(buffer.drain_spool(), 2)
+            self.assertEqual(list(buffer.spool_dir.iterdir()), [])
+        self.assertCounts(rows=1, views=2)
+
+
+@override_settings(SUGGEST_INDEX_WARMUP=False, SIMILAR_ARTICLES_AUTO_UPDATE=False)
+class ArticleTransferTests(TestCase):
+    """
+    Экспорт и повторный импорт статей сохраняет их поля, а импорт сбрасывает списки статей и подсказки
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('author')
+        root = Category.objects.create(title='Программирование', description='Программирование')
+        child = Category.objects.create(title='Python', description='Python', parent=root)
+        for number, (category, tags) in enumerate(((root, ['django']), (child, ['django', 'python']))):
+            article = Article.objects.create(title=f'Импорт {number}', short_description='Кратко',
+                                             full_description=f'<p>Текст {number}</p>', status='published',
+                                             fixed=bool(number), author=user, category=category)
+            article.tags.set(tags)
+
+    def test_round_trip(self):
+        exported = [json.loads(json.dumps(record)) for record in export_records(Article.objects.all())]
+        Article.objects.all().delete()
+        index = SuggestIndex()
+        index.load()
+        version = get_namespace_version('articles')
+
+        with mock.patch('blog_app.transfer.suggest_index', index):
+            imported = list(ArticleImporter(batch_size=1).run(json.dumps(record) for record in exported))
+
+        self.assertEqual(imported, [1, 2])
+        self.assertEqual([json.loads(json.dumps(record)) for record in export_records(Article.objects.all())],
+                         exported)
+        self.assertNotEqual(get_namespace_version('articles'), version)
+        self.assertEqual([item['label'] for item in index.suggest('импорт')], ['Импорт 0', 'Импорт 1'])
+
+
+class ViewAnalyticsExportTests(TestCase):
+    """
+    Выгрузка статистики просмотров: доступ только персоналу, потоковые CSV и NDJSON, экранирование формул в CSV
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+        cls.user = User.objects.create_user('reader')
+        category = Category.objects.create(title='Python', description='Python')
+        cls.article = Article.objects.create(title='=HYPERLINK("http://example.com")', short_description='Кратко',
+                                             full_description='Текст', status='published', author=cls.user,
+                                             category=category)
+        ArticleViewDaily.objects.create(article=cls.article, day=timezone.localdate(), views=7, unique_ips=3)
+        cls.url = reverse('blog_app:view_analytics_export')
+
+    def export(self, output_format):
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url, {'group': 'day', 'format': output_format})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_staff_only(self):
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+
+    def test_csv(self):
+        header, row = csv.reader(self.export('csv').splitlines())
+        self.assertEqual(header, ['day', 'article_id', 'slug', 'title', 'views', 'unique_ips'])
+        self.assertEqual(row[3], '\'=HYPERLINK("http://example.com")')
+        self.assertEqual(row[4:], ['7', '3'])
+
+    def test_ndjson(self):
+        row, = [json.loads(line) for line in self.export('ndjson').splitlines()]
+        self.assertEqual(row['title'], self.article.title)
+        self.assertEqual((row['views'], row['unique_ips']), (7, 3))
+
+
+class CompactViewCountsTests(TestCase):
+    """
+    Свёртка сырых просмотров в дневные агрегаты начиная с последнего свёрнутого дня или с --since
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('author')
+        category = Category.objects.create(title='Python', description='Python')
+        cls.article = Article.objects.create(title='Статья', short_description='Кратко', full_description='Текст',
+                                             status='published', author=user, category=category)
+        cls.today = timezone.localdate()
+        cls.old_day = cls.today - timedelta(days=10)
+        for day, addresses in ((cls.old_day, 2), (cls.today, 3)):
+            ViewCount.objects.bulk_create([ViewCount(article=cls.article, ip_address=f'10.0.0.{number}', viewed_day=day)
+                                           for number in range(addresses)])
+        ArticleViewDaily.objects.create(article=cls.article, day=cls.today, views=5, unique_ips=1)
+
+    def compact(self, *args):
+        call_command('compact_viewcounts', *args, stdout=StringIO())
+        return {row.day: (row.views, row.unique_ips) for row in ArticleViewDaily.objects.filter(article=self.article)}
+
+    def test_from_last_compacted_day(self):
+        self.assertEqual(self.compact(), {self.today: (5, 3)})
+
+    def test_since(self):
+        self.assertEqual(self.compact('--since', self.old_day.isoformat()),
+                         {self.old_day: (2, 2), self.today: (5, 3)})
+
+
+class UniqueSlugTests(TestCase):
+    """
+    Подбор уникального slug (reqsoft.utils): следующий номер после наибольшего занятого и повтор при гонке
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('author')
+        cls.category = Category.objects.create(title='Python', description='Python')
+
+    def create_article(self, title, slug=''):
+        return Article.objects.create(title=title, slug=slug, short_description='Кратко', full_description='Текст',
+                                      status='published', author=self.user, category=self.category)
+
+    def test_collision(self):
+        self.assertEqual(self.create_article('Статья').slug, 'statya')
+        self.assertEqual(self.create_article('Статья').slug, 'statya-2')
+
+    def test_after_largest_suffix(self):
+        self.create_article('Статья')
+        self.create_article('Статья', slug='statya-10')
+        self.assertEqual(self.create_article('Статья').slug, 'statya-11')
+        self.assertEqual(bulk_unique_slugs(Article, ['Статья', 'Статья']), ['statya-12', 'statya-13'])
+
+    def test_retry_after_integrity_error(self):
+        self.create_article('Статья')
+        article = Article(title='Статья', short_description='Кратко', full_description='Текст', status='published',
+                          author=self.user, category=self.category)
+        # первый подбор видит базу до вставки параллельного запроса и выбирает уже занятый slug
+        with mock.patch('reqsoft.utils.unique_slugify', side_effect=['statya', 'statya-2']) as unique_slugify:
+            save_with_unique_slug(article, article.title, lambda: super(Article, article).save())
+        self.assertEqual(unique_slugify.call_count, 2)
+        self.assertEqual(Article.objects.get(pk=article.pk).slug, 'statya-2')
+
+
+class SimilarityUpdateTests(TestCase):
+    """
+    Индекс похожих статей пересчитывается один раз на транзакцию после её фиксации
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('author')
+        cls.category = Category.objects.create(title='Python', description='Python')
+
+    def create_article(self, title):
+        return Article.objects.create(title=title, short_description='Кратко', full_description='Текст',
+                                      status='published', author=self.user, category=self.category)
+
+    def setUp(self):
+        # очередь могла остаться от предыдущих тестов, чьи транзакции откатывались без on_commit
+        similarity.get_pending_update().article_ids.clear()
+
+    def test_one_update_per_transaction(self):
+        with mock.patch('blog_app.similarity.update_article_similarities',
+                        wraps=similarity.update_article_similarities) as update:
+            with self.captureOnCommitCallbacks(execute=True):
+                first = self.create_article('Первая статья')
+                first.tags.set(['django', 'python'])
+                second = self.create_article('Вторая статья')
+                second.tags.set(['django'])
+                second.title = 'Вторая статья, исправленная'
+                second.save()
+        self.assertEqual(sorted(call.args[0] for call in update.call_args_list), sorted([first.pk, second.pk]))
+        self.assertTrue(SimilarArticle.objects.filter(article=first, similar=second).exists())
+
+
+class CommentFragmentTests(TestCase):
+    """
+    Изменение профиля автора сбрасывает закэшированные ветки комментариев статей, где он писал
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('author')
+        category = Category.objects.create(title='Python', description='Python')
+        cls.article = Article.objects.create(title='Статья', short_description='Кратко', full_description='Текст',
+                                             status='published', author=cls.user, category=category)
+        Comment.objects.create(article=cls.article, author=cls.user, content='Комментарий')
+
+    def test_profile_change_resets_comments(self):
+        before = get_versions(Article.objects.get(pk=self.article.pk))['comments']
+        profile = self.user.profile
+        profile.bio = 'Новая информация'
+        profile.save()
+        self.assertNotEqual(get_versions(Article.objects.get(pk=self.article.pk))['comments'], before)
@@ -0,0 +1,277 @@
+"""
+Массовый импорт и экспорт статей в формате JSONL (одна статья - один JSON объект в строке).
+
+Поля записи: title, slug, short_description, body (полный текст), category (путь из названий категорий от корня),
+tags (список названий), author (username), status, fixed, thumbnail (путь файла в MEDIA_ROOT), time_create (ISO 8601).
+При импорте обязательны title, body и category, остальные поля необязательны.
+
+Обе стороны работают потоком: записи читаются и пишутся по одной, а в базу попадают пачками по batch_size через
+bulk_create в отдельной транзакции на пачку, поэтому память не зависит от размера файла. Категории, теги и авторы
+ищутся по словарям в памяти, которые дополняются одним запросом на пачку. Сигналы сохранения статей при bulk_create
+не вызываются, поэтому счётчики тегов обновляются здесь же, закэшированные списки статей и индекс подсказок
+сбрасываются после импорта, а поисковый индекс PostgreSQL и индекс похожих статей перестраиваются после импорта
+целиком (для SQLite поисковый индекс обновляют триггеры базы).
+"""
+import json
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+from taggit.models import Tag, TaggedItem
+
+from reqsoft.cache import bump_namespace
+from reqsoft.utils import bulk_unique_slugs, html_to_text
+from .categorystats import rebuild_category_counts
+from .models import Article, Category
+from .navigation import invalidate_category_tree
+from .suggest import suggest_index
+from .tagstats import change_tag_usage
+
+User = get_user_model()
+
+STATUSES = dict(Article.STATUS_OPTIONS)
+
+
+class TransferError(Exception):
+    """
+    Неверная запись файла импорта
+    """
+
+    def __init__(self, line, message):
+        super().__init__(f'Строка {line}: {message}')
+        self.line = line
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def read_records(lines):
+    """
+    Записи файла JSONL с номерами строк; пустые строки пропускаются
+    """
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise TransferError(line_number, f'неверный JSON ({error})')
+        if not isinstance(record, dict):
+            raise TransferError(line_number, 'ожидается JSON объект')
+        yield line_number, record
+
+
+def validate_record(line, record):
+    for name in ('title', 'body', 'category'):
+        if not record.get(name):
+            raise TransferError(line, f'не заполнено поле {name}')
+    category = record['category']
+    if isinstance(category, str):
+        category = [part.strip() for part in category.split('/') if part.strip()]
+    if not isinstance(category, list) or not all(isinstance(part, str) for part in category):
+        raise TransferError(line, 'category должно быть списком названий или путём через /')
+    record['category'] = tuple(category)
+    tags = record.get('tags') or []
+    if not isinstance(tags, list):
+        raise TransferError(line, 'tags должно быть списком')
+    record['tags'] = list(dict.fromkeys(str(tag).strip() for tag in tags if str(tag).strip()))
+    status = record.get('status') or 'published'
+    if status not in STATUSES:
+        raise TransferError(line, f'неизвестный статус {status}')
+    record['status'] = status
+    if record.get('time_create'):
+        try:
+            time_create = datetime.fromisoformat(record['time_create'])
+        except (TypeError, ValueError):
+            raise TransferError(line, 'неверная дата time_create')
+        if timezone.is_naive(time_create):
+            time_create = timezone.make_aware(time_create)
+        record['time_create'] = time_create
+    return record
+
+
+class CategoryResolver:
+    """
+    Идентификаторы категорий по пути из названий. Все категории читаются одним запросом, недостающие создаются,
+    если разрешено: в контексте delay_mptt_updates дерево MPTT перестраивается один раз на пачку.
+    """
+
+    def __init__(self, create=False):
+        self.create = create
+        self.created = 0
+        self.paths = {}
+        nodes = list(Category.objects.order_by('tree_id', 'lft').values_list('pk', 'parent_id', 'title'))
+        path_by_pk = {}
+        for pk, parent_id, title in nodes:
+            path_by_pk[pk] = path_by_pk.get(parent_id, ()) + (title,)
+            self.paths.setdefault(path_by_pk[pk], pk)
+
+    def resolve(self, line, path):
+        if path not in self.paths:
+            if not self.create:
+                raise TransferError(line, f'категория {"/".join(path)} не найдена')
+            parent_id = self.resolve(line, path[:-1]) if len(path) > 1 else None
+            category = Category(title=path[-1], description=path[-1], parent_id=parent_id)
+            category.save()
+            self.paths[path] = category.pk
+            self.created += 1
+        return self.paths[path]
+
+
+class LookupMap:
+    """
+    Словарь значение -> id, дополняемый одним запросом на пачку для отсутствующих значений
+    """
+
+    def __init__(self, queryset, field):
+        self.queryset = queryset
+        self.field = field
+        self.ids = {}
+
+    def load(self, values):
+        missing = {value for value in values if value not in self.ids}
+        if missing:
+            self.ids.update(self.queryset.filter(**{f'{self.field}__in': missing}).values_list(self.field, 'pk'))
+        return missing - self.ids.keys()
+
+
+class ArticleImporter:
+    """
+    Импорт статей пачками. default_author - username для записей без автора или с неизвестным автором,
+    create_categories - создавать отсутствующие категории вместо ошибки.
+    """
+
+    def __init__(self, batch_size=500, create_categories=False, default_author=None):
+        self.batch_size = batch_size
+        self.categories = CategoryResolver(create=create_categories)
+        self.authors = LookupMap(User.objects.all(), 'username')
+        self.tags = LookupMap(Tag.objects.all(), 'name')
+        self.content_type = ContentType.objects.get_for_model(Article)
+        self.default_author = None
+        if default_author:
+            self.authors.load([default_author])
+            self.default_author = self.authors.ids.get(default_author)
+            if self.default_author is None:
+                raise ValueError(f'Пользователь {default_author} не найден')
+        self.imported = 0
+        self.tags_created = 0
+
+    def run(self, lines):
+        """
+        Импорт записей из итератора строк JSONL; генератор возвращает количество статей после каждой пачки
+        """
+        records = ((line, validate_record(line, record)) for line, record in read_records(lines))
+        for batch in batched(records, self.batch_size):
+            # новые категории пачки встраиваются в дерево одной частичной перестройкой при выходе из контекста
+            with transaction.atomic(), Category.objects.delay_mptt_updates():
+                self.write_batch(batch)
+            yield self.imported
+        # статьи вставлены bulk_create без сигналов: счётчики категорий пересчитываются целиком
+        rebuild_category_counts()
+        invalidate_category_tree()
+        # то же, что обработчики post_save статей и тегов (blog_app.signals), один раз на весь импорт
+        bump_namespace('articles')
+        suggest_index.refresh()
+
+    def get_author(self, line, username):
+        author_id = self.authors.ids.get(username) if username else None
+        if author_id is None:
+            if self.default_author is None:
+                raise TransferError(line, f'автор {username or "(не указан)"} не найден')
+            return self.default_author
+        return author_id
+
+    def create_tags(self, names):
+        names = sorted(names)
+        slugs = bulk_unique_slugs(Tag, names)
+        Tag.objects.bulk_create([Tag(name=name, slug=slug) for name, slug in zip(names, slugs)])
+        self.tags.load(names)
+        self.tags_created += len(names)
+
+    def write_batch(self, batch):
+        """
+        Запись пачки пар (номер строки, запись)
+        """
+        self.authors.load({record.get('author') for _, record in batch} - {None, ''})
+        new_tags = self.tags.load({tag for _, record in batch for tag in record['tags']})
+        if new_tags:
+            self.create_tags(new_tags)
+
+        slugs = bulk_unique_slugs(Article, [record.get('slug') or record['title'] for _, record in batch])
+        articles = []
+        for (line, record), slug in zip(batch, slugs):
+            articles.append(Article(
+                title=record['title'],
+                slug=slug,
+                short_description=record.get('short_description') or '',
+                full_description=record['body'],
+                search_text=html_to_text(record['body']),
+                thumbnail=record.get('thumbnail') or '',
+                status=record['status'],
+                fixed=bool(record.get('fixed')),
+                author_id=self.get_author(line, record.get('author')),
+                category_id=self.categories.resolve(line, record['category']),
+            ))
+        Article.objects.bulk_create(articles)
+
+        # время создания: bulk_create всегда проставляет текущее время полю с auto_now_add
+        dated = []
+        for article, (_, record) in zip(articles, batch):
+            if record.get('time_create'):
+                article.time_create = record['time_create']
+                dated.append(article)
+        if dated:
+            Article.objects.bulk_update(dated, ['time_create'])
+
+        tagged = []
+        usage = Counter()
+        for article, (_, record) in zip(articles, batch):
+            for name in record['tags']:
+                tag_id = self.tags.ids[name]
+                tagged.append(TaggedItem(content_type=self.content_type, object_id=article.pk, tag_id=tag_id))
+                usage[tag_id] += 1
+        TaggedItem.objects.bulk_create(tagged)
+        by_count = {}
+        for tag_id, count in usage.items():
+            by_count.setdefault(count, []).append(tag_id)
+        for count, tag_ids in by_count.items():
+            change_tag_usage(tag_ids, count)
+        self.imported += len(articles)
+
+
+def export_records(queryset, chunk_size=1000):
+    """
+    Записи для экспорта статей queryset: статьи читаются курсором по chunk_size, теги - одним запросом на пачку
+    """
+    paths = {}
+    for pk, parent_id, title in Category.objects.order_by('tree_id', 'lft').values_list('pk', 'parent_id', 'title'):
+        paths[pk] = paths.get(parent_id, []) + [title]
+    content_type = ContentType.objects.get_for_model(Article)
+    articles = queryset.select_related('author').order_by('pk').iterator(chunk_size=chunk_size)
+    for chunk in batched(articles, chunk_size):
+        tags = {}
+        for object_id, name in (TaggedItem.objects.filter(content_type=content_type,
+                                                          object_id__in=[article.pk for article in chunk])
+                                .order_by('tag__name').values_list('object_id', 'tag__name')):
+            tags.setdefault(object_id, []).append(name)
+        for article in chunk:
+            yield {
+                'title': article.title,
+                'slug': article.slug,
+                'short_description': article.short_description,
+                'body': article.full_description,
+                'category': paths.get(article.category_id, []),
+                'tags': tags.get(article.pk, []),
+                'author': article.author.username if article.author else None,
+                'status': article.status,
+                'fixed': article.fixed,
+                'thumbnail': article.thumbnail.name or None,
+                'time_create': article.time_create.isoformat(),
+            }
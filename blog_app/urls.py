@@ -10,12 +10,17 @@ urlpatterns = [
     path('articles/<str:slug>/', views.ArticleDetailView.as_view(), name='article_detail'),
     path('articles/<str:slug>/update/', views.ArticleUpdateView.as_view(), name='article_update'),
     path('articles/<str:slug>/delete/', views.ArticleDeleteView.as_view(), name='article_delete'),
+    path('articles/<int:pk>/comments/', views.CommentThreadView.as_view(), name='comment_threads'),
     path('articles/<int:pk>/comments/create/', CommentCreateView.as_view(), name='comment_create_view'),
+    path('comments/<int:pk>/replies/', views.CommentRepliesView.as_view(), name='comment_replies'),
     path('articles/tags/<str:tag>/', ArticleByTagListView.as_view(), name='articles_by_tags'),
     path('category/create/', views.CategoryCreateView.as_view(), name='category_create'),
     path('category/<str:slug>/', views.ArticleByCategoryListView.as_view(), name="articles_by_category"),
     path('category/files/<str:slug>/', views.FilesByCategoryListView.as_view(), name="files_by_category"),
+    path('analytics/views/export/', views.ViewAnalyticsExportView.as_view(), name='view_analytics_export'),
+    path('fragments/stats/', views.ArticleFragmentStatsView.as_view(), name='fragment_stats'),
     path('search/', ArticleSearchResultView.as_view(), name='search'),
+    path('search/suggest/', views.ArticleSuggestView.as_view(), name='search_suggest'),
     path('files/', views.FilesListView.as_view(), name='files_list'),
     path('files/<int:pk>/', views.FilesDetailView.as_view(), name='file_detail'),
     path('files/create/', views.FilesCreateView.as_view(), name='file_create'),
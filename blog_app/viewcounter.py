@@ -0,0 +1,215 @@
+"""
+Буферизованный учёт просмотров статей.
+
+Просмотр не пишется в базу на каждом запросе: ViewCountMixin кладёт пару (статья, IP) в буфер процесса, а фоновый
+поток раз в VIEWCOUNT_FLUSH_INTERVAL секунд сбрасывает накопленное пачками по VIEWCOUNT_BATCH_SIZE через
+bulk_create(ignore_conflicts=True). Повторные просмотры одной статьи с одного IP за день отсекаются ещё в памяти,
+а между процессами - уникальным ограничением (article, ip_address, viewed_day). Память процесса ограничена
+VIEWCOUNT_SEEN_SIZE последними парами (статья, IP): давно встреченная пара вытесняется, и её повторный просмотр
+отсекает уже уникальное ограничение.
+
+Вместе с сырыми просмотрами сброс обновляет дневные агрегаты ArticleViewDaily: views увеличивается на число всех
+просмотров статьи за день (включая повторные), unique_ips пересчитывается по строкам ViewCount этого дня. На то же
+число просмотров увеличивается денормализованный счётчик Article.view_count.
+
+Если база недоступна, непереданные просмотры сохраняются в JSON файлы в VIEWCOUNT_SPOOL_DIR, откуда их забирает
+команда flush_viewcounts.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import Counter, OrderedDict, defaultdict
+from datetime import date
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class ViewCountBuffer:
+    """
+    Потокобезопасный буфер просмотров с фоновым сбросом в базу
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = set()
+        self._hits = Counter()
+        self._seen = OrderedDict()
+        self._seen_day = None
+        self._thread = None
+        self._pid = None
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, 'VIEWCOUNT_FLUSH_INTERVAL', 10)
+
+    @property
+    def batch_size(self):
+        return getattr(settings, 'VIEWCOUNT_BATCH_SIZE', 500)
+
+    @property
+    def seen_size(self):
+        return getattr(settings, 'VIEWCOUNT_SEEN_SIZE', 100000)
+
+    @property
+    def spool_dir(self):
+        return Path(getattr(settings, 'VIEWCOUNT_SPOOL_DIR', Path(settings.BASE_DIR) / 'var' / 'viewcounts'))
+
+    def add(self, article_id, ip_address, day=None):
+        """
+        Регистрация просмотра статьи. Не обращается к базе, если включён фоновый сброс (VIEWCOUNT_FLUSH_INTERVAL > 0),
+        иначе просмотр записывается сразу.
+        """
+        day = day or timezone.localdate()
+        key = (article_id, ip_address, day)
+        with self._lock:
+            self._reset_after_fork()
+            if self._seen_day != day:
+                self._seen.clear()
+                self._seen_day = day
+            self._hits[article_id, day] += 1
+            if key in self._seen:
+                self._seen.move_to_end(key)
+            else:
+                self._seen[key] = None
+                self._pending.add(key)
+                if len(self._seen) > self.seen_size:
+                    self._seen.popitem(last=False)
+            overflow = len(self._pending) >= self.batch_size
+        if self.flush_interval <= 0:
+            self.flush()
+            return
+        self._ensure_thread()
+        if overflow:
+            self._wakeup.set()
+
+    def flush(self):
+        """
+        Запись накопленных просмотров в базу. Возвращает количество переданных записей.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, set()
+            hits, self._hits = self._hits, Counter()
+        if not hits:
+            return 0
+        try:
+            self._write(pending, hits)
+        except Exception:
+            logger.exception('Не удалось записать %s просмотров, сохраняем их в %s', sum(hits.values()), self.spool_dir)
+            self._spool(pending, hits)
+            return 0
+        return sum(hits.values())
+
+    def drain_spool(self):
+        """
+        Перенос в базу просмотров, сохранённых в файлы при недоступности базы. Возвращает количество записей.
+        """
+        if not self.spool_dir.exists():
+            return 0
+        total = 0
+        for path in sorted(self.spool_dir.glob('*.json')):
+            # переименование "захватывает" файл, чтобы параллельный запуск команды не прочитал его повторно
+            claimed = path.with_suffix('.draining')
+            try:
+                path.rename(claimed)
+            except OSError:
+                continue
+            with claimed.open(encoding='utf-8') as spool:
+                data = json.load(spool)
+            pending = {(article_id, ip_address, date.fromisoformat(day)) for article_id, ip_address, day in data['views']}
+            hits = Counter({(article_id, date.fromisoformat(day)): count for article_id, day, count in data['hits']})
+            try:
+                self._write(pending, hits)
+            except Exception:
+                claimed.rename(path)
+                raise
+            claimed.unlink()
+            total += sum(hits.values())
+        return total
+
+    def _write(self, pending, hits):
+        from blog_app.models import Article, ArticleViewDaily, ViewCount
+
+        # статья могла быть удалена, пока её просмотры ждали в буфере
+        existing = set(Article.objects.filter(pk__in={article_id for article_id, day in hits})
+                       .values_list('pk', flat=True))
+        pending = [key for key in pending if key[0] in existing]
+        hits = {key: count for key, count in hits.items() if key[0] in existing}
+        views = [ViewCount(article_id=article_id, ip_address=ip_address, viewed_day=day)
+                 for article_id, ip_address, day in pending]
+        with transaction.atomic():
+            ViewCount.objects.bulk_create(views, batch_size=self.batch_size, ignore_conflicts=True)
+            ArticleViewDaily.objects.bulk_create(
+                [ArticleViewDaily(article_id=article_id, day=day) for article_id, day in hits],
+                batch_size=self.batch_size, ignore_conflicts=True)
+            # приращения группируются по дню и величине: обычно это несколько UPDATE, а не по одному на статью
+            by_increment = defaultdict(list)
+            by_day = defaultdict(list)
+            by_article = Counter()
+            for (article_id, day), count in hits.items():
+                by_increment[day, count].append(article_id)
+                by_day[day].append(article_id)
+                by_article[article_id] += count
+            for (day, count), article_ids in by_increment.items():
+                ArticleViewDaily.objects.filter(day=day, article_id__in=article_ids).update(views=F('views') + count)
+            article_increments = defaultdict(list)
+            for article_id, count in by_article.items():
+                article_increments[count].append(article_id)
+            for count, article_ids in article_increments.items():
+                Article.objects.filter(pk__in=article_ids).update(view_count=F('view_count') + count)
+            unique_ips = (ViewCount.objects.filter(article_id=OuterRef('article_id'), viewed_day=OuterRef('day'))
+                          .values('article_id').annotate(total=Count('pk')).values('total'))
+            for day, article_ids in by_day.items():
+                # строк за день может ещё не быть, если сброшены только повторные просмотры (из файла буфера)
+                ArticleViewDaily.objects.filter(day=day, article_id__in=article_ids).update(
+                    unique_ips=Coalesce(Subquery(unique_ips), 0))
+
+    def _spool(self, pending, hits):
+        self.spool_dir.mkdir(parents=True, exist_ok=True)
+        path = self.spool_dir / f'{os.getpid()}-{uuid.uuid4().hex}.json'
+        with path.open('w', encoding='utf-8') as spool:
+            json.dump({
+                'views': [(article_id, ip_address, day.isoformat()) for article_id, ip_address, day in pending],
+                'hits': [(article_id, day.isoformat(), count) for (article_id, day), count in hits.items()],
+            }, spool)
+
+    def _reset_after_fork(self):
+        """
+        После fork (gunicorn --preload) поток родителя в дочернем процессе не существует, а буфер - его копия
+        """
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._pending = set()
+            self._hits = Counter()
+            self._thread = None
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='viewcount-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            finally:
+                # соединения потоковые: закрываем соединение этого потока, чтобы не держать его между сбросами
+                connections.close_all()
+
+
+view_buffer = ViewCountBuffer()
+atexit.register(view_buffer.flush)
@@ -1,26 +1,44 @@
-import random
-
+from django.conf import settings
 from django.contrib import messages
-from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.messages.views import SuccessMessageMixin
-from django.contrib.postgres.search import SearchVector, SearchQuery, SearchRank
-from django.db import models
-from django.db.models import Count
-from django.http import JsonResponse, HttpResponseRedirect
-from django.shortcuts import render, redirect
-from django.urls import reverse_lazy
-from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
+from django.db import models, transaction
+from django.http import JsonResponse, HttpResponseRedirect, Http404, StreamingHttpResponse
+from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.urls import reverse_lazy, reverse
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import urlencode
+from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
 from taggit.models import Tag
 
+from blog_app.analytics import AnalyticsRequestError, parse_period, stream_export
+from blog_app.comment_threads import get_comment_page, get_comment_replies, parse_cursor
 from blog_app.forms import ArticleCreateForm, ArticleUpdateForm, CommentCreateForm, CategoryCreateForm, FilesCreateForm, \
     FilesUpdateForm
+from blog_app.fragments import get_fragment_stats
 from blog_app.mixins import ViewCountMixin
 from blog_app.models import Article, Category, Comment, Documents
-from main_app.mixins import AuthorRequiredMixin
+from blog_app.navigation import get_category_by_slug, subtree_filter
+from blog_app.search import search_articles
+from blog_app.similarity import get_similar_articles
+from blog_app.suggest import suggest_index
+from customeuser_app.summaries import get_profile_summary
+from main_app.mixins import AuthorRequiredMixin, CursorPaginationMixin
 
 
 # Create your views here.
 
+def get_category_or_404(slug):
+    """
+    Категория из закэшированного дерева категорий (blog_app.navigation) или 404
+    """
+    category = get_category_by_slug(slug)
+    if category is None:
+        raise Http404('Категория не найдена')
+    return category
+
+
 class CategoryListView(LoginRequiredMixin, ListView):
     model = Category
 
@@ -34,9 +52,10 @@ class CategoryCreateView(LoginRequiredMixin, CreateView):
     form_class = CategoryCreateForm
 
 
-class ArticleListView(LoginRequiredMixin, SuccessMessageMixin, ListView):
+class ArticleListView(LoginRequiredMixin, SuccessMessageMixin, CursorPaginationMixin, ListView):
     model = Article
     paginate_by = 6
+    cursor_ordering = ('-fixed', '-time_create', '-pk')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -51,15 +70,11 @@ class ArticleDetailView(LoginRequiredMixin, ViewCountMixin, DetailView):
 
     def get_similar_articles(self, obj):
         """
-        Метод get_similar_articles() извлекает список статей, которые имеют общие теги с текущей статьей, и сортирует
-        их по количеству общих тегов. Затем он перемешивает этот список и возвращает первые 6 статей.
+        Метод get_similar_articles() возвращает до 6 похожих статей из заранее построенного индекса SimilarArticle
+        (см. blog_app.similarity) одним запросом. Статьи выбираются случайно с весом, равным оценке похожести, так что
+        более похожие статьи показываются чаще.
         """
-        article_tags_ids = obj.tags.values_list('id', flat=True)
-        similar_articles = Article.objects.filter(tags__in=article_tags_ids).exclude(id=obj.id)
-        similar_articles = similar_articles.annotate(related_tags=Count('tags')).order_by('-related_tags')
-        similar_articles_list = list(similar_articles.all())
-        random.shuffle(similar_articles_list)
-        return similar_articles_list[:6]
+        return get_similar_articles(obj, count=6)
 
     def get_context_data(self, **kwargs):
         """
@@ -72,21 +87,23 @@ class ArticleDetailView(LoginRequiredMixin, ViewCountMixin, DetailView):
         context['category'] = category
         context['form'] = CommentCreateForm
         context['similar_articles'] = self.get_similar_articles(self.object)
+        # ветки комментариев читаются только при промахе кэша фрагмента 'comments' (см. blog_app.fragments)
+        context['comment_page'] = SimpleLazyObject(lambda: get_comment_page(self.object.pk))
         return context
 
 
-class ArticleByCategoryListView(LoginRequiredMixin, SuccessMessageMixin, ListView):
+class ArticleByCategoryListView(LoginRequiredMixin, SuccessMessageMixin, CursorPaginationMixin, ListView):
     model = Article
+    paginate_by = 6
+    cursor_ordering = ('-fixed', '-time_create', '-pk')
     category = None
 
     def get_queryset(self):
-        self.category = Category.objects.get(slug=self.kwargs['slug'])
-        queryset = Article.objects.all().filter(category__slug=self.category.slug)
-        return queryset
+        self.category = get_category_or_404(self.kwargs['slug'])
+        return Article.objects.all().filter(subtree_filter(self.category))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        category = Category.objects.all()
         context['category'] = self.category
         context['title'] = f' - Статьи из категории: {self.category.title}'
         return context
@@ -105,7 +122,11 @@ class ArticleCreateView(LoginRequiredMixin, SuccessMessageMixin, CreateView):
         context['title'] = ' - Добавление статьи на сайт'
         return context
 
+    @transaction.atomic
     def form_valid(self, form):
+        """
+        Статья и её теги сохраняются в одной транзакции, чтобы индекс похожих статей пересчитывался один раз
+        """
         form.instance.author = self.request.user
         form.save()
         return super().form_valid(form)
@@ -125,7 +146,11 @@ class ArticleUpdateView(AuthorRequiredMixin, SuccessMessageMixin, UpdateView):
         context['title'] = f' - Обновление статьи: {self.object.title}'
         return context
 
+    @transaction.atomic
     def form_valid(self, form):
+        """
+        Статья и её теги сохраняются в одной транзакции, чтобы индекс похожих статей пересчитывался один раз
+        """
         form.instance.updater = self.request.user
         form.save()
         return super().form_valid(form)
@@ -147,10 +172,11 @@ class ArticleDeleteView(AuthorRequiredMixin, SuccessMessageMixin, DeleteView):
         return context
 
 
-class ArticleByTagListView(ListView):
+class ArticleByTagListView(CursorPaginationMixin, ListView):
     model = Article
     context_object_name = 'articles'
     paginate_by = 10
+    cursor_ordering = ('-fixed', '-time_create', '-pk')
     tag = None
 
     def get_queryset(self):
@@ -197,15 +223,16 @@ class CommentCreateView(LoginRequiredMixin, SuccessMessageMixin, CreateView):
         comment.save()
 
         if self.is_ajax():
+            profile = get_profile_summary(self.request.user)
             return JsonResponse({
                 'is_child': comment.is_child_node(),
                 'id': comment.id,
                 'author': comment.author.username,
                 'parent_id': comment.parent_id,
                 'time_create': comment.time_create.strftime('%Y-%b-%d %H:%M:%S'),
-                'avatar': comment.author.profile.avatar.url,
+                'avatar': profile['avatar_url'],
                 'content': comment.content,
-                'get_absolute_url': comment.author.profile.get_absolute_url()
+                'get_absolute_url': profile['url']
             }, status=200)
 
         return redirect(comment.article.get_absolute_url())
@@ -214,9 +241,83 @@ class CommentCreateView(LoginRequiredMixin, SuccessMessageMixin, CreateView):
         return JsonResponse({'error': 'Необходимо авторизоваться для добавления комментариев'}, status=400)
 
 
+class CommentThreadView(LoginRequiredMixin, View):
+    """
+    Следующая страница веток обсуждения статьи для AJAX: HTML веток и адрес следующей страницы (next_url) или null.
+    Страницы листаются по курсору cursor - tree_id последней показанной ветки (см. blog_app.comment_threads).
+    """
+
+    def get(self, request, pk):
+        if not Article.objects.all().filter(pk=pk).exists():
+            raise Http404('Статья не найдена')
+        page = get_comment_page(pk, parse_cursor(request.GET.get('cursor')))
+        next_url = None
+        if page.has_next:
+            next_url = f"{reverse('blog_app:comment_threads', args=[pk])}?{urlencode({'cursor': page.next_cursor})}"
+        html = render_to_string('blog_app/comment_nodes.html', {'nodes': page.nodes}, request=request)
+        return JsonResponse({'html': html, 'next_url': next_url})
+
+    def handle_no_permission(self):
+        return JsonResponse({'error': 'Необходимо авторизоваться для просмотра комментариев'}, status=403)
+
+
+class CommentRepliesView(LoginRequiredMixin, View):
+    """
+    Все ответы на комментарий для AJAX одним запросом по интервалу lft его поддерева
+    """
+
+    def get(self, request, pk):
+        comment = get_object_or_404(Comment, pk=pk, article__status='published')
+        html = render_to_string('blog_app/comment_nodes.html', {'nodes': get_comment_replies(comment)},
+                                request=request)
+        return JsonResponse({'html': html})
+
+    def handle_no_permission(self):
+        return JsonResponse({'error': 'Необходимо авторизоваться для просмотра комментариев'}, status=403)
+
+
+class ArticleFragmentStatsView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Попадания и промахи кэша фрагментов страницы статьи в формате JSON для мониторинга (только для персонала)
+    """
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request):
+        return JsonResponse({'fragments': get_fragment_stats()})
+
+
+class ViewAnalyticsExportView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Потоковая выгрузка статистики просмотров для персонала (см. blog_app.analytics). Параметры: group - article,
+    day или ip; format - csv или ndjson; date_from и date_to - период в формате ГГГГ-ММ-ДД; article - id статьи.
+    """
+    content_types = {'csv': 'text/csv; charset=utf-8', 'ndjson': 'application/x-ndjson; charset=utf-8'}
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request):
+        group = request.GET.get('group', 'day')
+        output_format = request.GET.get('format', 'csv')
+        try:
+            start, end = parse_period(request.GET.get('date_from'), request.GET.get('date_to'))
+            article_id = int(request.GET['article']) if request.GET.get('article') else None
+            rows = stream_export(group, output_format, start, end, article_id)
+        except (AnalyticsRequestError, ValueError) as error:
+            return JsonResponse({'error': str(error)}, status=400)
+        response = StreamingHttpResponse(rows, content_type=self.content_types[output_format])
+        filename = f'views-{group}-{start:%Y%m%d}-{end:%Y%m%d}.{output_format}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
 class ArticleSearchResultView(LoginRequiredMixin, ListView):
     """
     Реализация поиска статей на сайте
+    Поиск выполняет движок из blog_app.search (PostgreSQL или SQLite FTS5), страницы результатов строятся без
+    подсчёта общего количества найденных статей.
     """
     model = Article
     context_object_name = 'articles'
@@ -224,22 +325,44 @@ class ArticleSearchResultView(LoginRequiredMixin, ListView):
     allow_empty = True
 
     def get_queryset(self):
-        query = self.request.GET.get('do')
-        search_vector = SearchVector('full_description', weight='B') + SearchVector('title', weight='A')
-        search_query = SearchQuery(query)
-        return (
-            self.model.objects.annotate(rank=SearchRank(search_vector, search_query)).filter(rank__gte=0.3).order_by(
-                '-rank'))
+        return Article.objects.none()
+
+    def paginate_queryset(self, queryset, page_size):
+        page = search_articles(self.request.GET.get('do'), self.request.GET.get(self.page_kwarg), page_size)
+        return page.paginator, page, page.object_list, page.has_other_pages()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = f' - Результаты поиска: {self.request.GET.get("do")}'
+        context['s'] = f'{urlencode({"do": self.request.GET.get("do", "")})}&'
         return context
 
 
-class FilesListView(LoginRequiredMixin, SuccessMessageMixin, ListView):
+class ArticleSuggestView(LoginRequiredMixin, View):
+    """
+    Подсказки для строки поиска в формате JSON: заголовки статей, теги и категории, начинающиеся с введённого текста.
+    Ответ строится из индекса в памяти (blog_app.suggest) без запросов к базе. Параметры: q - введённый текст,
+    limit - количество подсказок (не больше SUGGEST_MAX_LIMIT), fuzzy=1 - учитывать опечатки.
+    """
+
+    def get(self, request, *args, **kwargs):
+        query = request.GET.get('q', '')
+        try:
+            limit = int(request.GET.get('limit', 10))
+        except ValueError:
+            return JsonResponse({'error': 'Неверное количество подсказок'}, status=400)
+        limit = max(1, min(limit, getattr(settings, 'SUGGEST_MAX_LIMIT', 20)))
+        fuzzy = request.GET.get('fuzzy') in ('1', 'true')
+        return JsonResponse({'query': query, 'results': suggest_index.suggest(query, limit, fuzzy)})
+
+    def handle_no_permission(self):
+        return JsonResponse({'error': 'Необходимо авторизоваться для поиска'}, status=403)
+
+
+class FilesListView(LoginRequiredMixin, SuccessMessageMixin, CursorPaginationMixin, ListView):
     model = Documents
     paginate_by = 25
+    cursor_ordering = ('-time_create', '-pk')
     allow_empty = True
 
     def get_queryset(self):
@@ -263,18 +386,18 @@ class FilesUpdateView(LoginRequiredMixin, SuccessMessageMixin, UpdateView):
     success_message = 'Запись была успешно обновлена'
 
 
-class FilesByCategoryListView(LoginRequiredMixin, SuccessMessageMixin, ListView):
+class FilesByCategoryListView(LoginRequiredMixin, SuccessMessageMixin, CursorPaginationMixin, ListView):
     model = Documents
+    paginate_by = 25
+    cursor_ordering = ('-time_create', '-pk')
     category = None
 
     def get_queryset(self):
-        self.category = Category.objects.get(slug=self.kwargs['slug'])
-        queryset = Documents.objects.all().filter(category__slug=self.category.slug)
-        return queryset
+        self.category = get_category_or_404(self.kwargs['slug'])
+        return Documents.objects.all().filter(subtree_filter(self.category))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        category = Category.objects.all()
         context['category'] = self.category
         context['title'] = f' - Файлы из категории: {self.category.title}'
         return context
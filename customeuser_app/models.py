@@ -1,11 +1,12 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import FileExtensionValidator
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.urls import reverse
 
-from reqsoft.utils import unique_slugify
+from customeuser_app.summaries import invalidate_profile_summary
+from reqsoft.utils import save_with_unique_slug
 
 # Create your models here.
 User = get_user_model()
@@ -33,13 +34,31 @@ class Profile(models.Model):
         verbose_name = 'Профиль'
         verbose_name_plural = 'Профили'
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_values = instance.get_field_values()
+        return instance
+
+    def get_field_values(self):
+        return {field.attname: field.get_prep_value(getattr(self, field.attname))
+                for field in self._meta.concrete_fields}
+
+    def has_changes(self):
+        """
+        Изменены ли поля после загрузки из базы или последнего сохранения
+        """
+        return getattr(self, '_saved_values', None) != self.get_field_values()
+
     def save(self, *args, **kwargs):
         """
         Сохранение полей модели при их отсутствии заполнения
         """
         if not self.slug:
-            self.slug = unique_slugify(self, self.user)
-        super().save(*args, **kwargs)
+            save_with_unique_slug(self, self.user, lambda: super(Profile, self).save(*args, **kwargs))
+        else:
+            super().save(*args, **kwargs)
+        self._saved_values = self.get_field_values()
 
     def __str__(self):
         """
@@ -67,5 +86,18 @@ def create_user_profile(sender, instance, created, **kwargs):
 
 
 @receiver(post_save, sender=User)
-def save_user_profile(sender, instance, **kwargs):
-    instance.profile.save()
+def save_user_profile(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Сохранение профиля, изменённого через пользователя (user.profile.bio = ...; user.save()). Если профиль не
+    загружался или не менялся, запрос не выполняется: пользователь сохраняется, например, при каждом входе.
+    """
+    if not created and User.profile.is_cached(instance) and instance.profile.has_changes():
+        instance.profile.save()
+    if update_fields is None or not set(update_fields) <= {'last_login'}:
+        invalidate_profile_summary(instance.pk)
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def invalidate_profile(sender, instance, **kwargs):
+    invalidate_profile_summary(instance.user_id)
@@ -0,0 +1,176 @@
+"""
+Подключение двухфакторной авторизации: QR код с адресом otpauth:// для приложения-аутентификатора.
+
+QR код строится в памяти (SVG или PNG) и хранится OTP_QR_CACHE_TIMEOUT секунд отдельно для каждого пользователя,
+поэтому повторные открытия страницы настроек не строят его заново. В коде содержится секрет пользователя, поэтому он
+хранится только в кэше памяти процесса (qr_cache), а не в кэшах settings.CACHES, которые могут быть файловыми или
+сетевыми: на диск и в общий кэш секрет не попадает. Отдаёт код только представление OTPQRCodeView владельцу аккаунта.
+
+Проверка кода (verify_otp) защищена от перебора и повторного использования без обращений к базе:
+
+* попытки считаются в кэше ratelimit ограничителями со скользящим окном отдельно по имени пользователя и по IP-адресу
+  (OTP_RATE_LIMITS); попытка сначала учитывается, и при превышении отклоняется до проверки кода;
+* принятый код запоминается в кэше по паре (пользователь, временной шаг) и второй раз не принимается;
+* допустимое расхождение часов задаётся количеством соседних шагов OTP_VALID_WINDOW.
+"""
+import hashlib
+import io
+import time
+
+import pyotp
+from django.conf import settings
+from django.core.cache.backends.locmem import LocMemCache
+
+from customeuser_app.utils import get_client_ip, return_secret_key
+from reqsoft.cache import get_cache
+
+ISSUER_NAME = 'REQSOFT_App'
+QR_CACHE_KEY = 'customeuser_app:otp_qr:{user_id}:{image_format}:{digest}'
+QR_FORMATS = {'svg': 'image/svg+xml', 'png': 'image/png'}
+RATE_LIMIT_KEY = 'customeuser_app:otp_attempts:{scope}:{identifier}:{window}'
+USED_CODE_KEY = 'customeuser_app:otp_used:{user}:{timecode}'
+
+ACCEPTED = 'accepted'
+INVALID = 'invalid'
+REPLAYED = 'replayed'
+LIMITED = 'limited'
+
+
+# кэш памяти процесса, который нельзя перенастроить на файловое или сетевое хранилище
+qr_cache = LocMemCache('customeuser_app-otp-qr', {'OPTIONS': {'MAX_ENTRIES': 1000}})
+
+
+def get_qr_cache_timeout():
+    return getattr(settings, 'OTP_QR_CACHE_TIMEOUT', 300)
+
+
+def provisioning_uri(user):
+    return pyotp.TOTP(return_secret_key(user)).provisioning_uri(name=str(user), issuer_name=ISSUER_NAME)
+
+
+def render_qr(uri, image_format='svg'):
+    """
+    Изображение QR кода в байтах. SVG строится без Pillow и заметно быстрее PNG.
+    """
+    import qrcode
+    import qrcode.image.svg
+
+    if image_format == 'svg':
+        return qrcode.make(uri, image_factory=qrcode.image.svg.SvgPathImage).to_string()
+    buffer = io.BytesIO()
+    qrcode.make(uri).save(buffer)
+    return buffer.getvalue()
+
+
+def get_qr(user, image_format='svg'):
+    """
+    QR код пользователя из кэша памяти процесса; при промахе строится и кэшируется. Ключ включает хэш адреса otpauth://, поэтому
+    после смены имени пользователя (и секрета) старый код не отдаётся.
+    """
+    uri = provisioning_uri(user)
+    digest = hashlib.sha256(uri.encode()).hexdigest()[:16]
+    key = QR_CACHE_KEY.format(user_id=user.pk, image_format=image_format, digest=digest)
+    image = qr_cache.get(key)
+    if image is None:
+        image = render_qr(uri, image_format)
+        qr_cache.set(key, image, get_qr_cache_timeout())
+    return image
+
+
+class SlidingWindowRateLimit:
+    """
+    Ограничение количества попыток limit за period секунд по идентификатору (имени пользователя, IP-адресу).
+
+    Скользящее окно приближается двумя счётчиками фиксированных окон: текущего и предыдущего, взятого с весом
+    непрошедшей части окна. Попытка сначала учитывается (incr), а решение принимается по значению, которое вернул
+    incr: параллельные запросы получают разные значения счётчика и не могут все пройти проверку до его увеличения.
+    """
+
+    def __init__(self, scope, limit, period):
+        self.scope = scope
+        self.limit = limit
+        self.period = period
+
+    @property
+    def cache(self):
+        return get_cache('ratelimit')
+
+    def get_key(self, identifier, window):
+        identifier = hashlib.sha256(str(identifier).encode()).hexdigest()[:32]
+        return RATE_LIMIT_KEY.format(scope=self.scope, identifier=identifier, window=window)
+
+    def get_windows(self, now=None):
+        position = (time.time() if now is None else now) / self.period
+        window = int(position)
+        return window, position - window
+
+    def hit(self, identifier, now=None):
+        """
+        Учёт попытки; возвращает True, если вместе с ней попыток за скользящее окно больше limit
+        """
+        window, elapsed = self.get_windows(now)
+        key = self.get_key(identifier, window)
+        # счётчик нужен, пока окно остаётся текущим или предыдущим
+        self.cache.add(key, 0, self.period * 2)
+        try:
+            current = self.cache.incr(key)
+        except ValueError:
+            # счётчик вытеснен между add и incr
+            self.cache.set(key, 1, self.period * 2)
+            current = 1
+        previous = self.cache.get(self.get_key(identifier, window - 1), 0)
+        return current + previous * (1 - elapsed) > self.limit
+
+    def reset(self, identifier, now=None):
+        window, _ = self.get_windows(now)
+        self.cache.delete_many([self.get_key(identifier, window), self.get_key(identifier, window - 1)])
+
+
+def get_rate_limits():
+    """
+    Ограничители попыток: {'username': ..., 'ip': ...} из OTP_RATE_LIMITS (scope -> (limit, period))
+    """
+    limits = getattr(settings, 'OTP_RATE_LIMITS', {'username': (5, 300), 'ip': (20, 300)})
+    return {scope: SlidingWindowRateLimit(scope, limit, period) for scope, (limit, period) in limits.items()}
+
+
+def get_valid_window():
+    return getattr(settings, 'OTP_VALID_WINDOW', 1)
+
+
+def match_timecode(totp, code, now=None, valid_window=None):
+    """
+    Временной шаг, которому соответствует код, с учётом расхождения часов на valid_window шагов; None - код неверен
+    """
+    now = int(time.time() if now is None else now)
+    valid_window = get_valid_window() if valid_window is None else valid_window
+    timecode = now // totp.interval
+    for offset in range(-valid_window, valid_window + 1):
+        if pyotp.utils.strings_equal(str(code), totp.at(now, offset)):
+            return timecode + offset
+    return None
+
+
+def verify_otp(request, username, secret, code, now=None):
+    """
+    Проверка одноразового кода code пользователя username с секретом secret. Возвращает ACCEPTED, INVALID,
+    REPLAYED или LIMITED (попытка отклонена ограничителем без проверки кода). Обращений к базе нет.
+    """
+    identifiers = {'username': username, 'ip': get_client_ip(request)}
+    limits = get_rate_limits()
+    # попытка учитывается всеми ограничителями, даже если её уже отклонил первый
+    limited = [limit.hit(identifiers[scope], now) for scope, limit in limits.items()]
+    if any(limited):
+        return LIMITED
+
+    totp = pyotp.TOTP(secret)
+    timecode = match_timecode(totp, str(code).strip(), now)
+    if timecode is None:
+        return INVALID
+    # код нужно помнить, пока его шаг попадает в окно допустимого расхождения
+    key = USED_CODE_KEY.format(user=hashlib.sha256(username.encode()).hexdigest()[:32], timecode=timecode)
+    if not get_cache('ratelimit').add(key, 1, totp.interval * (2 * get_valid_window() + 2)):
+        return REPLAYED
+    if 'username' in limits:
+        limits['username'].reset(username, now)
+    return ACCEPTED
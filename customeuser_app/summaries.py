@@ -0,0 +1,69 @@
+"""
+Краткие сведения о профилях пользователей для шапки сайта и комментариев.
+
+Сводка профиля (имя, slug, ссылка на профиль, адрес аватара) хранится в кэше по id пользователя
+PROFILE_SUMMARY_CACHE_TIMEOUT секунд, поэтому для вывода автора не нужно читать User и Profile. Сводка удаляется
+из кэша при изменении профиля или пользователя (обработчики в customeuser_app.models).
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+
+PROFILE_SUMMARY_KEY = 'customeuser_app:profile_summary:{user_id}'
+
+
+def get_cache_timeout():
+    return getattr(settings, 'PROFILE_SUMMARY_CACHE_TIMEOUT', 3600)
+
+
+def build_summary(profile):
+    user = profile.user
+    return {
+        'user_id': user.pk,
+        'username': user.username,
+        'display_name': user.get_full_name() or user.username,
+        'profile_id': profile.pk,
+        'slug': profile.slug,
+        'url': profile.get_absolute_url(),
+        'avatar_url': profile.get_avatar,
+    }
+
+
+def get_profile_summaries(user_ids):
+    """
+    Сводки профилей {user_id: сводка}: из кэша одним get_many, недостающие - одним запросом. Пользователи без
+    профиля в результат не попадают.
+    """
+    from customeuser_app.models import Profile
+
+    keys = {PROFILE_SUMMARY_KEY.format(user_id=user_id): user_id for user_id in set(user_ids)}
+    summaries = {keys[key]: summary for key, summary in cache.get_many(keys).items()}
+    missing = [user_id for user_id in keys.values() if user_id not in summaries]
+    if missing:
+        found = {profile.user_id: build_summary(profile)
+                 for profile in Profile.objects.filter(user_id__in=missing).select_related('user')}
+        cache.set_many({PROFILE_SUMMARY_KEY.format(user_id=user_id): summary for user_id, summary in found.items()},
+                       get_cache_timeout())
+        summaries.update(found)
+    return summaries
+
+
+def get_profile_summary(user):
+    """
+    Сводка профиля пользователя (или id пользователя); None, если профиля нет. Если профиль пользователя уже
+    загружен вместе с ним (см. customeuser_app.backends), сводка строится без запроса.
+    """
+    user_id = getattr(user, 'pk', user)
+    summary = cache.get(PROFILE_SUMMARY_KEY.format(user_id=user_id))
+    if summary is None:
+        User = get_user_model()
+        if isinstance(user, User) and User.profile.is_cached(user):
+            summary = build_summary(user.profile)
+            cache.set(PROFILE_SUMMARY_KEY.format(user_id=user_id), summary, get_cache_timeout())
+        else:
+            summary = get_profile_summaries([user_id]).get(user_id)
+    return summary
+
+
+def invalidate_profile_summary(user_id):
+    cache.delete(PROFILE_SUMMARY_KEY.format(user_id=user_id))
@@ -0,0 +1,19 @@
+from django import template
+
+from customeuser_app.summaries import get_profile_summary
+from reqsoft.querybudget import query_budget
+
+register = template.Library()
+
+
+@register.simple_tag
+@query_budget('profile_tags.profile_summary')
+def profile_summary(user):
+    """
+    Сводка профиля пользователя из кэша (customeuser_app.summaries):
+
+        {% profile_summary request.user as profile %}<a href="{{ profile.url }}">{{ profile.display_name }}</a>
+    """
+    if not getattr(user, 'is_authenticated', False):
+        return None
+    return get_profile_summary(user)
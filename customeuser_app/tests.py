@@ -1,3 +1,70 @@
-from django.test import TestCase
+import pyotp
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
 
-# Create your tests here.
+from customeuser_app.otp import ACCEPTED, INVALID, LIMITED, REPLAYED, qr_cache, verify_otp
+from reqsoft.cache_config import cache_config
+
+User = get_user_model()
+
+
+@override_settings(SUGGEST_INDEX_WARMUP=False, IMAGE_DERIVATIVES_ASYNC=False)
+class OTPQRCodeTests(TestCase):
+    """
+    QR код с секретом отдаётся только владельцу аккаунта и не сохраняется в кэшах браузера и прокси
+    """
+
+    def setUp(self):
+        qr_cache.clear()
+
+    def test_login_required(self):
+        response = self.client.get(reverse('customeuser_app:otp_qrcode'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('customeuser_app:login'), response['Location'])
+
+    def test_no_store(self):
+        self.client.force_login(User.objects.create_user('owner'))
+        response = self.client.get(reverse('customeuser_app:otp_qrcode'), {'format': 'png'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+
+
+@override_settings(CACHES={'default': cache_config('locmem://', 'default'),
+                           'ratelimit': cache_config('locmem://', 'ratelimit')},
+                   OTP_RATE_LIMITS={'username': (3, 300), 'ip': (100, 300)}, OTP_VALID_WINDOW=1)
+class VerifyOTPTests(SimpleTestCase):
+    """
+    Проверка одноразового кода: ограничение попыток, повторное использование кода и расхождение часов
+    """
+    now = 1_700_000_010
+
+    def setUp(self):
+        caches['ratelimit'].clear()
+        self.secret = pyotp.random_base32()
+        self.totp = pyotp.TOTP(self.secret)
+        self.request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.1')
+
+    def verify(self, code, now=None):
+        return verify_otp(self.request, 'owner', self.secret, code, now=self.now if now is None else now)
+
+    def wrong_code(self):
+        return str((int(self.totp.at(self.now)) + 1) % 1_000_000).zfill(6)
+
+    def test_limited_after_failures(self):
+        for _ in range(3):
+            self.assertEqual(self.verify(self.wrong_code()), INVALID)
+        self.assertEqual(self.verify(self.totp.at(self.now)), LIMITED)
+
+    def test_replayed_code(self):
+        code = self.totp.at(self.now)
+        self.assertEqual(self.verify(code), ACCEPTED)
+        self.assertEqual(self.verify(code), REPLAYED)
+
+    def test_valid_window(self):
+        self.assertEqual(self.verify(self.totp.at(self.now - self.totp.interval)), ACCEPTED)
+        self.assertEqual(self.verify(self.totp.at(self.now + self.totp.interval)), ACCEPTED)
+        self.assertEqual(self.verify(self.totp.at(self.now - 3 * self.totp.interval)), INVALID)
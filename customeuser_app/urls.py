@@ -1,7 +1,7 @@
 from django.contrib.auth.views import LogoutView
 from django.urls import path
 from .views import ProfileUpdateView, ProfileDetailView, UserLoginView, UserLogoutView, UserPasswordChangeView, \
-    otp_compare, OTPUser
+    otp_compare, OTPUser, OTPQRCodeView
 
 app_name = 'customeuser_app'
 
@@ -12,5 +12,6 @@ urlpatterns = [
     path('logout/', LogoutView.as_view(), name='logout'),
     path('password-change/', UserPasswordChangeView.as_view(), name='password_change'),
     path('otp/', otp_compare, name='otp'),
-    path('user/<int:pk>/otp/', OTPUser.as_view(), name='otp_active')
+    path('user/<int:pk>/otp/', OTPUser.as_view(), name='otp_active'),
+    path('user/otp/qrcode/', OTPQRCodeView.as_view(), name='otp_qrcode'),
 ]
@@ -1,20 +1,20 @@
-import pyotp
-import qrcode
 from django.contrib import auth
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
 from django.contrib.auth.views import LoginView, LogoutView, PasswordChangeView
 from django.contrib.messages.views import SuccessMessageMixin
 from django.db import transaction
-from django.http import HttpResponseRedirect
+from django.http import Http404, HttpResponse, HttpResponseRedirect
 from django.shortcuts import get_object_or_404, render, redirect
 from django.urls import reverse_lazy
+from django.utils.cache import add_never_cache_headers, patch_cache_control, patch_vary_headers
+from django.views import View
 from django.views.generic import UpdateView, DetailView
 
 from customeuser_app.forms import ProfileUpdateForm, UserUpdateForm, UserLoginForm, UserPasswordChangeForm, OTPUserForm
 from customeuser_app.models import Profile
+from customeuser_app.otp import ACCEPTED, INVALID, LIMITED, QR_FORMATS, REPLAYED, get_qr, verify_otp
 from customeuser_app.utils import return_secret_key, send_otp
-from reqsoft.settings import MEDIA_URL, MEDIA_ROOT
 
 
 # Create your views here.
@@ -83,7 +83,11 @@ class UserLoginView(SuccessMessageMixin, LoginView):
 
     def form_valid(self, form):
         user = form.get_user()
-        profile = get_object_or_404(Profile, user=user)
+        # профиль загружен вместе с пользователем (customeuser_app.backends)
+        try:
+            profile = user.profile
+        except Profile.DoesNotExist:
+            raise Http404('Профиль пользователя не найден')
         if profile.otp:
             self.request.session['username'] = user.username
             send_otp(self.request)
@@ -120,26 +124,32 @@ class UserLogoutView(SuccessMessageMixin, LogoutView):
     success_message = 'Вы вышли из аккаунта!'
 
 
+OTP_ERRORS = {
+    INVALID: 'Неправильный код',
+    REPLAYED: 'Этот код уже использован, дождитесь следующего',
+    LIMITED: 'Слишком много попыток, повторите позже',
+}
+
+
 def otp_compare(request):
     error_message = None
+    status = 200
     if request.method == 'POST':
-        otp = request.POST['otp']
-        username = request.session['username']
-        otp_secret_key = request.session['otp_secret_key']
-        if otp_secret_key is not None:
-            totp = pyotp.TOTP(otp_secret_key)
-            if totp.verify(otp):
-                user_obj = get_object_or_404(User, username=username)
-                auth.login(request, user_obj)
-                del request.session['otp_secret_key']
-                return HttpResponseRedirect(reverse_lazy('customeuser_app:profile_detail', args=(user_obj.pk,)))
-            else:
-                pass
-        else:
-            pass
-    else:
-        pass
-    return render(request, 'customeuser_app/otp.html')
+        username = request.session.get('username')
+        otp_secret_key = request.session.get('otp_secret_key')
+        if username is None or otp_secret_key is None:
+            return redirect('customeuser_app:login')
+        # ограничение попыток и проверка кода выполняются по кэшу и сессии, база нужна только для входа
+        result = verify_otp(request, username, otp_secret_key, request.POST.get('otp', ''))
+        if result == ACCEPTED:
+            user_obj = get_object_or_404(User, username=username)
+            auth.login(request, user_obj)
+            del request.session['otp_secret_key']
+            return HttpResponseRedirect(reverse_lazy('customeuser_app:profile_detail', args=(user_obj.pk,)))
+        error_message = OTP_ERRORS[result]
+        if result == LIMITED:
+            status = 429
+    return render(request, 'customeuser_app/otp.html', {'error_message': error_message}, status=status)
 
 
 class OTPUser(LoginRequiredMixin, UpdateView):
@@ -147,30 +157,22 @@ class OTPUser(LoginRequiredMixin, UpdateView):
     form_class = OTPUserForm
     template_name = 'customeuser_app/otp_active.html'
 
-    def get_context_data(self, **kwargs):
-        context = super(OTPUser, self).get_context_data(**kwargs)
-        user_obj = self.get_object()
-        key = return_secret_key(user_obj.user)
-        totp = pyotp.TOTP(key)
-        # print(totp.now())
-        uri = pyotp.totp.TOTP(key).provisioning_uri(name=str(user_obj.user), issuer_name='REQSOFT_App')
-        qrcode.make(uri).save(f'{MEDIA_ROOT}/{key}.png')
-        context['qrcode'] = f'{MEDIA_URL}{key}.png'
-        return context
+    def get_queryset(self):
+        # QR код содержит секрет, поэтому страница доступна только для своего профиля
+        return Profile.objects.filter(user=self.request.user)
 
     def form_valid(self, form):
         user = self.get_object()
         key = return_secret_key(user.user)
-        totp = pyotp.TOTP(key)
 
         otp = form.cleaned_data['otp_code']
-        if otp == totp.now():
+        result = verify_otp(self.request, user.user.username, key, otp)
+        if result == ACCEPTED:
             user.otp = False if user.otp else True
             user.save()
             return HttpResponseRedirect(reverse_lazy('customeuser_app:profile_detail', args=(user.pk,)))
         else:
-            # print(totp.now(), user)
-            form.add_error('otp', 'Неправильный код')
+            form.add_error('otp', OTP_ERRORS[result])
             return self.form_invalid(form)
         return super(OTPUser, self).form_valid(form)
 
@@ -178,3 +180,20 @@ class OTPUser(LoginRequiredMixin, UpdateView):
     #     kwargs = super().get_form_kwargs()
     #     kwargs['user'] = self.request.user
     #     return kwargs
+
+
+class OTPQRCodeView(LoginRequiredMixin, View):
+    """
+    QR код для подключения приложения-аутентификатора текущего пользователя (?format=svg|png). Изображение
+    содержит секрет, поэтому ответ запрещено сохранять в каких-либо кэшах.
+    """
+
+    def get(self, request, *args, **kwargs):
+        image_format = request.GET.get('format', 'svg')
+        if image_format not in QR_FORMATS:
+            image_format = 'svg'
+        response = HttpResponse(get_qr(request.user, image_format), content_type=QR_FORMATS[image_format])
+        add_never_cache_headers(response)
+        patch_cache_control(response, private=True)
+        patch_vary_headers(response, ('Cookie',))
+        return response
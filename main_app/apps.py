@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class MainAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main_app'
+
+    def ready(self):
+        """
+        Подключение генерации уменьшенных копий изображений (main_app.images)
+        """
+        from .signals import connect_image_derivatives
+
+        connect_image_derivatives()
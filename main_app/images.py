@@ -0,0 +1,243 @@
+"""
+Уменьшенные копии загруженных изображений (превью статей и файлов, аватары).
+
+Для каждого оригинала рядом с ним сохраняются копии фиксированной ширины IMAGE_DERIVATIVE_WIDTHS в форматах
+IMAGE_DERIVATIVE_FORMATS (имя вида <имя>__640w.webp) и манифест <имя>__derivatives.json с хэшем содержимого,
+размером и временем изменения оригинала и списком копий. Повторная генерация для того же содержимого ничего не делает, поэтому её можно безопасно
+запускать сколько угодно раз.
+
+Генерация выполняется в пуле потоков после фиксации транзакции, сохранившей модель (сигналы подключаются в
+main_app.apps для полей IMAGE_DERIVATIVE_FIELDS), или командой build_image_derivatives для уже загруженных файлов.
+Манифест кэшируется на IMAGE_MANIFEST_TIMEOUT секунд, поэтому теги шаблонов (main_app.templatetags.image_tags) не
+обращаются к хранилищу на каждом запросе; если копий ещё нет, выводится оригинал, а генерация ставится в очередь.
+"""
+import hashlib
+import io
+import json
+import logging
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_KEY = 'main_app:image_derivatives:{name}'
+# в кэше хранится и отсутствие манифеста, чтобы не проверять хранилище на каждом запросе
+MISSING = 'missing'
+# отсутствие самого оригинала (например, стандартный аватар не загружен в хранилище) запоминается надолго
+SOURCE_MISSING = 'source-missing'
+SOURCE_MISSING_TIMEOUT = 3600
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+
+def get_manifest_timeout():
+    return getattr(settings, 'IMAGE_MANIFEST_TIMEOUT', 24 * 3600)
+
+
+def get_widths():
+    return tuple(getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', (320, 640, 1024)))
+
+
+def get_formats():
+    return tuple(getattr(settings, 'IMAGE_DERIVATIVE_FORMATS', ('webp', 'jpeg')))
+
+
+def derivative_name(name, width, image_format):
+    root, _ = posixpath.splitext(name)
+    return f'{root}__{width}w.{EXTENSIONS[image_format]}'
+
+
+def manifest_name(name):
+    root, _ = posixpath.splitext(name)
+    return f'{root}__derivatives.json'
+
+
+def read_manifest(name, storage=default_storage):
+    try:
+        with storage.open(manifest_name(name)) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def source_signature(name, storage=default_storage):
+    """
+    Размер и время изменения оригинала; None, если хранилище их не сообщает
+    """
+    try:
+        return {'size': storage.size(name), 'modified': storage.get_modified_time(name).timestamp()}
+    except (OSError, NotImplementedError):
+        return None
+
+
+def is_current(name, manifest, storage=default_storage):
+    """
+    Построен ли манифест для текущего содержимого оригинала (по размеру и времени изменения)
+    """
+    signature = source_signature(name, storage)
+    return signature is not None and all(manifest.get(field) == value for field, value in signature.items())
+
+
+_reported_missing = set()
+
+
+def report_missing_source(name):
+    """
+    Предупреждение об отсутствующем оригинале - один раз за время работы процесса для каждого имени
+    """
+    if name not in _reported_missing:
+        _reported_missing.add(name)
+        logger.warning('Изображение %s не найдено', name)
+
+
+def get_manifest(name):
+    """
+    Манифест копий изображения из кэша или хранилища; None, если копий ещё нет. Если манифеста нет и в хранилище,
+    генерация ставится в очередь, а отсутствие запоминается на минуту, чтобы не проверять хранилище на каждом запросе.
+    Если нет и самого оригинала, генерация не ставится в очередь, а отсутствие запоминается на час.
+    """
+    key = MANIFEST_KEY.format(name=name)
+    manifest = cache.get(key)
+    if manifest is None:
+        manifest = read_manifest(name)
+        if manifest is None:
+            if not default_storage.exists(name):
+                report_missing_source(name)
+                cache.set(key, SOURCE_MISSING, SOURCE_MISSING_TIMEOUT)
+                return None
+            cache.set(key, MISSING, 60)
+            derivative_queue.submit(name)
+            return None
+        cache.set(key, manifest, get_manifest_timeout())
+    return manifest if isinstance(manifest, dict) else None
+
+
+def render_variant(image, width, image_format):
+    from PIL import Image
+
+    variant = image.copy()
+    variant.thumbnail((width, width * 10), Image.LANCZOS)
+    if image_format == 'jpeg' and variant.mode not in ('RGB', 'L'):
+        background = Image.new('RGB', variant.size, (255, 255, 255))
+        variant = variant.convert('RGBA')
+        background.paste(variant, mask=variant.getchannel('A'))
+        variant = background
+    buffer = io.BytesIO()
+    quality = getattr(settings, 'IMAGE_DERIVATIVE_QUALITY', 80)
+    if image_format == 'webp':
+        variant.save(buffer, 'WEBP', quality=quality, method=4)
+    else:
+        variant.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def replace_file(storage, name, content):
+    if storage.exists(name):
+        storage.delete(name)
+    return storage.save(name, ContentFile(content))
+
+
+def generate_derivatives(name, storage=default_storage, force=False):
+    """
+    Копии изображения name. Возвращает манифест или None, если файла нет или это не изображение. Если хэш
+    содержимого совпадает с манифестом и все копии на месте, изображение не перекодируется, а в манифесте
+    обновляются только размер и время изменения оригинала.
+    """
+    from PIL import Image, ImageOps, UnidentifiedImageError
+
+    try:
+        with storage.open(name) as file:
+            content = file.read()
+    except OSError:
+        report_missing_source(name)
+        return None
+    digest = hashlib.sha256(content).hexdigest()
+    signature = source_signature(name, storage) or {}
+    manifest = read_manifest(name, storage)
+    if (not force and manifest and manifest.get('hash') == digest
+            and all(storage.exists(variant['name']) for variant in manifest['variants'])):
+        if any(manifest.get(field) != value for field, value in signature.items()):
+            manifest.update(signature)
+            replace_file(storage, manifest_name(name), json.dumps(manifest).encode())
+        cache.set(MANIFEST_KEY.format(name=name), manifest, get_manifest_timeout())
+        return manifest
+
+    try:
+        image = Image.open(io.BytesIO(content))
+        image = ImageOps.exif_transpose(image)
+    except (UnidentifiedImageError, OSError):
+        logger.warning('Файл %s не является изображением', name)
+        return None
+    if image.mode not in ('RGB', 'RGBA', 'L'):
+        image = image.convert('RGBA')
+
+    # копии шире оригинала не делаются, вместо них - копия ширины оригинала
+    widths = sorted({width for width in get_widths() if width < image.width} | {min(image.width, max(get_widths()))})
+    variants = []
+    for width in widths:
+        for image_format in get_formats():
+            saved = replace_file(storage, derivative_name(name, width, image_format),
+                                 render_variant(image, width, image_format))
+            variants.append({'width': width, 'format': image_format, 'name': saved})
+    manifest = {'hash': digest, **signature, 'width': image.width, 'variants': variants}
+    replace_file(storage, manifest_name(name), json.dumps(manifest).encode())
+    cache.set(MANIFEST_KEY.format(name=name), manifest, get_manifest_timeout())
+    return manifest
+
+
+class DerivativeQueue:
+    """
+    Пул потоков генерации копий; одно и то же изображение не ставится в очередь повторно, пока не обработано
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pending = set()
+
+    def get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', 2),
+                    thread_name_prefix='image-derivatives')
+            return self._executor
+
+    def submit(self, name):
+        if not getattr(settings, 'IMAGE_DERIVATIVES_ASYNC', True):
+            self.run(name)
+            return
+        with self._lock:
+            if name in self._pending:
+                return
+            self._pending.add(name)
+        self.get_executor().submit(self.run, name)
+
+    def run(self, name):
+        try:
+            generate_derivatives(name)
+        except Exception:
+            logger.exception('Не удалось построить копии изображения %s', name)
+        finally:
+            with self._lock:
+                self._pending.discard(name)
+
+
+derivative_queue = DerivativeQueue()
+
+
+def schedule_derivatives(name):
+    """
+    Постановка изображения в очередь после загрузки, если его копии ещё не построены или построены для прежнего
+    содержимого файла с тем же именем
+    """
+    if not name:
+        return
+    manifest = cache.get(MANIFEST_KEY.format(name=name))
+    if not isinstance(manifest, dict) or not is_current(name, manifest):
+        derivative_queue.submit(name)
@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main_app.images import generate_derivatives
+
+
+class Command(BaseCommand):
+    """
+    Построение уменьшенных копий для уже загруженных изображений полей IMAGE_DERIVATIVE_FIELDS (main_app.images).
+    Изображения, копии которых построены из того же содержимого, пропускаются, поэтому команду можно запускать
+    повторно.
+    """
+    help = 'Строит уменьшенные копии загруженных изображений'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help='Количество потоков')
+        parser.add_argument('--force', action='store_true', help='Перестроить копии, даже если файл не изменился')
+
+    def get_names(self):
+        names = set()
+        for path in getattr(settings, 'IMAGE_DERIVATIVE_FIELDS', ()):
+            app_model, field_name = path.rsplit('.', 1)
+            model = apps.get_model(app_model)
+            names.update(model._base_manager.exclude(**{field_name: ''}).exclude(**{f'{field_name}__isnull': True})
+                         .values_list(field_name, flat=True).distinct().iterator())
+        return sorted(names)
+
+    def handle(self, *args, **options):
+        names = self.get_names()
+        self.stdout.write(f'Изображений: {len(names)}')
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            results = list(executor.map(lambda name: generate_derivatives(name, force=options['force']), names))
+        built = sum(result is not None for result in results)
+        self.stdout.write(self.style.SUCCESS(f'Обработано изображений: {built}, пропущено (нет файла): '
+                                             f'{len(names) - built}'))
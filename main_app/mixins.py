@@ -1,7 +1,10 @@
+from django.conf import settings
 from django.contrib.auth.mixins import AccessMixin
 from django.contrib import messages
 from django.shortcuts import redirect
 
+from main_app.pagination import paginate_by_cursor
+
 
 class AuthorRequiredMixin(AccessMixin):
 
@@ -12,4 +15,23 @@ class AuthorRequiredMixin(AccessMixin):
             if request.user != self.get_object().author:
                 messages.info(request, 'Изменение и удаление статьи доступно только автору')
                 return redirect('blog_app:article_list')
-        return super().dispatch(request, *args, **kwargs)
\ No newline at end of file
+        return super().dispatch(request, *args, **kwargs)
+
+
+class CursorPaginationMixin:
+    """
+    Постраничный вывод ListView по курсору (см. main_app.pagination) вместо номера страницы. cursor_ordering - поля
+    сортировки с уникальным последним полем. Режим задаётся настройкой LIST_PAGINATION_MODE: 'cursor' или 'offset'
+    (обычный Paginator с номерами страниц).
+    """
+    cursor_ordering = ('-pk',)
+    cursor_kwarg = 'cursor'
+
+    def get_pagination_mode(self):
+        return getattr(settings, 'LIST_PAGINATION_MODE', 'cursor')
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.get_pagination_mode() != 'cursor':
+            return super().paginate_queryset(queryset, page_size)
+        page = paginate_by_cursor(queryset, page_size, self.cursor_ordering, self.request.GET.get(self.cursor_kwarg))
+        return page.paginator, page, page.object_list, page.has_other_pages()
@@ -0,0 +1,139 @@
+"""
+Постраничный вывод по курсору (keyset pagination).
+
+Вместо номера страницы в ссылке передаётся непрозрачный курсор - значения полей сортировки последней (или первой)
+записи страницы. Следующая страница выбирается условием "строго после курсора" в порядке сортировки, поэтому запрос
+использует индекс по полям сортировки, не делает OFFSET и COUNT(*) и стоит одинаково для любой глубины листания.
+Последнее поле сортировки должно быть уникальным (обычно pk), иначе записи с одинаковыми значениями могут
+потеряться на границе страниц. Повреждённый курсор или курсор, выданный до изменения полей сортировки, не является
+ошибкой: вместо страницы по нему выводится первая страница.
+"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    """
+    Страница, совместимая с шаблоном main_app/paginator.html (is_cursor включает режим ссылок "назад/вперёд")
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def paginator(self):
+        return self
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class CursorPaginator:
+    """
+    ordering - поля сортировки в формате order_by ('-fixed', '-time_create', '-pk'), последнее поле уникально
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+        opts = queryset.model._meta
+        self.fields = [opts.pk if name == 'pk' else opts.get_field(name) for name, _ in self.ordering]
+
+    def encode(self, direction, obj):
+        # value_to_string сохраняет дату со всеми микросекундами, иначе сравнение на границе страниц неточно
+        values = [field.value_to_string(obj) for field in self.fields]
+        data = json.dumps([direction] + values, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            direction, values = data[0], data[1:]
+            values = [field.to_python(value) for field, value in zip(self.fields, values, strict=True)]
+            # в том числе диапазон целых чисел базы: иначе число вне диапазона даёт ошибку уже в запросе
+            for field, value in zip(self.fields, values):
+                if value is not None:
+                    field.run_validators(value)
+        except (ValueError, TypeError, IndexError, KeyError, binascii.Error, ValidationError) as error:
+            raise InvalidCursor from error
+        if direction not in (NEXT, PREVIOUS) or None in values:
+            raise InvalidCursor
+        return direction, values
+
+    def seek(self, values, reverse):
+        """
+        Условие "строго после values" в порядке сортировки (reverse - в обратном порядке): дизъюнкция
+        (a > x) OR (a = x AND b > y) OR ... с учётом направления сортировки каждого поля
+        """
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self.ordering, values):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def order(self, reverse):
+        return [f'-{name}' if descending != reverse else name for name, descending in self.ordering]
+
+    def page(self, cursor=None):
+        """
+        Страница после курсора (или перед ним, если курсор получен ссылкой "назад"); без курсора - первая страница
+        """
+        direction, values = self.decode(cursor) if cursor else (NEXT, None)
+        reverse = direction == PREVIOUS
+        queryset = self.queryset.order_by(*self.order(reverse))
+        if values is not None:
+            queryset = queryset.filter(self.seek(values, reverse))
+        object_list = list(queryset[:self.per_page + 1])
+        has_more = len(object_list) > self.per_page
+        object_list = object_list[:self.per_page]
+        if reverse:
+            object_list.reverse()
+        if not object_list:
+            return CursorPage([], None, None)
+        has_next = has_more if not reverse else True
+        has_previous = values is not None if not reverse else has_more
+        return CursorPage(
+            object_list,
+            self.encode(NEXT, object_list[-1]) if has_next else None,
+            self.encode(PREVIOUS, object_list[0]) if has_previous else None,
+        )
+
+
+def paginate_by_cursor(queryset, per_page, ordering, cursor):
+    """
+    Страница по курсору из параметра запроса; по неверному курсору - первая страница
+    """
+    paginator = CursorPaginator(queryset, per_page, ordering)
+    try:
+        return paginator.page(cursor)
+    except InvalidCursor:
+        return paginator.page()
@@ -0,0 +1,23 @@
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_save
+
+from main_app.images import schedule_derivatives
+
+
+def connect_image_derivatives():
+    """
+    Постановка в очередь генерации уменьшенных копий после сохранения моделей с полями IMAGE_DERIVATIVE_FIELDS
+    ('приложение.Модель.поле'). Генерация начинается после фиксации транзакции, когда файл уже сохранён.
+    """
+    for path in getattr(settings, 'IMAGE_DERIVATIVE_FIELDS', ()):
+        app_model, field_name = path.rsplit('.', 1)
+        model = apps.get_model(app_model)
+
+        def schedule(sender, instance, raw=False, field_name=field_name, **kwargs):
+            image = getattr(instance, field_name)
+            if not raw and image:
+                transaction.on_commit(lambda name=image.name: schedule_derivatives(name))
+
+        post_save.connect(schedule, sender=model, weak=False, dispatch_uid=f'image_derivatives:{path}')
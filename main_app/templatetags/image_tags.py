@@ -0,0 +1,56 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from main_app.images import get_manifest
+
+register = template.Library()
+
+MIME_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+
+def get_srcset(manifest, image_format):
+    return ', '.join(f'{default_storage.url(variant["name"])} {variant["width"]}w'
+                     for variant in manifest['variants'] if variant['format'] == image_format)
+
+
+@register.simple_tag
+def image_srcset(image, image_format='jpeg'):
+    """
+    Значение атрибута srcset из уменьшенных копий изображения (см. main_app.images) или пустая строка,
+    если копий ещё нет
+    """
+    if not image:
+        return ''
+    manifest = get_manifest(image.name)
+    return get_srcset(manifest, image_format) if manifest else ''
+
+
+@register.simple_tag
+def responsive_image(image, sizes='100vw', fallback='', **attrs):
+    """
+    Тег <picture> с WebP и JPEG копиями изображения разной ширины, из которых браузер выбирает подходящую по sizes.
+    Остальные именованные аргументы становятся атрибутами <img>:
+
+        {% responsive_image post.thumbnail sizes='(max-width: 992px) 100vw, 66vw' class='img-fluid' alt=post.title %}
+
+    Пока копии не построены, выводится <img> с оригиналом (генерация при этом ставится в очередь). Без изображения
+    выводится fallback - адрес картинки по умолчанию, если он задан.
+    """
+    attrs.setdefault('alt', '')
+    if not image:
+        return format_html('<img src="{}"{}>', fallback, flatatt(attrs)) if fallback else ''
+    manifest = get_manifest(image.name)
+    jpeg = get_srcset(manifest, 'jpeg') if manifest else ''
+    if not jpeg:
+        return format_html('<img src="{}"{}>', image.url, flatatt(attrs))
+    sources = format_html_join(
+        '', '<source type="{}" srcset="{}" sizes="{}">',
+        ((MIME_TYPES[image_format], srcset, sizes) for image_format in MIME_TYPES
+         if image_format != 'jpeg' and (srcset := get_srcset(manifest, image_format))))
+    largest = max((variant for variant in manifest['variants'] if variant['format'] == 'jpeg'),
+                  key=lambda variant: variant['width'])
+    attrs.setdefault('loading', 'lazy')
+    return format_html('<picture>{}<img src="{}" srcset="{}" sizes="{}"{}></picture>',
+                       sources, default_storage.url(largest['name']), jpeg, sizes, flatatt(attrs))
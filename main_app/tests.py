@@ -1,3 +1,250 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from main_app.images import (MANIFEST_KEY, SOURCE_MISSING, derivative_queue, generate_derivatives, get_manifest,
+                             schedule_derivatives)
+from main_app.pagination import CursorPaginator, paginate_by_cursor
+from main_app.views import tr_handler404, tr_handler500
+from reqsoft.cache import CachePolicy, bump_namespace
+from reqsoft.cache_config import cache_config, is_shared
+
+User = get_user_model()
+
+# кэши в памяти процесса вместо общего сервера кэша
+LOCAL_CACHES = {alias: cache_config('locmem://', alias) for alias in ('default', 'fragments', 'sessions', 'ratelimit')}
+TEST_POLICIES = {
+    'main_app:index': {'timeout': 60, 'users': 'anonymous', 'namespace': 'tests'},
+    'blog_app:files_list': {'timeout': 60, 'users': 'authenticated', 'vary_on_user': True, 'namespace': 'tests'},
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES, VIEW_CACHE_POLICIES=TEST_POLICIES, VIEWCOUNT_FLUSH_INTERVAL=0,
+                   SUGGEST_INDEX_WARMUP=False, IMAGE_DERIVATIVES_ASYNC=False)
+class ViewCachePolicyTests(TestCase):
+    """
+    Кэширование ответов представлений по правилам VIEW_CACHE_POLICIES (reqsoft.cache)
+    """
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+
+    def assertCacheStates(self, url, states):
+        self.assertEqual([self.client.get(url).get('X-View-Cache') for _ in states], states)
+
+    def test_second_request_is_hit(self):
+        self.assertCacheStates(reverse('main_app:index'), ['miss', 'hit', 'hit'])
+
+    def test_anonymous_rule_skips_authenticated_user(self):
+        self.client.force_login(User.objects.create_user('reader'))
+        self.assertCacheStates(reverse('main_app:index'), [None, None])
+
+    def test_authenticated_rule_skips_anonymous_user(self):
+        self.assertCacheStates(reverse('blog_app:files_list'), [None, None])
+
+    def test_vary_on_user(self):
+        url = reverse('blog_app:files_list')
+        self.client.force_login(User.objects.create_user('reader'))
+        self.assertCacheStates(url, ['miss', 'hit'])
+        self.client.force_login(User.objects.create_user('writer'))
+        self.assertCacheStates(url, ['miss', 'hit'])
+
+    def test_pending_messages_are_not_cached(self):
+        self.client.cookies['messages'] = 'pending'
+        self.assertCacheStates(reverse('main_app:index'), [None, None])
+
+    def test_response_with_cookies_is_not_cached(self):
+        policy = CachePolicy('main_app:index', namespace='tests')
+        request = RequestFactory().get('/')
+        request.user = AnonymousUser()
+        self.assertIsNone(policy.get_response(request))
+        response = HttpResponse('content')
+        response.set_cookie('choice', 'value')
+        policy.save_response(request, response)
+        self.assertNotIn('X-View-Cache', response)
+        self.assertIsNone(policy.get_response(request))
+
+    def test_bump_namespace_invalidates_pages(self):
+        url = reverse('main_app:index')
+        self.assertCacheStates(url, ['miss', 'hit'])
+        bump_namespace('tests')
+        self.assertCacheStates(url, ['miss', 'hit'])
+
+
+class CacheConfigTests(SimpleTestCase):
+    """
+    Настройки кэшей из адресов CACHE_URL (reqsoft.cache_config)
+    """
+
+    def test_locmem(self):
+        config = cache_config('locmem://', 'fragments', version=3)
+        self.assertEqual(config['BACKEND'], 'django.core.cache.backends.locmem.LocMemCache')
+        self.assertEqual(config['LOCATION'], 'fragments')
+        self.assertEqual(config['KEY_PREFIX'], 'reqsoft:fragments')
+        self.assertEqual(config['VERSION'], 3)
+
+    def test_file(self):
+        self.assertEqual(cache_config('file:///var/cache/site/', 'default')['LOCATION'], '/var/cache/site/default')
+        self.assertEqual(cache_config('file://', 'default', file_root='/tmp/cache')['LOCATION'],
+                         '/tmp/cache/default')
+        with self.assertRaises(ValueError):
+            cache_config('file://', 'default')
+
+    def test_redis(self):
+        config = cache_config('redis://localhost:6379/1', 'sessions')
+        self.assertEqual(config['BACKEND'], 'django.core.cache.backends.redis.RedisCache')
+        self.assertEqual(config['LOCATION'], 'redis://localhost:6379/1')
+
+    def test_memcached(self):
+        config = cache_config('memcached://cache1:11211,cache2:11211', 'default')
+        self.assertEqual(config['LOCATION'], ['cache1:11211', 'cache2:11211'])
+
+    def test_unknown_scheme(self):
+        with self.assertRaises(ValueError):
+            cache_config('mongodb://localhost', 'default')
+
+    def test_is_shared(self):
+        self.assertFalse(is_shared('locmem://'))
+        self.assertFalse(is_shared(''))
+        self.assertTrue(is_shared('redis://localhost:6379/0'))
+        self.assertTrue(is_shared('file:///var/cache/site'))
+
+
+@override_settings(CACHES=LOCAL_CACHES, IMAGE_DERIVATIVES_ASYNC=False)
+class ImageManifestTests(SimpleTestCase):
+    """
+    Изображение без оригинала в хранилище не ставится в очередь генерации, а предупреждение пишется один раз
+    """
+
+    def test_missing_source_reported_once(self):
+        name = 'images/tests/missing.jpg'
+        with self.assertLogs('main_app.images') as logs:
+            for _ in range(2):
+                caches['default'].clear()
+                self.assertIsNone(get_manifest(name))
+        self.assertEqual(len(logs.output), 1)
+        self.assertEqual(caches['default'].get(MANIFEST_KEY.format(name=name)), SOURCE_MISSING)
+
+    def save_image(self, name, color):
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (40, 30), color).save(buffer, 'PNG')
+        if default_storage.exists(name):
+            default_storage.delete(name)
+        return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    def test_replaced_source_is_rescheduled(self):
+        with tempfile.TemporaryDirectory() as media_root, self.settings(MEDIA_ROOT=media_root):
+            caches['default'].clear()
+            name = self.save_image('images/tests/photo.png', 'red')
+            manifest = generate_derivatives(name)
+            self.assertEqual(caches['default'].get(MANIFEST_KEY.format(name=name)), manifest)
+            with mock.patch.object(derivative_queue, 'submit') as submit:
+                schedule_derivatives(name)
+                submit.assert_not_called()
+                # новый файл с тем же именем
+                self.save_image(name, 'blue')
+                os.utime(default_storage.path(name), (manifest['modified'] + 10, manifest['modified'] + 10))
+                schedule_derivatives(name)
+                submit.assert_called_once_with(name)
+            self.assertNotEqual(generate_derivatives(name)['hash'], manifest['hash'])
+
+
+ERROR_POLICIES = {
+    'main_app:error_404': {'timeout': 60, 'users': 'anonymous', 'vary_on_path': False, 'status': 404},
+}
+
+
+@override_settings(CACHES=LOCAL_CACHES, VIEW_CACHE_POLICIES=ERROR_POLICIES)
+class ErrorPageTests(SimpleTestCase):
+    """
+    Страницы ошибок показываются и при недоступном кэше, страница 500 не кэшируется
+    """
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.request = RequestFactory().get('/missing/')
+        self.request.user = AnonymousUser()
+
+    def test_404_cached(self):
+        self.assertEqual(tr_handler404(self.request, None).get('X-View-Cache'), 'miss')
+        self.assertEqual(tr_handler404(self.request, None).get('X-View-Cache'), 'hit')
+
+    def test_404_without_cache(self):
+        with mock.patch.object(CachePolicy, 'get_response', side_effect=ConnectionError), \
+                self.assertLogs('main_app.views', 'WARNING'):
+            response = tr_handler404(self.request, None)
+        self.assertEqual(response.status_code, 404)
+
+    def test_500_not_cached(self):
+        with mock.patch.object(CachePolicy, 'get_response') as get_response:
+            response = tr_handler500(self.request)
+        self.assertEqual(response.status_code, 500)
+        self.assertNotIn('X-View-Cache', response)
+        get_response.assert_not_called()
+
+
+class CursorPaginationTests(TestCase):
+    """
+    Листание по курсору (main_app.pagination) при одинаковых значениях сортировки и с неверными курсорами
+    """
+    ordering = ('-date_joined', '-pk')
+
+    @classmethod
+    def setUpTestData(cls):
+        for number in range(7):
+            User.objects.create_user(f'user{number}')
+        # одинаковое время у всех записей: границы страниц различает только pk
+        User.objects.update(date_joined=timezone.now())
+        cls.expected = list(User.objects.order_by(*cls.ordering).values_list('pk', flat=True))
+
+    def paginate(self, cursor=None):
+        return paginate_by_cursor(User.objects.all(), 3, self.ordering, cursor)
+
+    def test_equal_values(self):
+        pages = [self.paginate()]
+        while pages[-1].has_next():
+            pages.append(self.paginate(pages[-1].next_cursor))
+        self.assertEqual([user.pk for page in pages for user in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        # обратно по ссылкам "назад" - те же страницы
+        previous = self.paginate(pages[-1].previous_cursor)
+        self.assertEqual(list(previous), list(pages[1]))
+        self.assertEqual(list(self.paginate(previous.previous_cursor)), list(pages[0]))
+
+    def test_invalid_cursor_gives_first_page(self):
+        def encode(data):
+            return base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip('=')
+
+        first = [user.pk for user in self.paginate()]
+        paginator = CursorPaginator(User.objects.all(), 3, self.ordering)
+        valid = paginator.encode('n', User.objects.get(pk=self.expected[2]))
+        cursors = [
+            'повреждён',
+            valid[:-3],
+            encode({'n': 1}),
+            encode(['x', '2024-01-01T00:00:00+00:00', 1]),
+            # курсор до изменения сортировки: полей меньше
+            encode(['n', 1]),
+            encode(['n', 'не дата', 1]),
+            encode(['n', '2024-01-01T00:00:00+00:00', 10 ** 30]),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                self.assertEqual([user.pk for user in self.paginate(cursor)], first)
@@ -1,9 +1,14 @@
+import logging
+
 from django.http import HttpResponse
 from django.shortcuts import render, redirect
 from django.views.decorators.http import require_GET
 
+from reqsoft.cache import get_policy
 from reqsoft.settings import BASE_DIR
 
+logger = logging.getLogger(__name__)
+
 
 def index(request):
     if request.user.is_authenticated:
@@ -11,31 +16,51 @@ def index(request):
     return render(request, 'main_app/main.html')
 
 
+def render_error_page(request, status, title, error_message, cached=True):
+    """
+    Страница ошибки; для анонимных пользователей готовая страница берётся из кэша (правила main_app:error_<код>
+    в VIEW_CACHE_POLICIES), так как она не зависит от адреса запроса. Недоступный кэш не мешает показать страницу
+    """
+    policy = get_policy(f'main_app:error_{status}') if cached else None
+    response = None
+    if policy:
+        try:
+            response = policy.get_response(request)
+        except Exception:
+            logger.warning('Кэш страницы ошибки %s недоступен', status, exc_info=True)
+            policy = None
+    if response is None:
+        response = render(request=request, template_name='main_app/error_page.html', status=status, context={
+            'title': title,
+            'error_message': error_message,
+        })
+        if policy:
+            try:
+                response = policy.save_response(request, response)
+            except Exception:
+                logger.warning('Кэш страницы ошибки %s недоступен', status, exc_info=True)
+    return response
+
+
 def tr_handler404(request, exception):
     """
     Обработка ошибки 404
     """
-    return render(request=request, template_name='main_app/error_page.html', status=404, context={
-        'title': 'Страница не найдена: 404',
-        'error_message': 'К сожалению такая страница была не найдена, или перемещена',
-    })
+    return render_error_page(request, 404, 'Страница не найдена: 404',
+                             'К сожалению такая страница была не найдена, или перемещена')
 
 
 def tr_handler500(request):
     """
-    Обработка ошибки 500
+    Обработка ошибки 500; без кэша, так как причиной ошибки может быть сам сервер кэша
     """
-    return render(request=request, template_name='main_app/error_page.html', status=500, context={
-        'title': 'Ошибка сервера: 500',
-        'error_message': 'Внутренняя ошибка сайта, вернитесь на главную страницу, отчет об ошибке мы направим администрации сайта',
-    })
+    return render_error_page(request, 500, 'Ошибка сервера: 500',
+                             'Внутренняя ошибка сайта, вернитесь на главную страницу, отчет об ошибке мы направим '
+                             'администрации сайта', cached=False)
 
 
 def tr_handler403(request, exception):
     """
     Обработка ошибки 403
     """
-    return render(request=request, template_name='main_app/error_page.html', status=403, context={
-        'title': 'Ошибка доступа: 403',
-        'error_message': 'Доступ к этой странице ограничен',
-    })
+    return render_error_page(request, 403, 'Ошибка доступа: 403', 'Доступ к этой странице ограничен')
@@ -0,0 +1,194 @@
+"""
+Псевдонимы кэшей, версии пространств ключей и кэширование ответов представлений по декларативным правилам.
+
+Псевдонимы (settings.CACHES): default - общий кэш, fragments - готовый HTML (фрагменты страниц и ответы
+представлений), sessions - сессии, ratelimit - счётчики попыток. Если псевдоним не настроен, используется default.
+
+Версии пространств ключей. Ключ пространства имён (namespace) содержит его текущую версию, поэтому все ключи
+пространства сбрасываются разом одним bump_namespace() без перебора ключей. Номер версии хранится в том же кэше,
+что и ключи. Все псевдонимы дополнительно используют VERSION из CACHE_VERSION, увеличение которой при выкладке
+сбрасывает кэши целиком.
+
+При кэше в памяти процесса (locmem://, по умолчанию) и версии, и ключи у каждого процесса свои, поэтому
+bump_namespace() сбрасывает кэш только того процесса, где изменились данные, а остальные процессы сервера отдают
+устаревшие страницы до истечения timeout. При нескольких процессах (воркеры gunicorn) нужен общий кэш - CACHE_URL
+вида redis://, memcached:// или file://.
+
+Правила кэширования ответов (VIEW_CACHE_POLICIES) задаются по имени маршрута:
+
+    'blog_app:article_list': {'timeout': 60, 'vary_on_user': True, 'namespace': 'articles'}
+
+* timeout - время жизни ответа в секундах;
+* users - для кого кэшировать: 'all', 'anonymous' или 'authenticated' (для остальных правило не действует,
+  например, закрытые представления не отдают закэшированный ответ анонимному пользователю);
+* vary_on_user - отдельная копия для каждой сессии пользователя (страницы с личным меню и CSRF токеном);
+* vary_on_headers - заголовки запроса, значения которых входят в ключ;
+* vary_on_path - входит ли в ключ адрес запроса (страницам ошибок он не нужен);
+* namespace - пространство ключей, сбрасываемое при изменении данных страницы;
+* status - код кэшируемых ответов (по умолчанию 200, у страниц ошибок - их код).
+
+Кэшируются только ответы на GET и HEAD без установки cookie; запросы с непоказанными сообщениями
+django.contrib.messages обрабатываются без кэша.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+NAMESPACE_VERSION_KEY = 'namespace:{namespace}'
+VIEW_CACHE_KEY = 'view:{namespace}:{version}:{view_name}:{digest}'
+
+
+def get_cache(alias=DEFAULT_CACHE_ALIAS):
+    """
+    Кэш по псевдониму или default, если такой псевдоним не настроен
+    """
+    return caches[alias if alias in settings.CACHES else DEFAULT_CACHE_ALIAS]
+
+
+def get_namespace_version(namespace, cache=None):
+    """
+    Текущая версия пространства. Начальное значение берётся от времени, а не 1, чтобы после вытеснения версии из
+    кэша не совпасть со старой и не отдать устаревшие ключи.
+    """
+    cache = cache or get_cache()
+    return cache.get_or_set(NAMESPACE_VERSION_KEY.format(namespace=namespace), lambda: time.time_ns() // 1000, None)
+
+
+def bump_namespace(namespace, *aliases):
+    """
+    Сброс всех ключей пространства namespace в кэшах aliases (по умолчанию - во всех, где оно встречается)
+    """
+    for alias in aliases or settings.CACHES:
+        cache = caches[alias]
+        key = NAMESPACE_VERSION_KEY.format(namespace=namespace)
+        try:
+            cache.incr(key)
+        except ValueError:
+            pass
+
+
+def namespace_key(namespace, key, cache=None):
+    """
+    Ключ в пространстве namespace с его текущей версией
+    """
+    return f'{namespace}:{get_namespace_version(namespace, cache)}:{key}'
+
+
+class CachePolicy:
+    """
+    Правило кэширования ответов представления (параметры описаны в начале модуля)
+    """
+
+    def __init__(self, view_name, timeout=60, users='all', vary_on_user=False, vary_on_headers=(), vary_on_path=True,
+                 namespace='views', alias='fragments', status=200):
+        if users not in ('all', 'anonymous', 'authenticated'):
+            raise ValueError(f'Неизвестное значение users в правиле кэширования {view_name}: {users}')
+        self.view_name = view_name
+        self.timeout = timeout
+        self.users = users
+        self.vary_on_user = vary_on_user
+        self.vary_on_headers = tuple(vary_on_headers)
+        self.vary_on_path = vary_on_path
+        self.namespace = namespace
+        self.alias = alias
+        self.status = status
+
+    @property
+    def cache(self):
+        return get_cache(self.alias)
+
+    def applies(self, request):
+        if request.method not in ('GET', 'HEAD') or not hasattr(request, 'user'):
+            return False
+        is_authenticated = request.user.is_authenticated
+        if self.users == 'anonymous' and is_authenticated or self.users == 'authenticated' and not is_authenticated:
+            return False
+        if self.vary_on_user and not request.session.session_key:
+            return False
+        return not has_pending_messages(request)
+
+    def get_key(self, request):
+        parts = [request.get_full_path() if self.vary_on_path else '']
+        if self.vary_on_user:
+            # ключ сессии меняется при входе вместе с CSRF токеном, который есть на странице
+            parts.append(request.session.session_key)
+        parts.extend(request.headers.get(header, '') for header in self.vary_on_headers)
+        digest = hashlib.sha256('\n'.join(parts).encode()).hexdigest()[:32]
+        version = get_namespace_version(self.namespace, self.cache)
+        return VIEW_CACHE_KEY.format(namespace=self.namespace, version=version, view_name=self.view_name,
+                                     digest=digest)
+
+    def get_response(self, request):
+        """
+        Закэшированный ответ или None
+        """
+        if not self.applies(request):
+            return None
+        request._view_cache_key = self.get_key(request)
+        cached = self.cache.get(request._view_cache_key)
+        if cached is None:
+            return None
+        status, headers, content = cached
+        response = HttpResponse(content, status=status, headers=headers)
+        response['X-View-Cache'] = 'hit'
+        return response
+
+    def save_response(self, request, response):
+        key = getattr(request, '_view_cache_key', None)
+        if key is None or response.get('X-View-Cache') == 'hit':
+            return response
+        if self.vary_on_user:
+            patch_vary_headers(response, ('Cookie',))
+            patch_cache_control(response, private=True)
+        if self.vary_on_headers:
+            patch_vary_headers(response, self.vary_on_headers)
+        if response.status_code != self.status or response.streaming or response.cookies or has_pending_messages(request):
+            return response
+        headers = {name: value for name, value in response.items() if name.lower() != 'x-view-cache'}
+        self.cache.set(key, (response.status_code, headers, response.content), self.timeout)
+        response['X-View-Cache'] = 'miss'
+        return response
+
+
+def has_pending_messages(request):
+    """
+    Есть ли у запроса сообщения django.contrib.messages (в cookie или в сессии), которые ещё не показаны
+    """
+    return 'messages' in request.COOKIES or '_messages' in getattr(request, 'session', {})
+
+
+def get_policy(view_name):
+    """
+    Правило кэширования представления по имени маршрута из VIEW_CACHE_POLICIES или None
+    """
+    options = getattr(settings, 'VIEW_CACHE_POLICIES', {}).get(view_name)
+    return CachePolicy(view_name, **options) if options is not None else None
+
+
+class ViewCachePolicyMiddleware:
+    """
+    Кэширование ответов представлений по правилам VIEW_CACHE_POLICIES. Ставится после AuthenticationMiddleware и
+    MessageMiddleware: правило зависит от пользователя и его сообщений.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        policy = getattr(request, '_view_cache_policy', None)
+        if policy is not None:
+            response = policy.save_response(request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        policy = get_policy(match.view_name) if match else None
+        if policy is None:
+            return None
+        request._view_cache_policy = policy
+        return policy.get_response(request)
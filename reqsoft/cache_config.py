@@ -0,0 +1,57 @@
+"""
+Настройки кэшей Django из адресов вида схема://расположение (переменные окружения CACHE_URL и CACHE_URL_<ALIAS>).
+
+* locmem:// - память процесса (по умолчанию), у каждого псевдонима своё хранилище;
+* file:///путь - файлы в каталоге, общие для процессов одного сервера;
+* redis://хост:порт/база, rediss://... - Redis (нужен пакет redis);
+* memcached://хост:порт[,хост:порт] - Memcached (нужен пакет pymemcache);
+* dummy:// - без кэширования.
+
+Модуль импортируется из settings.py, поэтому не зависит от Django.
+"""
+from urllib.parse import urlsplit
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'rediss': 'django.core.cache.backends.redis.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
+}
+# кэши, содержимое которых видят все процессы сайта
+SHARED_SCHEMES = ('file', 'redis', 'rediss', 'memcached')
+
+
+def cache_config(url, alias, key_prefix='reqsoft', version=1, file_root=None, timeout=300):
+    """
+    Словарь настроек кэша для CACHES[alias] по адресу url. Ключи разных псевдонимов в общем сервере различаются
+    префиксом <key_prefix>:<alias>.
+    """
+    parts = urlsplit(url)
+    scheme = parts.scheme or 'locmem'
+    if scheme not in BACKENDS:
+        raise ValueError(f'Неизвестная схема адреса кэша {alias}: {url}')
+    config = {
+        'BACKEND': BACKENDS[scheme],
+        'KEY_PREFIX': f'{key_prefix}:{alias}',
+        'VERSION': version,
+        'TIMEOUT': timeout,
+    }
+    if scheme == 'locmem':
+        config['LOCATION'] = parts.netloc or alias
+    elif scheme == 'file':
+        path = parts.path or (file_root and str(file_root))
+        if not path:
+            raise ValueError(f'Для файлового кэша {alias} не указан каталог')
+        # у каждого псевдонима свой подкаталог: clear() удаляет все файлы каталога
+        config['LOCATION'] = f'{path.rstrip("/")}/{alias}'
+    elif scheme in ('redis', 'rediss'):
+        config['LOCATION'] = url
+    elif scheme == 'memcached':
+        config['LOCATION'] = parts.netloc.split(',')
+    return config
+
+
+def is_shared(url):
+    return (urlsplit(url).scheme or 'locmem') in SHARED_SCHEMES
@@ -0,0 +1,157 @@
+"""
+Бюджеты SQL запросов представлений и шаблонных тегов.
+
+Запросы считаются обёрткой выполнения (connection.execute_wrapper), поэтому учёт работает и без DEBUG, в отличие от
+connection.queries и debug_toolbar. QueryBudgetMiddleware считает количество и общее время запросов каждого запроса
+к сайту, а декоратор query_budget - отдельной функции (шаблонного тега, функции представления); запросы вложенной
+области входят и в охватывающую, в сообщении о превышении бюджета представления перечисляются вложенные области.
+
+Бюджеты задаются по имени маршрута или области декоратора:
+
+    QUERY_BUDGETS = {'blog_app:article_list': 8, 'blog_tags.popular_articles': 2}
+
+* QUERY_BUDGET_DEFAULT - бюджет представлений без своей записи (None - не проверять);
+* QUERY_TIME_BUDGET - наибольшее общее время запросов одной области в секундах (None - не проверять);
+* QUERY_BUDGET_HEADERS - добавлять к ответу заголовок Server-Timing с количеством и временем запросов.
+
+Превышение бюджета записывается в журнал reqsoft.querybudget с уровнем WARNING. Те же бюджеты представлений
+проверяются тестами на данных реалистичного объёма (blog_app.tests), поэтому N+1 запросы обнаруживаются до выкладки.
+"""
+import functools
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_scopes = ContextVar('query_budget_scopes', default=())
+
+
+class QueryStats:
+    """
+    Количество и общее время (в секундах) запросов области name; nested - вложенные области {имя: QueryStats}
+    """
+
+    def __init__(self, name=None):
+        self.name = name
+        self.count = 0
+        self.duration = 0.0
+        self.nested = {}
+
+    def add(self, duration):
+        self.count += 1
+        self.duration += duration
+
+    def merge(self, stats):
+        nested = self.nested.setdefault(stats.name, QueryStats(stats.name))
+        nested.count += stats.count
+        nested.duration += stats.duration
+
+    def __str__(self):
+        return f'{self.count} запросов за {self.duration * 1000:.1f} мс'
+
+
+def get_budget(name):
+    """
+    Бюджет количества запросов области name из QUERY_BUDGETS или None
+    """
+    return getattr(settings, 'QUERY_BUDGETS', {}).get(name)
+
+
+def get_time_budget():
+    return getattr(settings, 'QUERY_TIME_BUDGET', None)
+
+
+def record_query(execute, sql, params, many, context):
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - start
+        for stats in _scopes.get():
+            stats.add(duration)
+
+
+@contextmanager
+def track_queries(name=None):
+    """
+    Учёт запросов внутри блока:
+
+        with track_queries('blog_tags.popular_articles') as stats:
+            ...
+
+    Обёртка выполнения ставится на соединения только внешней областью, вложенные области учитываются ею же.
+    """
+    stats = QueryStats(name)
+    parents = _scopes.get()
+    token = _scopes.set(parents + (stats,))
+    try:
+        with ExitStack() as stack:
+            if not parents:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(record_query))
+            yield stats
+    finally:
+        _scopes.reset(token)
+        if parents and stats.name:
+            parents[-1].merge(stats)
+
+
+def check_budget(stats, budget=None):
+    """
+    Запись в журнал о превышении бюджета количества запросов budget или общего времени запросов области;
+    возвращает True, если бюджет превышен
+    """
+    time_budget = get_time_budget()
+    exceeded = budget is not None and stats.count > budget or time_budget is not None and stats.duration > time_budget
+    if exceeded:
+        nested = ', '.join(f'{name}: {nested}' for name, nested in stats.nested.items())
+        logger.warning('Превышен бюджет запросов %s: %s (не более %s запросов)%s', stats.name, stats, budget,
+                       f'; в том числе {nested}' if nested else '')
+    return exceeded
+
+
+def query_budget(name):
+    """
+    Декоратор функции, запросы которой учитываются отдельной областью name с бюджетом QUERY_BUDGETS[name]:
+
+        @register.simple_tag
+        @query_budget('blog_tags.popular_articles')
+        def popular_articles():
+            ...
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with track_queries(name) as stats:
+                result = func(*args, **kwargs)
+            check_budget(stats, get_budget(name))
+            return result
+        return wrapper
+    return decorator
+
+
+class QueryBudgetMiddleware:
+    """
+    Учёт запросов каждого запроса к сайту и проверка бюджета его представления. Ставится первым, чтобы учитывать
+    и запросы промежуточных слоёв (сессия, пользователь).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with track_queries() as stats:
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        if match is not None:
+            stats.name = match.view_name
+            budget = get_budget(match.view_name)
+            check_budget(stats, getattr(settings, 'QUERY_BUDGET_DEFAULT', None) if budget is None else budget)
+        if getattr(settings, 'QUERY_BUDGET_HEADERS', False):
+            response['Server-Timing'] = f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"'
+        return response
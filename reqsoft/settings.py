@@ -14,6 +14,8 @@ from pathlib import Path
 
 from decouple import config
 
+from reqsoft.cache_config import cache_config, is_shared
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -50,12 +52,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'reqsoft.querybudget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'reqsoft.cache.ViewCachePolicyMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
@@ -107,6 +111,26 @@ else:
         }
     }
 
+# Кэши (reqsoft.cache_config, reqsoft.cache)
+# CACHE_URL - адрес общего кэша: locmem:// (по умолчанию), file:///путь, redis://хост:порт/база, memcached://хост:порт
+# CACHE_URL_<ПСЕВДОНИМ> - отдельный адрес для псевдонима, CACHE_VERSION - версия всех ключей (сброс при выкладке).
+# locmem:// подходит для одного процесса: сброс пространств ключей (bump_namespace) при изменении данных виден
+# только процессу, в котором они изменились, поэтому при нескольких воркерах нужен общий CACHE_URL (redis, memcached)
+CACHE_URL = config('CACHE_URL', default='locmem://')
+CACHE_VERSION = config('CACHE_VERSION', default=1, cast=int)
+CACHE_ALIASES = ('default', 'fragments', 'sessions', 'ratelimit')
+CACHES = {
+    alias: cache_config(config(f'CACHE_URL_{alias.upper()}', default=CACHE_URL), alias, version=CACHE_VERSION,
+                        file_root=BASE_DIR / 'var' / 'cache')
+    for alias in CACHE_ALIASES
+}
+
+# Сессии читаются из кэша только при общем для всех процессов кэше: при кэше в памяти процесса изменения сессии
+# в одном процессе не видны другим
+SESSION_CACHE_ALIAS = 'sessions'
+if is_shared(config('CACHE_URL_SESSIONS', default=CACHE_URL)):
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -151,10 +175,13 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = (BASE_DIR / 'media')
 
-CKEDITOR_FILENAME_GENERATOR = 'utils.get_filename'
-CKEDITOR_RESTRICT_BY_DATE = True
+# Загрузки CKEditor хранятся под именем из хэша содержимого в каталоге MEDIA_ROOT/uploads (reqsoft.storage),
+# одинаковые файлы - один раз; файлы без ссылок из статей удаляет команда gc_uploads
+CKEDITOR_STORAGE_BACKEND = 'reqsoft.storage.ContentAddressedStorage'
+CKEDITOR_FILENAME_GENERATOR = 'reqsoft.utils.get_filename'
+CKEDITOR_RESTRICT_BY_DATE = False
 CKEDITOR_BROWSE_SHOW_DIRS = True
-CKEDITOR_UPLOAD_PATH = pathlib.Path.joinpath(BASE_DIR, f'{MEDIA_URL}/uploads')
+CKEDITOR_UPLOAD_PATH = 'uploads/'
 CKEDITOR_JQUERY_URL = 'https://ajax.googleapis.com/ajax/libs/jquery/2.2.4/jquery.min.js'
 CKEDITOR_CONFIGS = {
     'default': {
@@ -177,5 +204,122 @@ CKEDITOR_CONFIGS = {
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Буферизованный учёт просмотров статей (blog_app.viewcounter)
+# VIEWCOUNT_FLUSH_INTERVAL - период фонового сброса буфера в секундах, 0 - запись просмотра сразу в запросе
+# VIEWCOUNT_BATCH_SIZE - размер пачки bulk_create, при заполнении буфера сброс выполняется досрочно
+# VIEWCOUNT_SEEN_SIZE - сколько пар (статья, IP) за день процесс помнит, чтобы не записывать повторные просмотры
+VIEWCOUNT_FLUSH_INTERVAL = config('VIEWCOUNT_FLUSH_INTERVAL', default=10, cast=int)
+VIEWCOUNT_BATCH_SIZE = config('VIEWCOUNT_BATCH_SIZE', default=500, cast=int)
+VIEWCOUNT_SEEN_SIZE = config('VIEWCOUNT_SEEN_SIZE', default=100000, cast=int)
+VIEWCOUNT_SPOOL_DIR = BASE_DIR / 'var' / 'viewcounts'
+
+# Время жизни закэшированного меню категорий в секундах (blog_app.navigation), кэш также сбрасывается сигналами
+CATEGORY_TREE_CACHE_TIMEOUT = 300
+
+# Время жизни закэшированного списка популярных тегов в секундах (blog_app.tagstats)
+POPULAR_TAGS_CACHE_TIMEOUT = 300
+
+# Индекс похожих статей (blog_app.similarity)
+# SIMILAR_ARTICLES_INDEX_SIZE - сколько похожих статей хранится для каждой статьи
+# SIMILAR_ARTICLES_MAX_TAG_ARTICLES - теги и категории с большим числом статей не порождают кандидатов
+# SIMILAR_ARTICLES_RANDOM - случайная выборка похожих статей с весом по оценке вместо первых по оценке
+# SIMILAR_ARTICLES_AUTO_UPDATE - пересчёт индекса сигналами при изменении статьи и её тегов
+SIMILAR_ARTICLES_INDEX_SIZE = 20
+SIMILAR_ARTICLES_MAX_TAG_ARTICLES = 1000
+SIMILAR_ARTICLES_RANDOM = True
+SIMILAR_ARTICLES_AUTO_UPDATE = True
+
+# Конфигурация полнотекстового поиска PostgreSQL для статей (blog_app.search)
+ARTICLE_SEARCH_CONFIG = 'russian'
+
+# Индекс подсказок поиска в памяти процесса (blog_app.suggest): период полной перезагрузки в секундах,
+# максимальное количество подсказок в ответе и доля общих триграмм для подсказок с опечатками
+SUGGEST_INDEX_TTL = config('SUGGEST_INDEX_TTL', default=600, cast=int)
+SUGGEST_MAX_LIMIT = 20
+SUGGEST_FUZZY_THRESHOLD = 0.4
+# Фоновая загрузка индекса подсказок при первом запросе к процессу
+SUGGEST_INDEX_WARMUP = True
+
+# Количество веток обсуждения на странице комментариев статьи и наибольшее количество ответов в ветке,
+# которые выводятся сразу, без загрузки по кнопке (blog_app.comment_threads)
+COMMENT_PAGE_SIZE = 20
+COMMENT_INLINE_REPLIES = 10
+
+# Время хранения закэшированных фрагментов страницы статьи в секундах (blog_app.fragments)
+ARTICLE_FRAGMENT_CACHE_TIMEOUT = 3600
+
+# Постраничный вывод списков статей и файлов: 'cursor' - по курсору без OFFSET и COUNT(*) (main_app.pagination),
+# 'offset' - номера страниц
+LIST_PAGINATION_MODE = config('LIST_PAGINATION_MODE', default='cursor')
+
+# Уменьшенные копии загруженных изображений (main_app.images): поля моделей, ширины копий в пикселях, форматы,
+# качество сжатия, количество потоков и фоновая генерация (False - сразу при сохранении)
+IMAGE_DERIVATIVE_FIELDS = ('blog_app.Article.thumbnail', 'blog_app.Documents.thumbnail', 'customeuser_app.Profile.avatar')
+IMAGE_DERIVATIVE_WIDTHS = (320, 640, 1024)
+IMAGE_DERIVATIVE_FORMATS = ('webp', 'jpeg')
+IMAGE_DERIVATIVE_QUALITY = 80
+# время жизни манифеста копий в кэше, секунд
+IMAGE_MANIFEST_TIMEOUT = 24 * 3600
+IMAGE_DERIVATIVE_WORKERS = config('IMAGE_DERIVATIVE_WORKERS', default=2, cast=int)
+IMAGE_DERIVATIVES_ASYNC = True
+# Время жизни QR кода двухфакторной авторизации в кэше, в секундах (customeuser_app.otp)
+OTP_QR_CACHE_TIMEOUT = 300
+# Ограничение попыток ввода одноразового кода: {область: (попыток, за секунд)} по имени пользователя и IP-адресу
+OTP_RATE_LIMITS = {'username': (5, 300), 'ip': (20, 300)}
+# Допустимое расхождение часов в шагах TOTP (по 30 секунд) в каждую сторону
+OTP_VALID_WINDOW = 1
+# Профиль пользователя читается вместе с пользователем (customeuser_app.backends); стандартный бэкенд оставлен
+# для сессий, созданных до его подключения
+AUTHENTICATION_BACKENDS = [
+    'customeuser_app.backends.ProfileModelBackend',
+]
+
+# Время жизни сводок профилей (имя, ссылка, аватар) в кэше, в секундах (customeuser_app.summaries)
+PROFILE_SUMMARY_CACHE_TIMEOUT = 3600
+# Кэширование ответов представлений по имени маршрута (параметры описаны в reqsoft.cache). Пространства ключей
+# articles, files и comments сбрасываются сигналами blog_app при изменении данных
+VIEW_CACHE_POLICIES = {
+    'main_app:index': {'timeout': 600, 'users': 'anonymous'},
+    'main_app:error_403': {'timeout': 600, 'users': 'anonymous', 'vary_on_path': False, 'status': 403},
+    'main_app:error_404': {'timeout': 600, 'users': 'anonymous', 'vary_on_path': False, 'status': 404},
+    'blog_app:article_list': {'timeout': 60, 'users': 'authenticated', 'vary_on_user': True, 'namespace': 'articles'},
+    'blog_app:articles_by_category': {'timeout': 60, 'users': 'authenticated', 'vary_on_user': True,
+                                      'namespace': 'articles'},
+    'blog_app:articles_by_tags': {'timeout': 60, 'vary_on_user': True, 'namespace': 'articles'},
+    'blog_app:files_list': {'timeout': 60, 'users': 'authenticated', 'vary_on_user': True, 'namespace': 'files'},
+    'blog_app:files_by_category': {'timeout': 60, 'users': 'authenticated', 'vary_on_user': True,
+                                   'namespace': 'files'},
+    'blog_app:comment_threads': {'timeout': 300, 'users': 'authenticated', 'namespace': 'comments'},
+    'blog_app:comment_replies': {'timeout': 300, 'users': 'authenticated', 'namespace': 'comments'},
+    'blog_app:search_suggest': {'timeout': 60, 'users': 'authenticated', 'namespace': 'articles'},
+}
+
 LOGIN_URL = "/users/login/"
 LOGOUT_REDIRECT_URL = '/'
+
+# Бюджеты SQL запросов (reqsoft.querybudget): наибольшее количество запросов представления (по имени маршрута) или
+# шаблонного тега при пустом кэше. Превышение записывается в журнал, бюджеты представлений проверяют тесты blog_app
+QUERY_BUDGETS = {
+    'blog_app:article_list': 8,
+    'blog_app:article_detail': 19,
+    'blog_app:articles_by_category': 8,
+    'blog_app:articles_by_tags': 9,
+    'blog_app:comment_threads': 7,
+    'blog_app:comment_replies': 6,
+    'blog_app:search': 9,
+    'blog_app:search_suggest': 7,
+    'blog_app:files_list': 8,
+    'blog_app:file_detail': 7,
+    'blog_app:files_by_category': 8,
+    'customeuser_app:profile_detail': 6,
+    'blog_tags.category_menu': 1,
+    'blog_tags.popular_tags': 1,
+    'blog_tags.popular_articles': 2,
+    'blog_tags.show_latest_comments': 1,
+    'profile_tags.profile_summary': 1,
+}
+QUERY_BUDGET_DEFAULT = 30
+# Наибольшее общее время запросов представления или тега в секундах
+QUERY_TIME_BUDGET = config('QUERY_TIME_BUDGET', default=0.5, cast=float)
+# Заголовок Server-Timing с количеством и временем запросов в ответе
+QUERY_BUDGET_HEADERS = DEBUG
@@ -0,0 +1,91 @@
+"""
+Хранилище загрузок CKEditor с адресацией по содержимому.
+
+Имя файла - sha256 его содержимого с исходным расширением, файлы разложены по подкаталогам из первых символов хэша
+(uploads/3f/a2/3fa2...c1.png), чтобы в одном каталоге не скапливались тысячи файлов. Одинаковые файлы, загруженные
+в разные статьи, хранятся один раз: повторная загрузка возвращает имя уже сохранённого файла. Содержимое файла по
+такому адресу никогда не меняется, поэтому его можно отдавать с бессрочным кэшированием.
+
+Файл сначала пишется под временным именем и затем публикуется жёсткой ссылкой на итоговое имя: ссылка создаётся
+атомарно, поэтому параллельные загрузки одного файла не мешают друг другу, а недописанный файл не виден по адресу.
+Файлы, на которые больше не ссылается ни одна статья, удаляет команда gc_uploads.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import uuid
+from urllib.parse import unquote
+
+from django.core.files.storage import FileSystemStorage
+
+# уровни подкаталогов и количество символов хэша в имени каждого
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+HASH_NAME = re.compile(r'^[0-9a-f]{64}(_thumb)?$')
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+def hashed_name(name, digest):
+    """
+    Имя файла с хэшем digest в каталоге исходного имени name: <каталог>/<ab>/<cd>/<хэш><расширение>
+    """
+    directory, filename = posixpath.split(name)
+    extension = posixpath.splitext(filename)[1].lower()
+    shards = [digest[level * SHARD_WIDTH:(level + 1) * SHARD_WIDTH] for level in range(SHARD_LEVELS)]
+    return posixpath.join(directory, *shards, digest + extension)
+
+
+def is_hashed_name(name):
+    return bool(HASH_NAME.match(posixpath.splitext(posixpath.basename(name))[0]))
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Файловое хранилище, сохраняющее файлы под именем из хэша содержимого (см. описание модуля). Имена, уже
+    построенные из хэша (в том числе миниатюры <хэш>_thumb, которые ckeditor_uploader строит от имени оригинала),
+    сохраняются без изменений.
+    """
+
+    def get_available_name(self, name, max_length=None):
+        # итоговое имя выбирается в _save по содержимому, одинаковое содержимое - одно имя
+        return name
+
+    def _save(self, name, content):
+        if not is_hashed_name(name):
+            name = hashed_name(name, content_hash(content))
+        if self.exists(name):
+            return name
+        directory, filename = posixpath.split(name)
+        temporary = super()._save(posixpath.join(directory, f'.{uuid.uuid4().hex}.tmp'), content)
+        try:
+            os.link(self.path(temporary), self.path(name))
+        except FileExistsError:
+            # тот же файл одновременно сохранил другой процесс
+            pass
+        finally:
+            os.remove(self.path(temporary))
+        return name
+
+
+def upload_references(texts, media_url, upload_dir):
+    """
+    Имена файлов каталога загрузок upload_dir, на которые ссылаются HTML тексты texts (ссылки вида
+    <MEDIA_URL><upload_dir>/<путь>, в том числе с адресом сайта)
+    """
+    upload_dir = upload_dir.strip('/') + '/'
+    pattern = re.compile(re.escape(media_url + upload_dir) + r'''([^"'\s?#<>)]+)''')
+    names = set()
+    for text in texts:
+        names.update(upload_dir + unquote(path) for path in pattern.findall(text or ''))
+    return names
@@ -1,7 +1,12 @@
+import html
 import pathlib
+import re
 import uuid
 from datetime import datetime
 
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.html import strip_tags
 from pytils.translit import slugify
 
 
@@ -12,12 +17,103 @@ def get_filename(filename, request):
     return filename
 
 
+# суффикс -<число>, которым различаются одинаковые slug
+SLUG_SUFFIX_RESERVE = 10
+# количество разных основ slug в одном запросе bulk_unique_slugs (ограничение глубины выражения SQLite)
+SLUG_PREFIXES_PER_QUERY = 250
+
+
+def slug_base(model, value, field_name='slug'):
+    """
+    Основа slug из значения с запасом длины под числовой суффикс
+    """
+    max_length = model._meta.get_field(field_name).max_length
+    base = slugify(str(value))[:max_length - SLUG_SUFFIX_RESERVE].strip('-')
+    return base or model._meta.model_name
+
+
+def last_slug_number(base, taken):
+    """
+    Наибольший занятый номер суффикса основы (сама основа считается номером 1) или 0, если основа свободна
+    """
+    if base not in taken:
+        return 0
+    pattern = re.compile(rf'^{re.escape(base)}-(\d+)$')
+    return max((int(match.group(1)) for match in map(pattern.match, taken) if match), default=1)
+
+
+def numbered_slug(base, number):
+    return base if number <= 1 else f'{base}-{number}'
+
+
+def next_free_slug(base, taken):
+    """
+    base, если он свободен, иначе base-N со следующим после наибольшего занятого номером
+    """
+    return numbered_slug(base, last_slug_number(base, taken) + 1)
+
+
+def taken_slugs(model, bases, field_name='slug', exclude_pk=None):
+    """
+    Занятые slug с указанными основами (сама основа и основа с суффиксом -N) одним запросом
+    """
+    condition = Q()
+    for base in bases:
+        condition |= Q(**{field_name: base}) | Q(**{f'{field_name}__startswith': f'{base}-'})
+    queryset = model._base_manager.filter(condition)
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    return set(queryset.values_list(field_name, flat=True))
+
+
 def unique_slugify(instance, slug):
     """
     Генератор уникальных SLUG для моделей, в случае существования такого SLUG.
+    Занятые slug с той же основой читаются одним запросом, к основе добавляется следующий свободный номер.
+    Одновременное сохранение может выбрать тот же slug - см. save_with_unique_slug.
     """
     model = instance.__class__
-    unique_slug = slugify(slug)
-    while model.objects.filter(slug=unique_slug).exists():
-        unique_slug = f'{unique_slug}-{uuid.uuid4().hex[:8]}'
-    return unique_slug
+    base = slug_base(model, slug)
+    return next_free_slug(base, taken_slugs(model, [base], exclude_pk=instance.pk))
+
+
+def save_with_unique_slug(instance, source, save, attempts=5):
+    """
+    Сохранение объекта с новым уникальным slug из source. save - функция сохранения (обычно super().save).
+    Сохранение выполняется в точке сохранения транзакции: если параллельный запрос занял тот же slug и база
+    отклонила вставку по уникальности, slug выбирается заново.
+    """
+    for attempt in range(attempts):
+        instance.slug = unique_slugify(instance, source)
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            slug_taken = instance.__class__._base_manager.filter(slug=instance.slug).exists()
+            if not slug_taken or attempt == attempts - 1:
+                raise
+
+
+def bulk_unique_slugs(model, values, field_name='slug'):
+    """
+    Уникальные slug для списка значений (массовый импорт) с одним запросом на SLUG_PREFIXES_PER_QUERY разных
+    основ. Slug уникальны и среди уже сохранённых объектов, и внутри списка.
+    """
+    bases = [slug_base(model, value, field_name) for value in values]
+    distinct = list(dict.fromkeys(bases))
+    taken = set()
+    for start in range(0, len(distinct), SLUG_PREFIXES_PER_QUERY):
+        taken |= taken_slugs(model, distinct[start:start + SLUG_PREFIXES_PER_QUERY], field_name)
+    numbers = {base: last_slug_number(base, taken) for base in distinct}
+    slugs = []
+    for base in bases:
+        numbers[base] += 1
+        slugs.append(numbered_slug(base, numbers[base]))
+    return slugs
+
+
+def html_to_text(value):
+    """
+    Текст HTML без разметки и HTML-сущностей, для полнотекстового поиска
+    """
+    return ' '.join(html.unescape(strip_tags(value or '')).split())